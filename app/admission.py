@@ -0,0 +1,201 @@
+import math
+import os
+import threading
+import time
+
+from sqlalchemy import func, select
+
+from app import models, grading_queue, metrics
+
+# Set to false to admit every grading request, e.g. to load test raw capacity
+ADMISSION_ENABLED = os.getenv("ADMISSION_ENABLED", "true").lower() in ("1", "true", "yes")
+
+# Grading requests per user, with bursts of up to ADMISSION_USER_BURST. 0 disables the limit.
+ADMISSION_USER_RATE_PER_MINUTE = float(os.getenv("ADMISSION_USER_RATE_PER_MINUTE", "6"))
+ADMISSION_USER_BURST = int(os.getenv("ADMISSION_USER_BURST", "5"))
+
+# Submissions of one user waiting for or being graded at once. 0 disables the limit.
+ADMISSION_USER_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_USER_MAX_IN_FLIGHT", "3"))
+
+# Grading requests per second across all users, with bursts of up to ADMISSION_GLOBAL_BURST. 0 disables the limit.
+ADMISSION_GLOBAL_RATE_PER_SECOND = float(os.getenv("ADMISSION_GLOBAL_RATE_PER_SECOND", "10"))
+ADMISSION_GLOBAL_BURST = int(os.getenv("ADMISSION_GLOBAL_BURST", "50"))
+
+# Load shedding: requests are refused while this many gradings are queued or running,
+# or while a new one would wait longer than ADMISSION_MAX_WAIT_SECONDS (estimated
+# from the measured grading latency). 0 disables either check.
+ADMISSION_MAX_IN_FLIGHT = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "200"))
+ADMISSION_MAX_WAIT_SECONDS = float(os.getenv("ADMISSION_MAX_WAIT_SECONDS", "300"))
+
+# Grading latency assumed until some gradings have been measured
+ADMISSION_DEFAULT_LATENCY_SECONDS = float(os.getenv("ADMISSION_DEFAULT_LATENCY_SECONDS", "10"))
+
+# Share of the global limits each lane may use. Student submissions are shed first,
+# which leaves headroom for staff work: regrades, bulk uploads and staff submissions.
+LANES = {
+    "staff": 1.0,
+    "student": float(os.getenv("ADMISSION_STUDENT_SHARE", "0.8")),
+}
+
+MAX_RETRY_AFTER_SECONDS = 300
+
+# Token buckets kept before full (idle) ones are dropped
+MAX_BUCKETS = 10000
+
+
+class Rejected(Exception):
+    """A grading request refused by admission control."""
+
+    def __init__(self, reason: str, retry_after: float):
+        super().__init__(reason)
+        self.reason = reason
+        self.retry_after = min(MAX_RETRY_AFTER_SECONDS, max(1, math.ceil(retry_after)))
+
+
+class InMemoryBackend:
+    """Admission state of one process: token buckets by key.
+
+    Any object with the same ``take`` method can replace it, e.g. one backed by a
+    shared store so that several processes enforce common limits.
+    """
+
+    def __init__(self, max_buckets: int = MAX_BUCKETS):
+        self.max_buckets = max_buckets
+        self._buckets = {}  # key -> (tokens, updated, time the bucket is full again)
+        self._lock = threading.Lock()
+
+    def take(self, key: str, rate: float, capacity: int, reserve: float = 0) -> float:
+        """Take a token from the bucket ``key``, refilled at ``rate`` per second up to ``capacity``.
+
+        The token is only taken if ``reserve`` tokens remain after it. Returns 0
+        when it was taken, otherwise the seconds until it could be.
+        """
+        with self._lock:
+            now = time.monotonic()
+            tokens, updated, _ = self._buckets.get(key, (float(capacity), now, now))
+            tokens = min(capacity, tokens + (now - updated) * rate)
+            wait = 0.0
+            if tokens - reserve >= 1:
+                tokens -= 1
+            else:
+                wait = (1 + reserve - tokens) / rate
+            self._buckets[key] = (tokens, now, now + (capacity - tokens) / rate)
+            if len(self._buckets) > self.max_buckets:
+                self._buckets = {k: v for k, v in self._buckets.items() if v[2] > now}
+            return wait
+
+
+class AdmissionController:
+    """Decides whether a grading request is admitted, before any of its work is done.
+
+    Requests are refused with a ``Retry-After`` when their user has too many
+    gradings in flight or sends them too fast, when the deployment as a whole
+    receives them too fast, or when the grading backlog is too deep (by count or
+    by estimated wait). The global limits are scaled by the request's lane, so
+    lower-priority lanes are shed first.
+    """
+
+    def __init__(self, backend=None, queue=None):
+        self.backend = backend or InMemoryBackend()
+        self.queue = queue or grading_queue.queue
+        self._counts = {}  # (lane, result) -> requests
+        self._lock = threading.Lock()
+
+    def load(self) -> dict:
+        stats = self.queue.stats()
+        in_flight = stats["queue_depth"] + stats["running"]
+        latency = stats["avg_latency_seconds"] or ADMISSION_DEFAULT_LATENCY_SECONDS
+        workers = max(1, stats["workers"])
+        return {
+            "in_flight": in_flight,
+            "latency_seconds": latency,
+            "estimated_wait_seconds": in_flight / workers * latency,
+            "workers": workers,
+        }
+
+    def check(self, user_id: int, lane: str, user_in_flight: int = 0):
+        """Raise ``Rejected`` if the request should be refused; otherwise count it as admitted."""
+        if ADMISSION_ENABLED:
+            try:
+                self._check(user_id, lane, user_in_flight)
+            except Rejected as e:
+                self._count(lane, e.reason)
+                raise
+        self._count(lane, "admitted")
+
+    def _check(self, user_id: int, lane: str, user_in_flight: int):
+        share = LANES[lane]
+        load = self.load()
+        latency, workers = load["latency_seconds"], load["workers"]
+
+        if ADMISSION_USER_MAX_IN_FLIGHT > 0 and user_in_flight >= ADMISSION_USER_MAX_IN_FLIGHT:
+            # Until the oldest of them has been graded
+            raise Rejected("user_in_flight", load["estimated_wait_seconds"] + latency)
+
+        retry_after = 0.0
+        max_in_flight = ADMISSION_MAX_IN_FLIGHT * share
+        if ADMISSION_MAX_IN_FLIGHT > 0 and load["in_flight"] >= max_in_flight:
+            retry_after = (load["in_flight"] - max_in_flight + 1) / workers * latency
+        max_wait = ADMISSION_MAX_WAIT_SECONDS * share
+        if ADMISSION_MAX_WAIT_SECONDS > 0 and load["estimated_wait_seconds"] > max_wait:
+            retry_after = max(retry_after, load["estimated_wait_seconds"] - max_wait)
+        if retry_after:
+            raise Rejected("overloaded", retry_after)
+
+        # Per user before global, so one user's refused requests don't use up the global budget
+        if ADMISSION_USER_RATE_PER_MINUTE > 0:
+            wait = self.backend.take(f"user:{user_id}", ADMISSION_USER_RATE_PER_MINUTE / 60, ADMISSION_USER_BURST)
+            if wait:
+                raise Rejected("user_rate", wait)
+        if ADMISSION_GLOBAL_RATE_PER_SECOND > 0:
+            wait = self.backend.take(
+                "global", ADMISSION_GLOBAL_RATE_PER_SECOND, ADMISSION_GLOBAL_BURST,
+                reserve=(1 - share) * ADMISSION_GLOBAL_BURST,
+            )
+            if wait:
+                raise Rejected("global_rate", wait)
+
+    def _count(self, lane: str, result: str):
+        with self._lock:
+            self._counts[(lane, result)] = self._counts.get((lane, result), 0) + 1
+        metrics.ADMISSION.inc(lane=lane, result=result)
+
+    def stats(self) -> dict:
+        with self._lock:
+            counts = dict(self._counts)
+        load = self.load()
+        return {
+            "enabled": ADMISSION_ENABLED,
+            "in_flight": load["in_flight"],
+            "latency_seconds": load["latency_seconds"],
+            "estimated_wait_seconds": load["estimated_wait_seconds"],
+            "lanes": {
+                lane: {
+                    "share": share,
+                    "admitted": counts.get((lane, "admitted"), 0),
+                    "rejected": {
+                        reason: count for (counted_lane, reason), count in counts.items()
+                        if counted_lane == lane and reason != "admitted"
+                    },
+                }
+                for lane, share in LANES.items()
+            },
+        }
+
+
+def lane_for(user: models.User) -> str:
+    return "staff" if user.role in ["admin", "teacher"] else "student"
+
+
+async def user_in_flight(db, user_id: int) -> int:
+    """The user's submissions still waiting for their first grading."""
+    if not ADMISSION_ENABLED or ADMISSION_USER_MAX_IN_FLIGHT <= 0:
+        return 0
+    return (await db.execute(
+        select(func.count(models.Submission.id)).where(
+            models.Submission.user_id == user_id, models.Submission.status == "pending"
+        )
+    )).scalar()
+
+
+controller = AdmissionController()
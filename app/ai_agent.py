@@ -1,51 +1,161 @@
-from pydantic_ai import Agent
 from app.schemas import ScoreResponse
-from pydantic_ai.models.openrouter import OpenRouterModel
-from pydantic_ai.providers.openrouter import OpenRouterProvider
+from app import grading_cache, static_analysis, llm_client, model_routing, prompt_builder, metrics
 import os
-from dotenv import load_dotenv
+import asyncio
+import threading
+import time
 
-load_dotenv()
+SYSTEM_PROMPT = (
+    "You are an expert Python code reviewer and grader. "
+    "Your task is to evaluate a submitted Python script based on specific criteria provided. "
+    "You must return a JSON object with the following fields:\n"
+    "- 'score' (0-100): The overall grade for the submission\n"
+    "- 'feedback' (string): A brief overall summary of the submission\n"
+    "- 'strengths' (list of strings): 2-5 specific things the student did well\n"
+    "- 'weakpoints' (list of strings): 2-5 areas where the student can improve\n"
+    "- 'cheating_detected' (boolean): True if you detect signs of plagiarism, AI-generated code, or copied code from common sources\n"
+    "- 'cheating_reason' (string, optional): If cheating_detected is True, explain why\n"
+    "- 'reasoning' (string, optional): Your detailed thought process\n"
+    "- 'confidence' (0-1, optional): How confident you are that the score is right\n\n"
+    "CHEATING DETECTION GUIDELINES:\n"
+    "- Look for overly sophisticated code that doesn't match assignment complexity\n"
+    "- Check for unusual coding patterns or comments suggesting copy-paste\n"
+    "- Identify code that appears generated by AI tools (overly verbose, generic variable names)\n"
+    "- Note any suspiciously perfect or template-like solutions\n\n"
+    "Be fair, constructive, and strictly follow the criteria. "
+    "If the code fails to run or has syntax errors, give a low score and explain why. "
+    "The code has already been parsed locally; the 'Static Analysis' section summarizes its size and "
+    "structure, so there is no need to check syntax or count lines yourself. "
+    "Very long files are shortened to fit; omitted parts are marked with '# ...' comments. "
+    "Do not penalize the student for code you cannot see."
+)
+
+# The model client, agent and routing policy. pydantic_ai and the OpenAI SDK take
+# well over a second to import, so they are built on first use (see _components)
+# and processes that never call the model don't pay for them.
+_LAZY_ATTRIBUTES = ("provider", "model", "scoring_agent", "routing")
+_components = None
+_components_lock = threading.Lock()
+
+def _build() -> dict:
+    from dotenv import load_dotenv
+    from openai import AsyncOpenAI
+    from pydantic_ai import Agent
+    from pydantic_ai.models.openrouter import OpenRouterModel
+    from pydantic_ai.providers.openrouter import OpenRouterProvider
+
+    load_dotenv()
+
+    # Grading policy: the fast model grades everything, the strong one only the
+    # submissions the policy in model_routing escalates. An empty GRADING_STRONG_MODEL
+    # disables escalation.
+    fast_model_name = os.getenv("GRADING_FAST_MODEL", "google/gemini-2.5-flash-lite")
+    strong_model_name = os.getenv("GRADING_STRONG_MODEL", "google/gemini-2.5-pro")
 
-# Initialize the agent. 
-# You can customize the model parameter, e.g. "openai:gpt-4o" or just rely on default/env vars.
-# For now, we assume the user has configured the model via env vars or default behavior.
-model = OpenRouterModel(
-    model_name="google/gemini-2.5-flash-lite",
-    provider=OpenRouterProvider(
-        api_key=os.getenv("OPENROUTER_API_KEY")
+    # USD per million input,output tokens, for cost accounting
+    fast_model_price = model_routing.parse_price(os.getenv("GRADING_FAST_MODEL_PRICE", "0.10,0.40"))
+    strong_model_price = model_routing.parse_price(os.getenv("GRADING_STRONG_MODEL_PRICE", "1.25,10.00"))
+
+    provider = OpenRouterProvider(
+        # Retries are handled by llm_client, so the SDK's own are turned off
+        openai_client=AsyncOpenAI(
+            base_url="https://openrouter.ai/api/v1",
+            api_key=os.getenv("OPENROUTER_API_KEY"),
+            max_retries=0,
+        )
     )
-)
-scoring_agent = Agent(
-    model=model,
-    output_type=ScoreResponse,
-    system_prompt=(
-        "You are an expert Python code reviewer and grader. "
-        "Your task is to evaluate a submitted Python script based on specific criteria provided. "
-        "You must return a JSON object with the following fields:\n"
-        "- 'score' (0-100): The overall grade for the submission\n"
-        "- 'feedback' (string): A brief overall summary of the submission\n"
-        "- 'strengths' (list of strings): 2-5 specific things the student did well\n"
-        "- 'weakpoints' (list of strings): 2-5 areas where the student can improve\n"
-        "- 'cheating_detected' (boolean): True if you detect signs of plagiarism, AI-generated code, or copied code from common sources\n"
-        "- 'cheating_reason' (string, optional): If cheating_detected is True, explain why\n"
-        "- 'reasoning' (string, optional): Your detailed thought process\n\n"
-        "CHEATING DETECTION GUIDELINES:\n"
-        "- Look for overly sophisticated code that doesn't match assignment complexity\n"
-        "- Check for unusual coding patterns or comments suggesting copy-paste\n"
-        "- Identify code that appears generated by AI tools (overly verbose, generic variable names)\n"
-        "- Note any suspiciously perfect or template-like solutions\n\n"
-        "Be fair, constructive, and strictly follow the criteria. "
-        "If the code fails to run or has syntax errors, give a low score and explain why."
-    ),
-)
+    model = OpenRouterModel(model_name=fast_model_name, provider=provider)
+    scoring_agent = Agent(model=model, output_type=ScoreResponse, system_prompt=SYSTEM_PROMPT)
+
+    # Each tier gets its own client (rate limits, retries and circuit breaker are per model)
+    fast_tier = model_routing.ModelTier("fast", fast_model_name, model, llm_client.LLMClient(scoring_agent), fast_model_price)
+    strong_tier = None
+    if strong_model_name:
+        strong_tier = model_routing.ModelTier(
+            "strong", strong_model_name, OpenRouterModel(model_name=strong_model_name, provider=provider),
+            llm_client.LLMClient(scoring_agent), strong_model_price,
+        )
+    return {
+        "provider": provider,
+        "model": model,
+        "scoring_agent": scoring_agent,
+        "routing": model_routing.RoutingPolicy(fast_tier, strong_tier),
+    }
+
+def load() -> dict:
+    """Build the model client, agent and routing policy if that hasn't happened yet."""
+    global _components
+    if _components is None:
+        with _components_lock:
+            if _components is None:
+                _components = _build()
+    return _components
+
+def is_loaded() -> bool:
+    return _components is not None
+
+def __getattr__(name: str):
+    # ai_agent.scoring_agent, ai_agent.routing etc. build everything on first access
+    if name in _LAZY_ATTRIBUTES:
+        return load()[name]
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+
+# Gradings currently waiting on the model, so identical concurrent submissions share one call
+_in_flight = {}
+
+async def score_submission(code_content: str, criteria: str, on_partial=None) -> ScoreResponse:
+    """Grade code against the criteria. ``on_partial``, if given, is called with
+    partial ScoreResponse objects while the model is still generating."""
+    output, _ = await score_submission_with_usage(code_content, criteria, on_partial)
+    return output
+
+async def score_submission_with_usage(code_content: str, criteria: str, on_partial=None):
+    """Like ``score_submission``, but returns ``(output, usage)`` where usage holds
+    the tokens this call spent. Local, cached and shared gradings spend none."""
+    # Empty, non-Python and unparsable files are graded locally, without a model call
+    analysis = static_analysis.analyze(code_content)
+    local = static_analysis.local_result(analysis)
+    if local is not None:
+        return local, model_routing.usage_totals()
+
+    if not is_loaded():
+        # The first grading imports and builds the model client off the event loop
+        await asyncio.to_thread(load)
+    routing = load()["routing"]
+    key = grading_cache.cache_key(code_content, criteria, routing.key)
+    cached = await grading_cache.cache.get(key)
+    if cached is not None:
+        return cached, model_routing.usage_totals()
+
+    pending = _in_flight.get(key)
+    if pending is not None:
+        output, _ = await asyncio.shield(pending)
+        return output.model_copy(deep=True), model_routing.usage_totals()
+
+    task = asyncio.ensure_future(_run_agent(routing, code_content, criteria, analysis, on_partial))
+    _in_flight[key] = task
+    try:
+        output, usage = await asyncio.shield(task)
+    finally:
+        _in_flight.pop(key, None)
+    await grading_cache.cache.put(key, routing.key, output)
+    return output, usage
+
+async def _run_agent(routing: model_routing.RoutingPolicy, code_content: str, criteria: str, analysis, on_partial=None):
+    prompt = prompt_builder.builder.build(code_content, criteria, analysis)
+    return await routing.grade(lambda tier: _run_tier(tier, prompt.content, on_partial))
 
-async def score_submission(code_content: str, criteria: str) -> ScoreResponse:
-    prompt = f"### Criteria:\n{criteria}\n\n### Submitted Code:\n```python\n{code_content}\n```"
-    result = await scoring_agent.run(prompt)
-    print(f"DEBUG: Result Type: {type(result)}")
-    print(f"DEBUG: Result Dir: {dir(result)}")
+async def _run_tier(tier: model_routing.ModelTier, prompt: list, on_partial=None):
+    started = time.monotonic()
     try:
-        return result.output
-    except AttributeError:
-        raise ValueError(f"Result attributes: {dir(result)}")
+        result = await tier.client.run(prompt, on_partial=on_partial, model=tier.model)
+    except Exception as e:
+        metrics.LLM_CALLS.inc(tier=tier.name, outcome="error")
+        metrics.LLM_ERRORS.inc(tier=tier.name, error=type(e).__name__)
+        raise
+    finally:
+        metrics.LLM_LATENCY.observe(time.monotonic() - started, tier=tier.name)
+    metrics.LLM_CALLS.inc(tier=tier.name, outcome="success")
+    for kind, tokens in model_routing.usage_totals(result.usage).items():
+        metrics.LLM_TOKENS.inc(tokens, tier=tier.name, kind=kind.removesuffix("_tokens"))
+    return result.output, result.usage
@@ -0,0 +1,159 @@
+import hashlib
+import json
+import os
+import threading
+import time
+from collections import OrderedDict
+from email.utils import formatdate, parsedate_to_datetime
+
+from fastapi import Response
+
+from app import models, schemas, metrics
+
+# Upper bound on staleness when several worker processes serve the API: each
+# process only sees its own invalidations
+ASSIGNMENT_CACHE_TTL_SECONDS = int(os.getenv("ASSIGNMENT_CACHE_TTL_SECONDS", "300"))
+
+# Serialized responses kept (pages and field selections of the list, single assignments)
+ASSIGNMENT_CACHE_SIZE = int(os.getenv("ASSIGNMENT_CACHE_SIZE", "512"))
+
+ASSIGNMENT_FIELDS = tuple(schemas.AssignmentResponse.model_fields)
+
+
+class CachedResponse:
+    """A serialized response body with its validators."""
+
+    def __init__(self, body: bytes, last_modified: float, expires_at: float, next_cursor: int = None):
+        self.body = body
+        self.etag = '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+        self.last_modified = int(last_modified)  # HTTP dates have one-second resolution
+        self.expires_at = expires_at
+        self.next_cursor = next_cursor
+
+
+class AssignmentCache:
+    """In-process cache of the serialized assignment read responses.
+
+    All assignments are loaded in one query into a snapshot, and every page,
+    field selection and single assignment served is kept as ready-to-send
+    bytes. The write endpoints call ``invalidate`` after committing. An update or
+    delete drops that assignment's entry and every list entry; other
+    assignments' entries stay valid.
+
+    Used from threadpool endpoints, so state changes happen under a lock. A
+    generation counter keeps a read that raced with a write from storing what
+    it loaded before the write.
+    """
+
+    def __init__(self, ttl: int = ASSIGNMENT_CACHE_TTL_SECONDS, max_entries: int = ASSIGNMENT_CACHE_SIZE):
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._generation = 0
+        self._snapshot = None  # (expires_at, loaded_at, {id: response dict} in id order)
+        self._entries = OrderedDict()  # key -> CachedResponse
+
+    def get_assignment(self, db, assignment_id: int):
+        """The cached response for one assignment, or None if it doesn't exist."""
+        key = ("item", assignment_id)
+        entry, generation = self._lookup(key)
+        if entry is not None:
+            return entry
+        loaded_at, assignments = self._load(db, generation)
+        assignment = assignments.get(assignment_id)
+        if assignment is None:
+            return None
+        return self._store(key, generation, CachedResponse(_dumps(assignment), loaded_at, time.time() + self.ttl))
+
+    def list_assignments(self, db, cursor: int, limit: int, fields: tuple = None):
+        """One page of assignments with ``id >= cursor``, optionally only ``fields``."""
+        key = ("list", cursor, limit, fields)
+        entry, generation = self._lookup(key)
+        if entry is not None:
+            return entry
+        loaded_at, assignments = self._load(db, generation)
+        ids = [assignment_id for assignment_id in assignments if assignment_id >= cursor]
+        page = [assignments[assignment_id] for assignment_id in ids[:limit]]
+        if fields:
+            page = [{field: assignment[field] for field in fields} for assignment in page]
+        next_cursor = ids[limit] if len(ids) > limit else None
+        return self._store(key, generation, CachedResponse(_dumps(page), loaded_at, time.time() + self.ttl, next_cursor))
+
+    def invalidate(self, assignment_id: int = None):
+        """Call after committing a change to ``assignment_id`` (None for a new assignment)."""
+        with self._lock:
+            self._generation += 1
+            self._snapshot = None
+            for key in [key for key in self._entries if key[0] == "list" or key == ("item", assignment_id)]:
+                del self._entries[key]
+
+    def _lookup(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry.expires_at > time.time():
+                self._entries.move_to_end(key)
+                metrics.ASSIGNMENT_CACHE.inc(result="hit")
+                return entry, self._generation
+            metrics.ASSIGNMENT_CACHE.inc(result="miss")
+            return None, self._generation
+
+    def _load(self, db, generation: int):
+        with self._lock:
+            snapshot = self._snapshot
+        if snapshot is not None and snapshot[0] > time.time():
+            return snapshot[1], snapshot[2]
+
+        loaded_at = time.time()
+        rows = db.query(models.Assignment).order_by(models.Assignment.id).all()
+        assignments = {row.id: schemas.AssignmentResponse.model_validate(row).model_dump() for row in rows}
+        with self._lock:
+            if self._generation == generation:
+                self._snapshot = (loaded_at + self.ttl, loaded_at, assignments)
+        return loaded_at, assignments
+
+    def _store(self, key, generation: int, entry: CachedResponse) -> CachedResponse:
+        with self._lock:
+            if self._generation == generation:
+                self._entries[key] = entry
+                self._entries.move_to_end(key)
+                while len(self._entries) > self.max_entries:
+                    self._entries.popitem(last=False)
+        return entry
+
+
+cache = AssignmentCache()
+
+
+def _dumps(value) -> bytes:
+    # Same output as FastAPI's JSONResponse
+    return json.dumps(value, ensure_ascii=False, allow_nan=False, separators=(",", ":")).encode("utf-8")
+
+
+def _not_modified(request, entry: CachedResponse) -> bool:
+    if_none_match = request.headers.get("if-none-match")
+    if if_none_match is not None:
+        # If-None-Match wins over If-Modified-Since; weak comparison is enough for GET
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or entry.etag in tags
+    if_modified_since = request.headers.get("if-modified-since")
+    if if_modified_since is not None:
+        try:
+            return entry.last_modified <= parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+    return False
+
+
+def respond(request, entry: CachedResponse, headers: dict = None) -> Response:
+    """The cached body, or an empty 304 when the client's copy is current."""
+    headers = {
+        "ETag": entry.etag,
+        "Last-Modified": formatdate(entry.last_modified, usegmt=True),
+        # Clients may keep the response but must revalidate it before use
+        "Cache-Control": "no-cache",
+        **(headers or {}),
+    }
+    if _not_modified(request, entry):
+        metrics.ASSIGNMENT_CACHE.inc(result="not_modified")
+        return Response(status_code=304, headers=headers)
+    return Response(entry.body, media_type="application/json", headers=headers)
@@ -0,0 +1,145 @@
+import codecs
+import hashlib
+import mmap
+import os
+import tempfile
+import threading
+
+import zstandard
+
+# Directory of the content-addressed store of submitted source files
+BLOB_STORE_DIR = os.getenv("BLOB_STORE_DIR", "blobs")
+
+# zstd level of stored blobs. Higher levels gain little on source files this small.
+BLOB_COMPRESSION_LEVEL = int(os.getenv("BLOB_COMPRESSION_LEVEL", "3"))
+
+# Largest accepted .py file, single or inside a bulk archive; enforced while the upload is read
+MAX_SUBMISSION_BYTES = int(os.getenv("MAX_SUBMISSION_BYTES", str(1024 * 1024)))
+
+READ_CHUNK_BYTES = 64 * 1024
+
+
+class BlobTooLarge(ValueError):
+    pass
+
+
+class BlobStore:
+    """Content-addressed store of zstd-compressed blobs on the local filesystem.
+
+    A blob is keyed by the SHA-256 of its uncompressed bytes and lives at
+    ``<root>/<first two hex digits>/<rest>.zst``, so identical uploads from any
+    student or assignment are stored once. Writes go to a temporary file that is
+    renamed into place, so readers never see a partial blob. Blobs are
+    immutable and never deleted.
+    """
+
+    def __init__(self, root: str = BLOB_STORE_DIR, level: int = BLOB_COMPRESSION_LEVEL):
+        self.root = root
+        self.level = level
+        self._lock = threading.Lock()
+        # zstd contexts are costly to create and not thread-safe: one per thread
+        self._contexts = threading.local()
+        self._stored = 0
+        self._deduplicated = 0
+        self._bytes_in = 0
+        self._bytes_stored = 0
+        self._reads = 0
+
+    def path(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], f"{sha256[2:]}.zst")
+
+    def _codec(self) -> tuple:
+        """This thread's (compressor, decompressor)."""
+        codec = getattr(self._contexts, "codec", None)
+        if codec is None:
+            codec = self._contexts.codec = (zstandard.ZstdCompressor(level=self.level), zstandard.ZstdDecompressor())
+        return codec
+
+    def exists(self, sha256: str) -> bool:
+        return os.path.exists(self.path(sha256))
+
+    def put_stream(self, chunks, max_bytes: int = None) -> str:
+        """Store the concatenated ``chunks`` and return their SHA-256.
+
+        Chunks are hashed and compressed as they arrive, so only one is held in
+        memory. Raises ``BlobTooLarge`` as soon as more than ``max_bytes`` have
+        been read; nothing is stored then, nor if iterating ``chunks`` raises.
+        """
+        os.makedirs(self.root, exist_ok=True)
+        digest = hashlib.sha256()
+        compressor = self._codec()[0].compressobj()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        try:
+            with os.fdopen(fd, "wb") as tmp:
+                for chunk in chunks:
+                    size += len(chunk)
+                    if max_bytes is not None and size > max_bytes:
+                        raise BlobTooLarge(f"File larger than {max_bytes} bytes")
+                    digest.update(chunk)
+                    tmp.write(compressor.compress(chunk))
+                tmp.write(compressor.flush())
+                stored_size = tmp.tell()
+
+            sha256 = digest.hexdigest()
+            path = self.path(sha256)
+            deduplicated = os.path.exists(path)
+            if not deduplicated:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                # Atomic; a concurrent writer of the same content renames identical bytes
+                os.replace(tmp_path, path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+
+        with self._lock:
+            self._bytes_in += size
+            if deduplicated:
+                self._deduplicated += 1
+            else:
+                self._stored += 1
+                self._bytes_stored += stored_size
+        return sha256
+
+    def put(self, data: bytes) -> str:
+        return self.put_stream([data])
+
+    def put_text_file(self, file, max_bytes: int = MAX_SUBMISSION_BYTES) -> str:
+        """Store a UTF-8 text file read from the binary ``file`` in chunks.
+
+        Raises ``BlobTooLarge`` past ``max_bytes`` and ``UnicodeDecodeError`` for
+        anything that isn't UTF-8, without reading the rest of the file.
+        """
+        def chunks():
+            decoder = codecs.getincrementaldecoder("utf-8")()
+            while chunk := file.read(READ_CHUNK_BYTES):
+                decoder.decode(chunk)
+                yield chunk
+            decoder.decode(b"", final=True)
+
+        return self.put_stream(chunks(), max_bytes)
+
+    def get(self, sha256: str) -> bytes:
+        """The blob's bytes. The compressed file is memory-mapped rather than read
+        into a buffer, so bulk readers only pay for the decompressed copy."""
+        with open(self.path(sha256), "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            data = self._codec()[1].decompressobj().decompress(mapped)
+        with self._lock:
+            self._reads += 1
+        return data
+
+    def get_text(self, sha256: str) -> str:
+        return self.get(sha256).decode("utf-8")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "stored": self._stored,
+                "deduplicated": self._deduplicated,
+                "bytes_in": self._bytes_in,
+                "bytes_stored": self._bytes_stored,
+                "reads": self._reads,
+            }
+
+
+store = BlobStore()
@@ -0,0 +1,168 @@
+import asyncio
+import itertools
+import json
+import os
+import posixpath
+import zipfile
+
+from sqlalchemy.exc import IntegrityError
+
+from app import models, grading_queue, blob_store
+from app.blob_store import MAX_SUBMISSION_BYTES
+from app.database import SessionLocal, AsyncSessionLocal
+
+# Entries of one bulk upload graded at the same time
+BULK_GRADING_CONCURRENCY = int(os.getenv("BULK_GRADING_CONCURRENCY", "8"))
+
+# Grading tasks still running after their client disconnected
+_background = set()
+
+
+def matric_from_path(path: str) -> str:
+    """Archive entries are named after the student's matric number, e.g.
+    ``CSC/2024/001.py`` (folders allowed, since matric numbers contain slashes)."""
+    path = path.replace("\\", "/").removeprefix("./")
+    return path[:-3] if path.endswith(".py") else path
+
+
+def _skip(path: str) -> bool:
+    # Archive tool metadata rather than student work
+    name = posixpath.basename(path)
+    return path.startswith("__MACOSX/") or name.startswith(".")
+
+
+def queue_archive(fileobj, assignment_id: int) -> list:
+    """Read a zip of submissions entry by entry and create a pending submission and
+    grading job for each valid one. Blocking: run it in the threadpool.
+
+    Returns one dict per entry: queued entries carry ``submission_id``/``job_id``,
+    rejected ones a ``status`` of ``rejected`` and an ``error``. Raises
+    ``zipfile.BadZipFile`` if the upload is not a zip archive.
+    """
+    db = SessionLocal()
+    try:
+        return _queue_archive(fileobj, assignment_id, db)
+    finally:
+        db.close()
+
+
+def _queue_archive(fileobj, assignment_id, db):
+    entries = []
+    with zipfile.ZipFile(fileobj) as archive:
+        infos = [info for info in archive.infolist() if not info.is_dir() and not _skip(info.filename)]
+
+        # Resolve every student and existing submission up front with two queries
+        matrics = {matric_from_path(info.filename) for info in infos}
+        users = {
+            user.matric_number: user
+            for user in db.query(models.User).filter(models.User.matric_number.in_(matrics)).all()
+        }
+        submitted = {
+            user_id for (user_id,) in db.query(models.Submission.user_id).filter(
+                models.Submission.assignment_id == assignment_id,
+                models.Submission.user_id.in_([user.id for user in users.values()])
+            ).all()
+        }
+
+        for info in infos:
+            matric_number = matric_from_path(info.filename)
+            entry = {"file": info.filename, "matric_number": matric_number}
+            entries.append(entry)
+
+            user = users.get(matric_number)
+            error = None
+            if not info.filename.endswith(".py"):
+                error = "Not a Python file"
+            elif info.file_size > MAX_SUBMISSION_BYTES:
+                error = f"File larger than {MAX_SUBMISSION_BYTES} bytes"
+            elif not user:
+                error = "No student with this matric number"
+            elif user.id in submitted:
+                error = "Student has already submitted this assignment"
+            if error:
+                entry.update(status="rejected", error=error)
+                continue
+
+            # Entries are streamed into the blob store; the size in the zip header
+            # is not trusted, so the read itself is capped too.
+            try:
+                with archive.open(info) as member:
+                    blob_sha256 = blob_store.store.put_text_file(member)
+            except blob_store.BlobTooLarge as e:
+                entry.update(status="rejected", error=str(e))
+                continue
+            except UnicodeDecodeError:
+                entry.update(status="rejected", error="Invalid file format. Please upload a valid text/python file.")
+                continue
+
+            try:
+                with db.begin_nested():
+                    submission = models.Submission(assignment_id=assignment_id, user_id=user.id, status="pending", blob_sha256=blob_sha256)
+                    db.add(submission)
+                    db.flush()
+                    job = models.GradingJob(submission_id=submission.id)
+                    db.add(job)
+                    db.flush()
+            except IntegrityError:
+                # The student submitted on their own while the archive was being read
+                entry.update(status="rejected", error="Student has already submitted this assignment")
+                continue
+            submitted.add(user.id)
+            entry.update(submission_id=submission.id, job_id=job.id, status="pending")
+
+    db.commit()
+    return entries
+
+
+async def stream_results(entries: list):
+    """Grade queued entries concurrently and yield one NDJSON line per entry as
+    soon as it finishes, followed by a summary line."""
+    counts = {"graded": 0, "failed": 0, "rejected": 0}
+    semaphore = asyncio.Semaphore(BULK_GRADING_CONCURRENCY)
+    pending = [entry for entry in entries if entry["status"] == "pending"]
+    started = set()
+
+    async def grade(entry):
+        async with semaphore:
+            started.add(entry["job_id"])
+            await grading_queue.queue.grade(entry["job_id"])
+        return entry
+
+    tasks = []
+    try:
+        for entry in entries:
+            if entry["status"] == "rejected":
+                counts["rejected"] += 1
+                yield json.dumps(entry) + "\n"
+
+        tasks = [asyncio.ensure_future(grade(entry)) for entry in pending]
+        for finished in asyncio.as_completed(tasks):
+            result = await _result(await finished)
+            counts[result["status"]] = counts.get(result["status"], 0) + 1
+            yield json.dumps(result) + "\n"
+    finally:
+        # If the client disconnects, gradings under way finish in the background
+        # and the grading workers take over the ones not started yet
+        for entry, task in itertools.zip_longest(pending, tasks):
+            if entry["job_id"] not in started:
+                if task is not None:
+                    task.cancel()
+                grading_queue.queue.enqueue(entry["job_id"])
+            elif not task.done():
+                _background.add(task)
+                task.add_done_callback(_background.discard)
+
+    yield json.dumps({"done": True, "total": len(entries), **counts}) + "\n"
+
+
+async def _result(entry: dict) -> dict:
+    async with AsyncSessionLocal() as db:
+        submission = await db.get(models.Submission, entry["submission_id"])
+        job = await db.get(models.GradingJob, entry["job_id"])
+        return {
+            **entry,
+            "status": submission.status if submission else "failed",
+            "score": submission.score if submission else None,
+            "cheating_detected": bool(submission.cheating_detected) if submission else False,
+            "error": job.error if job else None,
+        }
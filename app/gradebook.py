@@ -0,0 +1,126 @@
+import csv
+import importlib.util
+import io
+import os
+
+from sqlalchemy import select
+
+from app import models
+from app.database import SessionLocal
+
+# Rows read from the server-side cursor and written out at a time (one Parquet row group each)
+GRADEBOOK_CHUNK_ROWS = int(os.getenv("GRADEBOOK_CHUNK_ROWS", "5000"))
+
+# Exportable columns: name -> (column, type). The type picks the Parquet column type;
+# CSV writes every value as text.
+COLUMNS = {
+    "submission_id": (models.Submission.id, "int"),
+    "user_id": (models.Submission.user_id, "int"),
+    "matric_number": (models.User.matric_number, "str"),
+    "student_name": (models.User.name, "str"),
+    "email": (models.User.email, "str"),
+    "status": (models.Submission.status, "str"),
+    "score": (models.Submission.score, "int"),
+    "tests_passed": (models.Submission.tests_passed, "int"),
+    "tests_total": (models.Submission.tests_total, "int"),
+    "test_pass_rate": (models.Submission.test_pass_rate, "float"),
+    "cheating_detected": (models.Submission.cheating_detected, "bool"),
+    "cheating_reason": (models.Submission.cheating_reason, "str"),
+    "feedback": (models.Submission.feedback, "str"),
+    "result_version": (models.Submission.result_version, "int"),
+    "input_tokens": (models.Submission.input_tokens, "int"),
+    "output_tokens": (models.Submission.output_tokens, "int"),
+    "submitted_at": (models.Submission.created_at, "datetime"),
+}
+
+DEFAULT_COLUMNS = (
+    "submission_id", "matric_number", "student_name", "email", "status", "score",
+    "tests_passed", "tests_total", "cheating_detected", "submitted_at",
+)
+
+MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "parquet": "application/vnd.apache.parquet",
+}
+
+
+def parquet_available() -> bool:
+    # pyarrow is only imported once a Parquet export is actually requested
+    return importlib.util.find_spec("pyarrow") is not None
+
+
+def _rows(assignment_id: int, columns: tuple):
+    """Chunks of up to GRADEBOOK_CHUNK_ROWS result rows, read on one server-side cursor."""
+    db = SessionLocal()
+    try:
+        query = select(*[COLUMNS[name][0] for name in columns]).select_from(models.Submission).outerjoin(
+            models.User, models.User.id == models.Submission.user_id
+        ).where(
+            models.Submission.assignment_id == assignment_id
+        ).order_by(models.Submission.id).execution_options(yield_per=GRADEBOOK_CHUNK_ROWS)
+        yield from db.execute(query).partitions()
+    finally:
+        db.close()
+
+
+def stream_csv(assignment_id: int, columns: tuple = DEFAULT_COLUMNS):
+    """Yield the gradebook as CSV text, a header line first and then a chunk of rows at a time."""
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(columns)
+    yield buffer.getvalue()
+    for rows in _rows(assignment_id, columns):
+        buffer.seek(0)
+        buffer.truncate()
+        writer.writerows(rows)
+        yield buffer.getvalue()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Write-only file that hands out what was written since the last ``drain``."""
+
+    def __init__(self):
+        self._chunks = []
+        self._position = 0
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, data) -> int:
+        self._chunks.append(bytes(data))
+        self._position += len(data)
+        return len(data)
+
+    def tell(self) -> int:
+        return self._position
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks = []
+        return data
+
+
+def stream_parquet(assignment_id: int, columns: tuple = DEFAULT_COLUMNS):
+    """Yield the gradebook as a Parquet file: one row group per chunk of rows, then the footer."""
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    types = {
+        "int": pa.int64(),
+        "str": pa.string(),
+        "float": pa.float64(),
+        "bool": pa.bool_(),
+        "datetime": pa.timestamp("us", tz="UTC"),
+    }
+    schema = pa.schema([(name, types[COLUMNS[name][1]]) for name in columns])
+    sink = _ChunkSink()
+    writer = pq.ParquetWriter(sink, schema, compression="zstd")
+    try:
+        for rows in _rows(assignment_id, columns):
+            writer.write_batch(pa.RecordBatch.from_arrays(
+                [pa.array(values, type=field.type) for values, field in zip(zip(*rows), schema)], schema=schema,
+            ))
+            yield sink.drain()
+    finally:
+        writer.close()
+    yield sink.drain()
@@ -0,0 +1,135 @@
+import ast
+import hashlib
+import os
+import time
+from collections import OrderedDict
+
+from sqlalchemy import delete
+
+from app import models
+from app.database import AsyncSessionLocal
+from app.schemas import ScoreResponse
+
+# In-memory tier size (entries) and time-to-live for both tiers
+GRADING_CACHE_SIZE = int(os.getenv("GRADING_CACHE_SIZE", "1024"))
+GRADING_CACHE_TTL_SECONDS = int(os.getenv("GRADING_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+
+# Expired rows are swept from the table every this many writes
+PURGE_EVERY = 100
+
+
+def normalize_source(code: str) -> str:
+    """Reduce source to a canonical form so formatting-only changes hash the same.
+
+    Parsable code is reduced to its AST dump, which drops comments, blank lines and
+    whitespace. Code that does not parse falls back to stripping trailing whitespace
+    and blank lines.
+    """
+    try:
+        return ast.dump(ast.parse(code), annotate_fields=False)
+    except (SyntaxError, ValueError):
+        lines = (line.rstrip() for line in code.replace("\r\n", "\n").split("\n"))
+        return "\n".join(line for line in lines if line)
+
+
+def cache_key(code: str, criteria: str, model_name: str) -> str:
+    digest = hashlib.sha256()
+    for part in (normalize_source(code), criteria.strip(), model_name):
+        digest.update(part.encode("utf-8"))
+        digest.update(b"\0")
+    return digest.hexdigest()
+
+
+class GradingCache:
+    """Two-tier cache of grading results: an in-memory LRU in front of the
+    ``grading_cache`` table. Both tiers expire entries after ``ttl`` seconds.
+
+    Used from the event loop only, so the memory tier needs no locking.
+    """
+
+    def __init__(self, max_entries: int = GRADING_CACHE_SIZE, ttl: int = GRADING_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # key -> (expires_at, ScoreResponse)
+        self._writes = 0
+        self.memory_hits = 0
+        self.db_hits = 0
+        self.misses = 0
+
+    async def get(self, key: str):
+        now = time.time()
+        entry = self._entries.get(key)
+        if entry is not None:
+            expires_at, result = entry
+            if expires_at > now:
+                self._entries.move_to_end(key)
+                self.memory_hits += 1
+                return result.model_copy(deep=True)
+            del self._entries[key]
+
+        async with AsyncSessionLocal() as db:
+            row = await db.get(models.GradingCacheEntry, key)
+        if row is None or row.expires_at <= now:
+            self.misses += 1
+            return None
+
+        result = ScoreResponse.model_validate_json(row.result)
+        self.db_hits += 1
+        self._remember(key, row.expires_at, result)
+        return result.model_copy(deep=True)
+
+    async def put(self, key: str, model_name: str, result: ScoreResponse):
+        expires_at = time.time() + self.ttl
+        self._remember(key, expires_at, result.model_copy(deep=True))
+        self._writes += 1
+
+        async with AsyncSessionLocal() as db:
+            await db.merge(models.GradingCacheEntry(
+                key=key,
+                model_name=model_name,
+                result=result.model_dump_json(),
+                expires_at=expires_at
+            ))
+            await db.commit()
+
+        if self._writes % PURGE_EVERY == 0:
+            await self.purge_expired()
+
+    async def purge_expired(self) -> int:
+        now = time.time()
+        for key in [k for k, (expires_at, _) in self._entries.items() if expires_at <= now]:
+            del self._entries[key]
+
+        async with AsyncSessionLocal() as db:
+            result = await db.execute(
+                delete(models.GradingCacheEntry).where(models.GradingCacheEntry.expires_at <= now)
+            )
+            await db.commit()
+            return result.rowcount
+
+    async def clear(self):
+        self._entries.clear()
+        async with AsyncSessionLocal() as db:
+            await db.execute(delete(models.GradingCacheEntry))
+            await db.commit()
+
+    def _remember(self, key, expires_at, result):
+        self._entries[key] = (expires_at, result)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        lookups = self.memory_hits + self.db_hits + self.misses
+        return {
+            "memory_entries": len(self._entries),
+            "max_memory_entries": self.max_entries,
+            "ttl_seconds": self.ttl,
+            "memory_hits": self.memory_hits,
+            "db_hits": self.db_hits,
+            "misses": self.misses,
+            "hit_rate": (self.memory_hits + self.db_hits) / lookups if lookups else None,
+        }
+
+
+cache = GradingCache()
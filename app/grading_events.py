@@ -0,0 +1,47 @@
+import asyncio
+
+# Undelivered events kept per subscriber; a slow reader loses the oldest partials first
+SUBSCRIBER_BUFFER = 64
+
+
+class GradingEvents:
+    """In-process publish/subscribe of grading progress, keyed by submission id.
+
+    Workers publish ``partial`` events (partial feedback as the model generates it)
+    and a terminal ``done`` or ``failed`` event. The latest partial is remembered,
+    so a client that subscribes mid-grading starts from it rather than from nothing.
+    """
+
+    def __init__(self):
+        self._subscribers = {}  # submission id -> set of asyncio.Queue
+        self._latest = {}  # submission id -> latest partial payload
+
+    def subscribe(self, submission_id: int) -> asyncio.Queue:
+        queue = asyncio.Queue(maxsize=SUBSCRIBER_BUFFER)
+        self._subscribers.setdefault(submission_id, set()).add(queue)
+        if submission_id in self._latest:
+            queue.put_nowait(("partial", self._latest[submission_id]))
+        return queue
+
+    def unsubscribe(self, submission_id: int, queue: asyncio.Queue):
+        queues = self._subscribers.get(submission_id)
+        if queues is not None:
+            queues.discard(queue)
+            if not queues:
+                del self._subscribers[submission_id]
+
+    def publish(self, submission_id: int, event: str, data: dict = None):
+        if event == "partial":
+            self._latest[submission_id] = data
+        else:
+            self._latest.pop(submission_id, None)
+        for queue in self._subscribers.get(submission_id, ()):
+            if queue.full():
+                queue.get_nowait()
+            queue.put_nowait((event, data))
+
+    def has_subscribers(self, submission_id: int) -> bool:
+        return bool(self._subscribers.get(submission_id))
+
+
+events = GradingEvents()
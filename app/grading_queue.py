@@ -0,0 +1,314 @@
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select, update
+
+from app import models, ai_agent, plagiarism, sandbox, grading_events, metrics, blob_store
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Number of submissions graded concurrently. Each worker holds one LLM call open.
+GRADING_WORKERS = int(os.getenv("GRADING_WORKERS", "4"))
+
+# How many finished jobs to keep for latency/throughput statistics
+STATS_WINDOW = 1000
+
+# Share of the final score that comes from the test case pass rate, when the
+# assignment has test cases; the model's score makes up the rest
+TEST_SCORE_WEIGHT = float(os.getenv("TEST_SCORE_WEIGHT", "0.7"))
+
+
+# Submission columns that make up a grading result, copied into each version in grading_results
+RESULT_FIELDS = (
+    "score", "feedback", "strengths", "weakpoints", "cheating_detected", "cheating_reason", "reasoning",
+    "tests_passed", "tests_total", "test_pass_rate", "test_results", "input_tokens", "output_tokens", "cache_read_tokens",
+)
+
+
+def blend_score(model_score: int, pass_rate: float) -> int:
+    return round(TEST_SCORE_WEIGHT * pass_rate * 100 + (1 - TEST_SCORE_WEIGHT) * model_score)
+
+
+def sha256(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+async def record_result(db, submission: models.Submission, criteria_sha256: str, grading_job_id: int = None):
+    """Store the submission's current result as its next version. Earlier versions are kept."""
+    latest = (await db.execute(
+        select(func.max(models.GradingResult.version)).where(models.GradingResult.submission_id == submission.id)
+    )).scalar()
+    result = models.GradingResult(
+        submission_id=submission.id,
+        version=(latest or 0) + 1,
+        code_sha256=submission.blob_sha256,
+        criteria_sha256=criteria_sha256,
+        grading_job_id=grading_job_id,
+        **{field: getattr(submission, field) for field in RESULT_FIELDS},
+    )
+    db.add(result)
+    submission.result_version = result.version
+    return result
+
+
+# Plagiarism indexing and storing results are serialized per assignment: a submission
+# is matched against every one indexed before it, including ones graded at the same
+# time, and a retroactive flag never races another result of the flagged submission
+_assignment_locks = weakref.WeakValueDictionary()  # assignment id -> asyncio.Lock
+
+
+def assignment_lock(assignment_id: int) -> asyncio.Lock:
+    return _assignment_locks.setdefault(assignment_id, asyncio.Lock())
+
+
+async def index_plagiarism(db, submission: models.Submission, code: str):
+    """Add the submission to its assignment's plagiarism index.
+
+    Classmates it matches that are already graded get flagged retroactively. The
+    flag is stored as a new version of their result, for the same criteria and
+    grading job as the current one, so the submission and its current result
+    never disagree.
+    """
+    async with assignment_lock(submission.assignment_id):
+        reverse_matches = await db.run_sync(plagiarism.index_submission, submission, code)
+
+        for match in reverse_matches:
+            if match.similarity < plagiarism.PLAGIARISM_FLAG_THRESHOLD:
+                continue
+            other = await db.get(models.Submission, match.submission_id, populate_existing=True)
+            if other is None or other.status != "graded":
+                # Not graded yet: its own grading picks the match up
+                continue
+            current = (await db.execute(
+                select(models.GradingResult).where(
+                    models.GradingResult.submission_id == other.id,
+                    models.GradingResult.version == other.result_version,
+                )
+            )).scalars().first()
+            if current is None:
+                continue
+            plagiarism.flag_cheating(other, [match])
+            await record_result(db, other, current.criteria_sha256, current.grading_job_id)
+            await db.commit()
+
+
+def apply_result(submission: models.Submission, result: models.GradingResult):
+    """Make an earlier version the submission's current result again."""
+    for field in RESULT_FIELDS:
+        setattr(submission, field, getattr(result, field))
+    submission.result_version = result.version
+    submission.status = "graded"
+
+
+async def mark_failed(job_id: int, error: str):
+    """Mark a grading job failed in a transaction of its own."""
+    async with AsyncSessionLocal() as db:
+        job = await db.get(models.GradingJob, job_id)
+        if job is None:
+            return
+        job.status = "failed"
+        job.error = error
+        job.finished_at = datetime.now(timezone.utc)
+        submission = await db.get(models.Submission, job.submission_id)
+        # A failed regrade leaves the previous result in place
+        if submission and submission.result_version is None:
+            submission.status = "failed"
+        await db.commit()
+
+
+class GradingQueue:
+    """In-process queue of grading jobs served by a bounded pool of async workers.
+
+    Jobs are persisted in the ``grading_jobs`` table before they are enqueued, so
+    anything still pending when the process stops is picked up again on the next
+    ``start()``.
+    """
+
+    def __init__(self, workers: int = GRADING_WORKERS):
+        self.workers = workers
+        self._queue = None
+        self._tasks = []
+        self._running = 0
+        self._completed = 0
+        self._failed = 0
+        # (finished monotonic time, run seconds, wait seconds) per finished job
+        self._history = deque(maxlen=STATS_WINDOW)
+
+    @property
+    def started(self) -> bool:
+        return bool(self._tasks)
+
+    async def start(self):
+        if self.started:
+            return
+        self._queue = asyncio.Queue()
+
+        # Recover jobs left behind by a previous process (including ones it was running)
+        async with AsyncSessionLocal() as db:
+            jobs = (await db.execute(
+                select(models.GradingJob).where(
+                    models.GradingJob.status.in_(["pending", "running"])
+                ).order_by(models.GradingJob.id)
+            )).scalars().all()
+            for job in jobs:
+                job.status = "pending"
+            await db.commit()
+            job_ids = [job.id for job in jobs]
+
+        for job_id in job_ids:
+            self._queue.put_nowait((job_id, time.monotonic()))
+        self._tasks = [asyncio.create_task(self._worker()) for _ in range(self.workers)]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        self._queue = None
+
+    def enqueue(self, job_id: int):
+        # When the workers are not running the job stays "pending" in the database
+        # and is recovered by the next start().
+        if self._queue is not None:
+            self._queue.put_nowait((job_id, time.monotonic()))
+
+    async def _worker(self):
+        while True:
+            job_id, enqueued_at = await self._queue.get()
+            try:
+                await self.grade(job_id, enqueued_at)
+            except Exception:
+                self._failed += 1
+                logger.exception("Grading job %s crashed", job_id)
+            finally:
+                self._queue.task_done()
+
+    async def grade(self, job_id: int, enqueued_at: float = None):
+        """Grade one pending job and store the result on its submission.
+
+        Used by the workers, and directly by callers that manage their own
+        concurrency (bulk uploads).
+        """
+        async with AsyncSessionLocal() as db:
+            # Claim the job atomically: the workers, bulk uploads and regrades can all reach the same job
+            claimed = (await db.execute(
+                update(models.GradingJob).where(
+                    models.GradingJob.id == job_id, models.GradingJob.status == "pending"
+                ).values(status="running")
+            )).rowcount
+            await db.commit()
+            if not claimed:
+                return
+
+            self._running += 1
+            started = time.monotonic()
+            submission_id = None
+            status = "failed"
+            try:
+                job = await db.get(models.GradingJob, job_id)
+                submission_id = job.submission_id
+                submission = await db.get(models.Submission, job.submission_id)
+                assignment = None
+                test_cases = []
+                if submission:
+                    assignment = await db.get(models.Assignment, submission.assignment_id)
+                    test_cases = (await db.execute(
+                        select(models.TestCase).where(
+                            models.TestCase.assignment_id == submission.assignment_id
+                        ).order_by(models.TestCase.id)
+                    )).scalars().all()
+
+                job.attempts += 1
+                job.started_at = datetime.now(timezone.utc)
+                await db.commit()
+
+                if not submission or not assignment:
+                    raise ValueError("Submission or assignment no longer exists")
+                if submission.blob_sha256 is None:
+                    raise ValueError("The submission's source was not kept")
+                code = await asyncio.to_thread(blob_store.store.get_text, submission.blob_sha256)
+                # Compare against classmates locally before asking the model
+                await index_plagiarism(db, submission, code)
+                # Partial feedback only for clients following the grading over SSE:
+                # streamed model calls can't be hedged
+                on_partial = None
+                if grading_events.events.has_subscribers(job.submission_id):
+                    def on_partial(output):
+                        grading_events.events.publish(job.submission_id, "partial", output.model_dump(mode="json"))
+                # Test cases run locally while the model grades
+                (score_result, usage), tests = await asyncio.gather(
+                    ai_agent.score_submission_with_usage(code, assignment.criteria, on_partial=on_partial),
+                    sandbox.run_test_cases(code, test_cases) if test_cases else asyncio.sleep(0),
+                )
+
+                submission.score = score_result.score
+                if tests:
+                    submission.score = blend_score(score_result.score, tests["pass_rate"])
+                    submission.tests_passed = tests["passed"]
+                    submission.tests_total = tests["total"]
+                    submission.test_pass_rate = tests["pass_rate"]
+                    submission.test_results = json.dumps(tests["results"])
+                else:
+                    # Regrades of an assignment whose test cases were removed
+                    submission.tests_passed = submission.tests_total = submission.test_pass_rate = submission.test_results = None
+                submission.feedback = score_result.feedback
+                submission.strengths = score_result.strengths
+                submission.weakpoints = score_result.weakpoints
+                submission.cheating_detected = score_result.cheating_detected
+                submission.cheating_reason = score_result.cheating_reason
+                submission.reasoning = score_result.reasoning
+                submission.input_tokens = usage["input_tokens"]
+                submission.output_tokens = usage["output_tokens"]
+                submission.cache_read_tokens = usage["cache_read_tokens"]
+                async with assignment_lock(submission.assignment_id):
+                    plagiarism.flag_cheating(submission, await db.run_sync(plagiarism.get_matches, submission.id))
+                    await record_result(db, submission, sha256(assignment.criteria), job.id)
+                    submission.status = "graded"
+                    job.status = "done"
+                    job.finished_at = datetime.now(timezone.utc)
+                    await db.commit()
+                status = "done"
+                self._completed += 1
+            except Exception as e:
+                # Whatever the session holds may be half-written: record the failure on its own
+                await db.rollback()
+                await mark_failed(job_id, str(e))
+                self._failed += 1
+            finally:
+                self._running -= 1
+                finished = time.monotonic()
+                waited = started - enqueued_at if enqueued_at is not None else 0.0
+                self._history.append((finished, finished - started, waited))
+                metrics.GRADING_DURATION.observe(finished - started, status=status)
+                metrics.GRADING_WAIT.observe(waited)
+                # Subscribers always get a final event, even if the failure couldn't be recorded
+                if submission_id is not None:
+                    grading_events.events.publish(submission_id, status)
+
+    def stats(self) -> dict:
+        history = list(self._history)
+        now = time.monotonic()
+        latencies = sorted(run for _, run, _ in history)
+        waits = [wait for _, _, wait in history]
+        return {
+            "workers": self.workers,
+            "queue_depth": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "completed": self._completed,
+            "failed": self._failed,
+            "throughput_per_minute": sum(1 for finished, _, _ in history if now - finished <= 60),
+            "avg_latency_seconds": sum(latencies) / len(latencies) if latencies else None,
+            "p95_latency_seconds": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+            "avg_wait_seconds": sum(waits) / len(waits) if waits else None,
+        }
+
+
+queue = GradingQueue()
@@ -0,0 +1,36 @@
+"""One-time database setup: run the migrations and create the default admin.
+
+    python -m app.init_db
+
+Run it once when deploying, and again after upgrading. It is safe to re-run. The
+API itself no longer touches the schema or seeds data on startup, so workers
+and short-lived containers start without a bcrypt hash or a migration check.
+"""
+from app import models, utils
+from app.database import SessionLocal, upgrade_database
+
+DEFAULT_ADMIN_EMAIL = "admin@example.com"
+DEFAULT_ADMIN_PASSWORD = "admin123"  # Change it after the first login!
+
+
+def seed_admin(email: str = DEFAULT_ADMIN_EMAIL, password: str = DEFAULT_ADMIN_PASSWORD) -> bool:
+    """Create the admin user unless it exists. Returns whether it was created."""
+    with SessionLocal() as db:
+        if db.query(models.User).filter(models.User.email == email).first():
+            return False
+        db.add(models.User(email=email, password=utils.hash(password), role="admin"))
+        db.commit()
+        return True
+
+
+def main():
+    upgrade_database()
+    print("Database schema is up to date")
+    if seed_admin():
+        print(f"Created default admin user: {DEFAULT_ADMIN_EMAIL}")
+    else:
+        print("Admin user already exists")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,250 @@
+import asyncio
+import os
+import random
+import time
+
+# Requests per second sent to the provider, with bursts of up to LLM_BURST
+LLM_RATE_PER_SECOND = float(os.getenv("LLM_RATE_PER_SECOND", "5"))
+LLM_BURST = int(os.getenv("LLM_BURST", "10"))
+
+# Per-attempt timeout and retry policy (exponential backoff with full jitter)
+LLM_TIMEOUT_SECONDS = float(os.getenv("LLM_TIMEOUT_SECONDS", "60"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "3"))
+LLM_RETRY_BASE_SECONDS = float(os.getenv("LLM_RETRY_BASE_SECONDS", "0.5"))
+LLM_RETRY_MAX_SECONDS = float(os.getenv("LLM_RETRY_MAX_SECONDS", "20"))
+
+# Send a second, identical request when the first hasn't answered after this
+# many seconds and keep whichever finishes first. 0 disables hedging.
+LLM_HEDGE_AFTER_SECONDS = float(os.getenv("LLM_HEDGE_AFTER_SECONDS", "0"))
+
+# Consecutive failures that open the circuit, and how long it stays open
+LLM_BREAKER_THRESHOLD = int(os.getenv("LLM_BREAKER_THRESHOLD", "5"))
+LLM_BREAKER_RESET_SECONDS = float(os.getenv("LLM_BREAKER_RESET_SECONDS", "30"))
+
+# Minimum interval between partial outputs passed to on_partial while streaming
+LLM_STREAM_DEBOUNCE_SECONDS = float(os.getenv("LLM_STREAM_DEBOUNCE_SECONDS", "0.1"))
+
+RETRYABLE_STATUS = {408, 409, 425, 429, 500, 502, 503, 504}
+
+
+class CircuitOpenError(RuntimeError):
+    """Raised without calling the provider while the circuit breaker is open."""
+
+
+class StreamedResult:
+    """Output and usage of a streamed run, mirroring the fields of ``AgentRunResult`` used here."""
+
+    def __init__(self, output, usage):
+        self.output = output
+        self.usage = usage
+
+
+class TokenBucket:
+    """Async token bucket: ``rate`` tokens per second, holding at most ``capacity``."""
+
+    def __init__(self, rate: float = LLM_RATE_PER_SECOND, capacity: int = LLM_BURST):
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self):
+        if self.rate <= 0:
+            return
+        # The lock keeps waiters in FIFO order
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+class CircuitBreaker:
+    """Fails fast after ``threshold`` consecutive failures.
+
+    After ``reset_after`` seconds one trial call is let through (half-open); its
+    outcome closes the circuit again or reopens it.
+    """
+
+    def __init__(self, threshold: int = LLM_BREAKER_THRESHOLD, reset_after: float = LLM_BREAKER_RESET_SECONDS):
+        self.threshold = threshold
+        self.reset_after = reset_after
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    @property
+    def state(self) -> str:
+        if self.opened_at is None:
+            return "closed"
+        if time.monotonic() - self.opened_at >= self.reset_after:
+            return "half_open"
+        return "open"
+
+    def before_call(self):
+        state = self.state
+        if state == "open" or (state == "half_open" and self._trial_running):
+            raise CircuitOpenError("Grading model unavailable: too many recent failures")
+        if state == "half_open":
+            self._trial_running = True
+
+    def record_success(self):
+        self.failures = 0
+        self.opened_at = None
+        self._trial_running = False
+
+    def record_failure(self):
+        self.failures += 1
+        if self._trial_running or self.failures >= self.threshold > 0:
+            self.opened_at = time.monotonic()
+        self._trial_running = False
+
+    def release_trial(self):
+        """The call ended without an outcome (e.g. cancelled): let the next one be the trial."""
+        self._trial_running = False
+
+
+def is_retryable(error: BaseException) -> bool:
+    # Imported here: pydantic_ai is slow to import and only loaded once a model is used
+    from pydantic_ai.exceptions import ModelAPIError, ModelHTTPError
+
+    if isinstance(error, ModelHTTPError):
+        return error.status_code in RETRYABLE_STATUS or error.status_code >= 500
+    # Timeouts and connection errors without an HTTP status
+    return isinstance(error, (asyncio.TimeoutError, ModelAPIError, ConnectionError))
+
+
+class LLMClient:
+    """Rate limiting, timeouts, retries, hedging and a circuit breaker around an
+    agent's ``run``.
+
+    The agent is called as-is, so ``agent.override(model=...)`` with a fake model
+    (e.g. pydantic_ai's ``FunctionModel``) works for offline testing.
+    """
+
+    def __init__(
+        self,
+        agent,
+        bucket: TokenBucket = None,
+        breaker: CircuitBreaker = None,
+        timeout: float = LLM_TIMEOUT_SECONDS,
+        max_retries: int = LLM_MAX_RETRIES,
+        retry_base: float = LLM_RETRY_BASE_SECONDS,
+        retry_max: float = LLM_RETRY_MAX_SECONDS,
+        hedge_after: float = LLM_HEDGE_AFTER_SECONDS,
+    ):
+        self.agent = agent
+        self.bucket = bucket or TokenBucket()
+        self.breaker = breaker or CircuitBreaker()
+        self.timeout = timeout
+        self.max_retries = max_retries
+        self.retry_base = retry_base
+        self.retry_max = retry_max
+        self.hedge_after = hedge_after
+        self.calls = 0
+        self.attempts = 0
+        self.retries = 0
+        self.timeouts = 0
+        self.hedges = 0
+        self.failures = 0
+        self.rejected = 0
+
+    async def run(self, prompt, on_partial=None, **kwargs):
+        """Run the agent on ``prompt`` (a string or a list of user content). With
+        ``on_partial``, the run is streamed and the callback gets each partially
+        validated output as it arrives (hedging is skipped)."""
+        self.calls += 1
+        try:
+            self.breaker.before_call()
+        except CircuitOpenError:
+            self.rejected += 1
+            raise
+
+        attempt = 0
+        while True:
+            try:
+                if on_partial is not None:
+                    result = await self._attempt(prompt, kwargs, on_partial)
+                else:
+                    result = await self._hedged(prompt, kwargs)
+            except Exception as e:
+                retryable = is_retryable(e)
+                if not retryable or attempt >= self.max_retries:
+                    self.failures += 1
+                    # Only provider trouble counts against the breaker, not e.g. a malformed answer
+                    if retryable:
+                        self.breaker.record_failure()
+                    else:
+                        self.breaker.record_success()
+                    raise
+                delay = random.uniform(0, min(self.retry_max, self.retry_base * 2 ** attempt))
+                # ModelHTTPError carries the provider's Retry-After
+                if getattr(e, "retry_after", None) is not None:
+                    delay = max(delay, min(e.retry_after, self.retry_max))
+                attempt += 1
+                self.retries += 1
+                await asyncio.sleep(delay)
+            except BaseException:
+                # Cancelled: no verdict on the provider, but a half-open trial must not stay claimed
+                self.breaker.release_trial()
+                raise
+            else:
+                self.breaker.record_success()
+                return result
+
+    async def _attempt(self, prompt, kwargs: dict, on_partial=None):
+        await self.bucket.acquire()
+        self.attempts += 1
+        call = self.agent.run(prompt, **kwargs) if on_partial is None else self._stream(prompt, kwargs, on_partial)
+        try:
+            return await asyncio.wait_for(call, timeout=self.timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise
+
+    async def _stream(self, prompt, kwargs: dict, on_partial):
+        async with self.agent.run_stream(prompt, **kwargs) as result:
+            async for partial in result.stream_output(debounce_by=LLM_STREAM_DEBOUNCE_SECONDS):
+                on_partial(partial)
+            output = await result.get_output()
+        return StreamedResult(output, result.usage)
+
+    async def _hedged(self, prompt, kwargs: dict):
+        if self.hedge_after <= 0:
+            return await self._attempt(prompt, kwargs)
+
+        pending = {asyncio.ensure_future(self._attempt(prompt, kwargs))}
+        error = None
+        try:
+            done, pending = await asyncio.wait(pending, timeout=self.hedge_after)
+            if not done:
+                self.hedges += 1
+                pending.add(asyncio.ensure_future(self._attempt(prompt, kwargs)))
+            while True:
+                for task in done:
+                    if task.exception() is None:
+                        return task.result()
+                    error = task.exception()
+                if not pending:
+                    raise error
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+        finally:
+            for task in pending:
+                task.cancel()
+
+    def stats(self) -> dict:
+        return {
+            "calls": self.calls,
+            "attempts": self.attempts,
+            "retries": self.retries,
+            "timeouts": self.timeouts,
+            "hedges": self.hedges,
+            "failures": self.failures,
+            "rejected": self.rejected,
+            "breaker_state": self.breaker.state,
+        }
@@ -1,14 +1,33 @@
-from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File
+from fastapi import FastAPI, Depends, HTTPException, status, UploadFile, File, Request, Query
 from fastapi.security import OAuth2PasswordRequestForm
 from fastapi.middleware.cors import CORSMiddleware
-from app.database import engine, get_db, Base
+from fastapi.responses import StreamingResponse, PlainTextResponse
+from fastapi.concurrency import run_in_threadpool
+from app.database import get_db, get_async_db, SessionLocal, engine, async_engine
+from sqlalchemy import inspect, select
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
-from app import models, schemas, utils, ai_agent, oauth2
-from typing import List
+from sqlalchemy.ext.asyncio import AsyncSession
+from app import models, schemas, utils, ai_agent, oauth2, grading_queue, grading_cache, plagiarism, bulk_grading, sandbox, grading_events, prompt_builder, metrics, assignment_cache, regrading, gradebook, fast_json, blob_store, admission
+from typing import List, Optional
+import asyncio
 import json
+import zipfile
 
-# Create tables
-Base.metadata.create_all(bind=engine)
+# Assignment listings: default/maximum page size
+ASSIGNMENT_PAGE_SIZE = 100
+MAX_ASSIGNMENT_PAGE_SIZE = 1000
+
+# Submission listings: default/maximum page size and rows serialized per streamed chunk
+SUBMISSION_PAGE_SIZE = 100
+MAX_SUBMISSION_PAGE_SIZE = 1000
+SUBMISSION_STREAM_CHUNK = 200
+
+# Keys of each stored test result that submission responses include
+TEST_RESULT_FIELDS = tuple(schemas.TestCaseResult.model_fields)
+
+# Comment lines sent on idle grading event streams so proxies keep them open
+SSE_KEEPALIVE_SECONDS = 15
 
 # Tags metadata for Swagger UI organization
 tags_metadata = [
@@ -28,6 +47,10 @@ tags_metadata = [
         "name": "Submissions",
         "description": "Submit code and view **AI-graded results** with detailed feedback and plagiarism detection.",
     },
+    {
+        "name": "Monitoring",
+        "description": "Prometheus metrics for requests, database queries, model calls and the grading queue.",
+    },
 ]
 
 app = FastAPI(
@@ -55,46 +78,79 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+# Outermost, so the latency it records includes the other middleware
+app.add_middleware(metrics.MetricsMiddleware)
+
+metrics.instrument_engine(engine, "sync")
+metrics.instrument_engine(async_engine.sync_engine, "async")
 
 @app.on_event("startup")
 def startup_event():
-    # Create default admin user if not exists
-    db = next(get_db())
-    admin_email = "admin@example.com"
-    user = db.query(models.User).filter(models.User.email == admin_email).first()
-    if not user:
-        hashed_password = utils.hash("admin123")
-        new_admin = models.User(email=admin_email, password=hashed_password, role="admin")
-        db.add(new_admin)
-        db.commit()
-        print(f"Created default admin user: {admin_email}")
-    else:
-        print("Admin user already exists")
+    # Migrations and the default admin are set up once by `python -m app.init_db`,
+    # not on every boot; this only checks that it has been run
+    if not inspect(engine).has_table("alembic_version"):
+        raise RuntimeError("Database is not initialized: run `python -m app.init_db` first")
+
+@app.on_event("startup")
+async def start_grading_workers():
+    await grading_queue.queue.start()
+
+@app.on_event("startup")
+async def start_regrade_jobs():
+    # After the grading workers, which recover the grading jobs of interrupted regrades
+    await regrading.runner.start()
+
+@app.on_event("shutdown")
+async def stop_regrade_jobs():
+    await regrading.runner.stop()
+
+@app.on_event("shutdown")
+async def stop_grading_workers():
+    await grading_queue.queue.stop()
+
+@app.on_event("shutdown")
+async def stop_sandbox_workers():
+    await sandbox.pool.stop()
+
+@app.on_event("shutdown")
+def stop_password_hashers():
+    utils.shutdown_pool()
 
 @app.post("/login", response_model=schemas.Token, tags=["Authentication"], summary="Login and Get Token")
-def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = db.query(models.User).filter(models.User.email == user_credentials.username).first()
+async def login(user_credentials: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_async_db)):
+    user = (await db.execute(
+        select(models.User).where(models.User.email == user_credentials.username)
+    )).scalars().first()
     if not user:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Credentials")
     
-    if not utils.verify(user_credentials.password, user.password):
+    # bcrypt runs in the password hashing pool, not on the request thread
+    valid, new_hash = await utils.verify_and_update_async(user_credentials.password, user.password)
+    if not valid:
         raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Invalid Credentials")
+
+    # Transparently upgrade hashes made with an outdated scheme or cost factor
+    if new_hash:
+        user.password = new_hash
+        await db.commit()
     
-    access_token = oauth2.create_access_token(data={"sub": user.email})
+    access_token = oauth2.create_access_token(data={"sub": user.email, "user_id": user.id})
     return {"access_token": access_token, "token_type": "bearer"}
 
 @app.post("/users/", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED, tags=["Users"], summary="Create User (Admin Only)", description="Create a new Teacher or Admin. Only existing Admins can perform this action.")
-def create_user(user: schemas.UserCreate, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+async def create_user(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(oauth2.get_current_user)):
     # Only admin can create users (teachers or other admins)
     if current_user.role != "admin":
         raise HTTPException(status_code=403, detail="Only admin can create users")
     
     # Check if user exists
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+    existing_user = (await db.execute(
+        select(models.User.id).where(models.User.email == user.email)
+    )).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = utils.hash(user.password)
+    hashed_password = await utils.hash_async(user.password)
     
     # Ensure teachers/admins don't have matric numbers
     matric_number = user.matric_number
@@ -109,19 +165,21 @@ def create_user(user: schemas.UserCreate, db: Session = Depends(get_db), current
         role=user.role
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @app.post("/register", response_model=schemas.UserResponse, status_code=status.HTTP_201_CREATED, tags=["Users"], summary="Student Registration", description="Public endpoint for students to register with their name and matric number.")
-def register_student(user: schemas.UserCreate, db: Session = Depends(get_db)):
+async def register_student(user: schemas.UserCreate, db: AsyncSession = Depends(get_async_db)):
     # Public endpoint for student self-registration
     # Force role to be student for security
-    existing_user = db.query(models.User).filter(models.User.email == user.email).first()
+    existing_user = (await db.execute(
+        select(models.User.id).where(models.User.email == user.email)
+    )).first()
     if existing_user:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = utils.hash(user.password)
+    hashed_password = await utils.hash_async(user.password)
     new_user = models.User(
         email=user.email, 
         password=hashed_password, 
@@ -130,8 +188,8 @@ def register_student(user: schemas.UserCreate, db: Session = Depends(get_db)):
         role="student"
     )
     db.add(new_user)
-    db.commit()
-    db.refresh(new_user)
+    await db.commit()
+    await db.refresh(new_user)
     return new_user
 
 @app.get("/users/me", response_model=schemas.UserResponse, tags=["Users"], summary="Get Current User Profile", description="Retrieve details of the currently logged-in user.")
@@ -147,19 +205,37 @@ def create_assignment(assignment: schemas.AssignmentCreate, db: Session = Depend
     db.add(new_assignment)
     db.commit()
     db.refresh(new_assignment)
+    assignment_cache.cache.invalidate()
     return new_assignment
 
-@app.get("/assignments/", response_model=List[schemas.AssignmentResponse], tags=["Assignments"], summary="List All Assignments", description="Retrieve a list of all available assignments.")
-def get_assignments(db: Session = Depends(get_db)):
-    assignments = db.query(models.Assignment).all()
-    return assignments
+@app.get("/assignments/", response_model=List[schemas.AssignmentResponse], tags=["Assignments"], summary="List All Assignments", description="Retrieve the available assignments, ordered by id. Results are paginated: pass the `X-Next-Cursor` response header back as `cursor` to get the next page. `fields` selects a comma-separated subset of the fields (e.g. `id,title`). Responses carry `ETag` and `Last-Modified`; send them back as `If-None-Match`/`If-Modified-Since` to get `304 Not Modified` while nothing changed.")
+def get_assignments(
+    request: Request,
+    cursor: int = 0,
+    limit: int = Query(ASSIGNMENT_PAGE_SIZE, ge=1, le=MAX_ASSIGNMENT_PAGE_SIZE),
+    fields: Optional[str] = None,
+    db: Session = Depends(get_db),
+):
+    selected = None
+    if fields:
+        selected = tuple(dict.fromkeys(field.strip() for field in fields.split(",") if field.strip()))
+        unknown = [field for field in selected if field not in assignment_cache.ASSIGNMENT_FIELDS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown fields: {', '.join(unknown)}. Available: {', '.join(assignment_cache.ASSIGNMENT_FIELDS)}")
 
-@app.get("/assignments/{id}", response_model=schemas.AssignmentResponse, tags=["Assignments"], summary="Get Assignment Details", description="Retrieve details of a specific assignment by ID.")
-def get_assignment(id: int, db: Session = Depends(get_db)):
-    assignment = db.query(models.Assignment).filter(models.Assignment.id == id).first()
-    if not assignment:
+    entry = assignment_cache.cache.list_assignments(db, cursor, limit, selected)
+    headers = {}
+    if entry.next_cursor is not None:
+        headers["X-Next-Cursor"] = str(entry.next_cursor)
+        headers["Link"] = f'<{request.url.include_query_params(cursor=entry.next_cursor)}>; rel="next"'
+    return assignment_cache.respond(request, entry, headers)
+
+@app.get("/assignments/{id}", response_model=schemas.AssignmentResponse, tags=["Assignments"], summary="Get Assignment Details", description="Retrieve details of a specific assignment by ID. Supports conditional requests like the list.")
+def get_assignment(id: int, request: Request, db: Session = Depends(get_db)):
+    entry = assignment_cache.cache.get_assignment(db, id)
+    if entry is None:
         raise HTTPException(status_code=404, detail="Assignment not found")
-    return assignment
+    return assignment_cache.respond(request, entry)
 
 @app.put("/assignments/{id}", response_model=schemas.AssignmentResponse, tags=["Assignments"], summary="Update Assignment", description="Update details of an existing assignment. Admin/Teacher only.")
 def update_assignment(id: int, assignment_update: schemas.AssignmentUpdate, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
@@ -178,6 +254,7 @@ def update_assignment(id: int, assignment_update: schemas.AssignmentUpdate, db:
     
     db.commit()
     db.refresh(assignment)
+    assignment_cache.cache.invalidate(id)
     return assignment
 
 @app.delete("/assignments/{id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Assignments"], summary="Delete Assignment", description="Permanently delete an assignment. Admin/Teacher only.")
@@ -189,103 +266,504 @@ def delete_assignment(id: int, db: Session = Depends(get_db), current_user: mode
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
     
+    db.query(models.TestCase).filter(models.TestCase.assignment_id == id).delete()
     db.delete(assignment)
     db.commit()
+    assignment_cache.cache.invalidate(id)
     return None
 
-@app.post("/assignments/{id}/submit", response_model=schemas.SubmissionResponse, tags=["Submissions"], summary="Submit Code", description="Upload a Python file for automated grading. Returns detailed feedback.")
-async def submit_assignment(id: int, file: UploadFile = File(...), db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
-    assignment = db.query(models.Assignment).filter(models.Assignment.id == id).first()
+@app.post("/assignments/{id}/tests", response_model=schemas.TestCaseResponse, status_code=status.HTTP_201_CREATED, tags=["Assignments"], summary="Add Test Case (Admin/Teacher)", description="Attach a test case to an assignment. `io` test cases feed `stdin` to the program and compare its output with `expected_output`; `pytest` test cases run the `test_*` functions in `test_code` against the submission (importable as `solution`). Submissions run in a sandbox and the weighted pass rate feeds the score.")
+def create_test_case(id: int, test_case: schemas.TestCaseCreate, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    if current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to edit assignments")
+    if not db.get(models.Assignment, id):
+        raise HTTPException(status_code=404, detail="Assignment not found")
+
+    new_test_case = models.TestCase(assignment_id=id, **test_case.dict())
+    db.add(new_test_case)
+    db.commit()
+    db.refresh(new_test_case)
+    return new_test_case
+
+@app.get("/assignments/{id}/tests", response_model=List[schemas.TestCaseResponse], tags=["Assignments"], summary="List Test Cases (Admin/Teacher)", description="List the test cases of an assignment, including expected outputs.")
+def get_test_cases(id: int, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    if current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view test cases")
+    return db.query(models.TestCase).filter(models.TestCase.assignment_id == id).order_by(models.TestCase.id).all()
+
+@app.delete("/assignments/{id}/tests/{test_case_id}", status_code=status.HTTP_204_NO_CONTENT, tags=["Assignments"], summary="Delete Test Case (Admin/Teacher)", description="Remove a test case from an assignment. Existing results are kept.")
+def delete_test_case(id: int, test_case_id: int, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    if current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to edit assignments")
+    test_case = db.get(models.TestCase, test_case_id)
+    if not test_case or test_case.assignment_id != id:
+        raise HTTPException(status_code=404, detail="Test case not found")
+    db.delete(test_case)
+    db.commit()
+    return None
+
+@app.get("/assignments/{id}/gradebook", response_class=StreamingResponse, tags=["Assignments"], summary="Export Gradebook (Admin/Teacher)", description="Download one row per submission of the assignment as `csv` or `parquet` (`format`). `columns` selects a comma-separated subset and order of the columns. The file is streamed as it is read from the database, so exports of any size use constant memory.")
+def export_gradebook(
+    id: int,
+    format: str = Query("csv", pattern="^(csv|parquet)$"),
+    columns: Optional[str] = None,
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.get_current_user),
+):
+    if current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to export gradebooks")
+    if not db.get(models.Assignment, id):
+        raise HTTPException(status_code=404, detail="Assignment not found")
+
+    selected = gradebook.DEFAULT_COLUMNS
+    if columns:
+        selected = tuple(dict.fromkeys(column.strip() for column in columns.split(",") if column.strip())) or selected
+        unknown = [column for column in selected if column not in gradebook.COLUMNS]
+        if unknown:
+            raise HTTPException(status_code=400, detail=f"Unknown columns: {', '.join(unknown)}. Available: {', '.join(gradebook.COLUMNS)}")
+    if format == "parquet" and not gradebook.parquet_available():
+        raise HTTPException(status_code=501, detail="Parquet export needs the pyarrow package")
+
+    rows = gradebook.stream_parquet(id, selected) if format == "parquet" else gradebook.stream_csv(id, selected)
+    return StreamingResponse(rows, media_type=gradebook.MEDIA_TYPES[format], headers={
+        "Content-Disposition": f'attachment; filename="assignment-{id}-gradebook.{format}"',
+    })
+
+def _regrade_job_response(job: models.RegradeJob) -> schemas.RegradeJobResponse:
+    if job.total:
+        progress = job.processed / job.total
+    else:
+        progress = 1.0 if job.status == "done" else 0.0
+    return schemas.RegradeJobResponse(
+        id=job.id,
+        assignment_id=job.assignment_id,
+        status=job.status,
+        total=job.total,
+        processed=job.processed,
+        regraded=job.regraded,
+        skipped=job.skipped,
+        failed=job.failed,
+        progress=round(progress, 4),
+        error=job.error,
+        created_at=job.created_at,
+        started_at=job.started_at,
+        finished_at=job.finished_at,
+    )
+
+def _admit(current_user: models.User, user_in_flight: int = 0):
+    """Refuse a grading request with 429 and Retry-After when admission control says so."""
+    try:
+        admission.controller.check(current_user.id, admission.lane_for(current_user), user_in_flight)
+    except admission.Rejected as e:
+        raise HTTPException(
+            status_code=429,
+            detail=f"Too many grading requests ({e.reason}). Retry in {e.retry_after} seconds.",
+            headers={"Retry-After": str(e.retry_after)},
+        )
+
+@app.post("/assignments/{id}/regrades", response_model=schemas.RegradeJobResponse, status_code=status.HTTP_202_ACCEPTED, tags=["Assignments"], summary="Regrade Submissions (Admin/Teacher)", description="Start a background job that regrades the assignment's graded submissions against its current criteria, e.g. after changing them. Submissions that already have a result for their code and these criteria are skipped. Previous results are kept as earlier versions. Returns the already running job if there is one; follow it at `/assignments/{id}/regrades/{job_id}`.")
+async def create_regrade(id: int, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    if current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to regrade submissions")
+    assignment = await db.get(models.Assignment, id)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    _admit(current_user)
+    job = await regrading.request_regrade(db, assignment)
+    regrading.runner.run(job.id)
+    return _regrade_job_response(job)
+
+@app.get("/assignments/{id}/regrades/{job_id}", response_model=schemas.RegradeJobResponse, tags=["Assignments"], summary="Regrade Progress (Admin/Teacher)", description="Progress of a regrade job: submissions processed out of `total`, and how many were regraded, skipped (a result for the same code and criteria existed) or failed.")
+async def get_regrade(id: int, job_id: int, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    if current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view regrades")
+    job = await db.get(models.RegradeJob, job_id)
+    if not job or job.assignment_id != id:
+        raise HTTPException(status_code=404, detail="Regrade job not found")
+    return _regrade_job_response(job)
+
+async def _accept_submission(id: int, file: UploadFile, db: AsyncSession, current_user: models.User):
+    """Validate an upload and store it as a pending submission with its grading job."""
+    assignment = await db.get(models.Assignment, id)
     if not assignment:
         raise HTTPException(status_code=404, detail="Assignment not found")
 
     # Check validation: One submission per user per assignment
-    existing_submission = db.query(models.Submission).filter(
-        models.Submission.assignment_id == id,
-        models.Submission.user_id == current_user.id
-    ).first()
+    existing_submission = (await db.execute(
+        select(models.Submission.id).where(
+            models.Submission.assignment_id == id,
+            models.Submission.user_id == current_user.id
+        ).limit(1)
+    )).first()
     
     if existing_submission:
         raise HTTPException(status_code=400, detail="You have already submitted this assignment.")
+    _admit(current_user, await admission.user_in_flight(db, current_user.id))
 
-    # Read file content
-    content = await file.read()
+    # Stream the upload into the blob store, off the event loop
     try:
-        code_str = content.decode('utf-8')
+        blob_sha256 = await run_in_threadpool(blob_store.store.put_text_file, file.file)
+    except blob_store.BlobTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
     except UnicodeDecodeError:
         raise HTTPException(status_code=400, detail="Invalid file format. Please upload a valid text/python file.")
 
-    # Score using AI Agent
+    # Persist the submission as pending and hand it to the grading workers
+    new_submission = models.Submission(
+        assignment_id=id,
+        user_id=current_user.id,
+        status="pending",
+        blob_sha256=blob_sha256,
+    )
+    db.add(new_submission)
     try:
-        score_result = await ai_agent.score_submission(code_str, assignment.criteria)
-        
-        # Save submission to database (serialize lists as JSON strings)
-        new_submission = models.Submission(
-            assignment_id=id,
-            user_id=current_user.id,
-            score=score_result.score,
-            feedback=score_result.feedback,
-            strengths=json.dumps(score_result.strengths),
-            weakpoints=json.dumps(score_result.weakpoints),
-            cheating_detected=score_result.cheating_detected,
-            cheating_reason=score_result.cheating_reason,
-            reasoning=score_result.reasoning
-        )
-        db.add(new_submission)
-        db.commit()
-        db.refresh(new_submission)
-        
-        # Return with proper list conversion
-        return schemas.SubmissionResponse(
-            id=new_submission.id,
-            assignment_id=new_submission.assignment_id,
-            user_id=new_submission.user_id,
-            student_name=current_user.name,
-            matric_number=current_user.matric_number,
-            score=new_submission.score,
-            feedback=new_submission.feedback,
-            strengths=json.loads(new_submission.strengths) if new_submission.strengths else [],
-            weakpoints=json.loads(new_submission.weakpoints) if new_submission.weakpoints else [],
-            cheating_detected=new_submission.cheating_detected,
-            cheating_reason=new_submission.cheating_reason,
-            reasoning=new_submission.reasoning,
-            created_at=new_submission.created_at
-        )
-    except Exception as e:
-        raise HTTPException(status_code=500, detail=f"Error scoring submission: {str(e)}")
+        await db.flush()
+    except IntegrityError:
+        # Lost a race with a concurrent upload by the same user
+        await db.rollback()
+        raise HTTPException(status_code=400, detail="You have already submitted this assignment.")
+    job = models.GradingJob(submission_id=new_submission.id)
+    db.add(job)
+    await db.commit()
+    return new_submission, job
+
+@app.post("/assignments/{id}/submit", response_model=schemas.SubmissionAccepted, status_code=status.HTTP_202_ACCEPTED, tags=["Submissions"], summary="Submit Code", description="Upload a Python file for automated grading. The submission is queued and graded in the background; poll `/submissions/{id}/status` or follow `/submissions/{id}/events` for the result. Returns `429` with `Retry-After` when the user or the grading service is over its limits.")
+async def submit_assignment(id: int, file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    new_submission, job = await _accept_submission(id, file, db, current_user)
+    grading_queue.queue.enqueue(job.id)
+    return schemas.SubmissionAccepted(submission_id=new_submission.id, job_id=job.id, status=new_submission.status)
+
+@app.post("/assignments/{id}/submit/stream", response_class=StreamingResponse, tags=["Submissions"], summary="Submit Code (Streaming)", description="Same as Submit Code, but the response is a Server-Sent Events stream of the grading: a `status` event right away, `partial` events with the feedback, strengths and weakpoints generated so far, and finally a `result` event with the stored submission (or an `error` event).")
+async def submit_assignment_stream(id: int, request: Request, file: UploadFile = File(...), db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    new_submission, job = await _accept_submission(id, file, db, current_user)
+    # Subscribe before enqueueing so no event can be missed
+    events = grading_events.events.subscribe(new_submission.id)
+    grading_queue.queue.enqueue(job.id)
+    return _event_stream_response(request, new_submission.id, events)
+
+@app.post("/assignments/{id}/submit/bulk", response_class=StreamingResponse, tags=["Submissions"], summary="Bulk Submit (Admin/Teacher)", description="Upload a zip of `.py` files named after each student's matric number (e.g. `CSC/2024/001.py`). Entries are graded concurrently and results are streamed back as NDJSON, one line per file as it finishes, followed by a summary line.")
+async def bulk_submit_assignment(id: int, archive: UploadFile = File(...), db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    if current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to bulk submit")
+
+    assignment = await db.get(models.Assignment, id)
+    if not assignment:
+        raise HTTPException(status_code=404, detail="Assignment not found")
+    _admit(current_user)
+
+    # Entries are read one at a time from the spooled upload, off the event loop
+    try:
+        entries = await run_in_threadpool(bulk_grading.queue_archive, archive.file, id)
+    except zipfile.BadZipFile:
+        raise HTTPException(status_code=400, detail="Invalid archive. Please upload a zip file.")
+
+    return StreamingResponse(bulk_grading.stream_results(entries), media_type="application/x-ndjson")
+
+def _submission_row(s: models.Submission, student_name=None, matric_number=None, matches=()) -> dict:
+    """A submission as plain data in the shape of ``SubmissionResponse``, without building the model."""
+    return {
+        "id": s.id,
+        "assignment_id": s.assignment_id,
+        "user_id": s.user_id,
+        "student_name": student_name,
+        "matric_number": matric_number,
+        "score": s.score,
+        "feedback": s.feedback,
+        "strengths": s.strengths or [],
+        "weakpoints": s.weakpoints or [],
+        "cheating_detected": s.cheating_detected or False,
+        "cheating_reason": s.cheating_reason,
+        "reasoning": s.reasoning,
+        "similar_submissions": [
+            {"submission_id": m.matched_submission_id, "similarity": m.similarity} for m in matches
+        ],
+        "tests_passed": s.tests_passed,
+        "tests_total": s.tests_total,
+        "test_results": [
+            {field: result.get(field) for field in TEST_RESULT_FIELDS} for result in fast_json.loads(s.test_results)
+        ] if s.test_results else [],
+        "input_tokens": s.input_tokens,
+        "output_tokens": s.output_tokens,
+        "cache_read_tokens": s.cache_read_tokens,
+        "result_version": s.result_version,
+        "status": s.status,
+        "created_at": s.created_at,
+    }
+
+def _submission_response(s: models.Submission, student_name=None, matric_number=None, matches=()) -> schemas.SubmissionResponse:
+    """Build a submission response from a row and its already-loaded student info and matches."""
+    return schemas.SubmissionResponse(**_submission_row(s, student_name, matric_number, matches))
 
 def _build_submission_response(s: models.Submission, db: Session) -> schemas.SubmissionResponse:
     """Helper function to build submission response with student info."""
     user = db.query(models.User).filter(models.User.id == s.user_id).first()
-    return schemas.SubmissionResponse(
-        id=s.id,
-        assignment_id=s.assignment_id,
-        user_id=s.user_id,
-        student_name=user.name if user else None,
-        matric_number=user.matric_number if user else None,
-        score=s.score,
-        feedback=s.feedback,
-        strengths=json.loads(s.strengths) if s.strengths else [],
-        weakpoints=json.loads(s.weakpoints) if s.weakpoints else [],
-        cheating_detected=s.cheating_detected or False,
-        cheating_reason=s.cheating_reason,
-        reasoning=s.reasoning,
-        created_at=s.created_at
-    )
+    matches = plagiarism.get_matches(db, s.id)
+    return _submission_response(s, user.name if user else None, user.matric_number if user else None, matches)
+
+def _submission_filters(assignment_id, user_id, min_score, max_score, cheating_detected) -> list:
+    filters = []
+    if assignment_id is not None:
+        filters.append(models.Submission.assignment_id == assignment_id)
+    if user_id is not None:
+        filters.append(models.Submission.user_id == user_id)
+    if min_score is not None:
+        filters.append(models.Submission.score >= min_score)
+    if max_score is not None:
+        filters.append(models.Submission.score <= max_score)
+    if cheating_detected is not None:
+        filters.append(models.Submission.cheating_detected == cheating_detected)
+    return filters
+
+def _stream_submissions(filters: list, cursor: int, limit: int):
+    """Yield one page of submissions as a JSON array, chunk by chunk.
+
+    Rows come from a single Submission/User join read with ``yield_per``, and the
+    plagiarism matches of each chunk are loaded with one query, so memory stays
+    bounded by the chunk size rather than the page or table size.
+    """
+    db = SessionLocal()
+    try:
+        rows = db.query(models.Submission, models.User.name, models.User.matric_number).outerjoin(
+            models.User, models.User.id == models.Submission.user_id
+        ).filter(
+            *filters, models.Submission.id >= cursor
+        ).order_by(models.Submission.id).limit(limit).yield_per(SUBMISSION_STREAM_CHUNK)
+
+        yield b"["
+        first = True
+        chunk = []
+        for row in rows:
+            chunk.append(row)
+            if len(chunk) == SUBMISSION_STREAM_CHUNK:
+                yield (b"" if first else b",") + _serialize_submission_chunk(db, chunk)
+                first = False
+                chunk = []
+        if chunk:
+            yield (b"" if first else b",") + _serialize_submission_chunk(db, chunk)
+        yield b"]"
+    finally:
+        db.close()
+
+def _serialize_submission_chunk(db: Session, chunk: list) -> bytes:
+    matches = {}
+    for m in db.query(models.PlagiarismMatch).filter(
+        models.PlagiarismMatch.submission_id.in_([s.id for s, _, _ in chunk])
+    ).order_by(models.PlagiarismMatch.similarity.desc()):
+        matches.setdefault(m.submission_id, []).append(m)
+    # One JSON array per chunk, without its brackets
+    return fast_json.dumps([
+        _submission_row(s, name, matric_number, matches.get(s.id, ())) for s, name, matric_number in chunk
+    ])[1:-1]
+
+def _submission_listing(request: Request, db: Session, filters: list, cursor: int, limit: int) -> StreamingResponse:
+    """Streamed page of submissions using keyset pagination on the submission id.
 
-@app.get("/submissions/", response_model=List[schemas.SubmissionResponse], tags=["Submissions"], summary="View All Submissions (Admin/Teacher)", description="Retrieve a list of all submissions from all students.")
-def get_all_submissions(db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    The id of the first row of the next page, if any, is returned in the
+    ``X-Next-Cursor`` header and as a ``Link: rel="next"`` URL.
+    """
+    headers = {}
+    next_cursor = db.query(models.Submission.id).filter(
+        *filters, models.Submission.id >= cursor
+    ).order_by(models.Submission.id).offset(limit).limit(1).scalar()
+    if next_cursor is not None:
+        headers["X-Next-Cursor"] = str(next_cursor)
+        headers["Link"] = f'<{request.url.include_query_params(cursor=next_cursor)}>; rel="next"'
+    return StreamingResponse(_stream_submissions(filters, cursor, limit), media_type="application/json", headers=headers)
+
+@app.get("/submissions/", response_model=List[schemas.SubmissionResponse], tags=["Submissions"], summary="View All Submissions (Admin/Teacher)", description="Retrieve submissions from all students, oldest first. Results are paginated: pass the `X-Next-Cursor` response header back as `cursor` to get the next page. Filter by assignment, student, score range or cheating flag.")
+def get_all_submissions(
+    request: Request,
+    assignment_id: Optional[int] = None,
+    user_id: Optional[int] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    cheating_detected: Optional[bool] = None,
+    cursor: int = 0,
+    limit: int = Query(SUBMISSION_PAGE_SIZE, ge=1, le=MAX_SUBMISSION_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.get_current_user)
+):
     # Only teachers and admins can view all submissions
     if current_user.role not in ["admin", "teacher"]:
         raise HTTPException(status_code=403, detail="Not authorized to view all submissions")
     
-    submissions = db.query(models.Submission).all()
-    return [_build_submission_response(s, db) for s in submissions]
+    filters = _submission_filters(assignment_id, user_id, min_score, max_score, cheating_detected)
+    return _submission_listing(request, db, filters, cursor, limit)
 
-@app.get("/submissions/me", response_model=List[schemas.SubmissionResponse], tags=["Submissions"], summary="View My Submissions", description="Retrieve a list of submissions made by the currently logged-in user.")
-def get_my_submissions(db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+@app.get("/submissions/me", response_model=List[schemas.SubmissionResponse], tags=["Submissions"], summary="View My Submissions", description="Retrieve submissions made by the currently logged-in user, paginated and filterable like `/submissions/`.")
+def get_my_submissions(
+    request: Request,
+    assignment_id: Optional[int] = None,
+    min_score: Optional[int] = None,
+    max_score: Optional[int] = None,
+    cheating_detected: Optional[bool] = None,
+    cursor: int = 0,
+    limit: int = Query(SUBMISSION_PAGE_SIZE, ge=1, le=MAX_SUBMISSION_PAGE_SIZE),
+    db: Session = Depends(get_db),
+    current_user: models.User = Depends(oauth2.get_current_user)
+):
     # Any authenticated user can view their own submissions
-    submissions = db.query(models.Submission).filter(models.Submission.user_id == current_user.id).all()
-    return [_build_submission_response(s, db) for s in submissions]
+    filters = _submission_filters(assignment_id, current_user.id, min_score, max_score, cheating_detected)
+    return _submission_listing(request, db, filters, cursor, limit)
+
+@app.get("/submissions/{id}/status", response_model=schemas.SubmissionStatusResponse, tags=["Submissions"], summary="Get Grading Status", description="Check the grading progress of a submission. The graded result is included once grading finishes.")
+def get_submission_status(id: int, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    submission = db.query(models.Submission).filter(models.Submission.id == id).first()
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+
+    # Students can only see their own submissions
+    if submission.user_id != current_user.id and current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view this submission")
+
+    job = db.query(models.GradingJob).filter(
+        models.GradingJob.submission_id == id
+    ).order_by(models.GradingJob.id.desc()).first()
+
+    return schemas.SubmissionStatusResponse(
+        submission_id=submission.id,
+        job_id=job.id if job else None,
+        status=submission.status,
+        attempts=job.attempts if job else 0,
+        error=job.error if job else None,
+        queued_at=job.created_at if job else None,
+        started_at=job.started_at if job else None,
+        finished_at=job.finished_at if job else None,
+        result=_build_submission_response(submission, db) if submission.status == "graded" else None
+    )
+
+@app.get("/submissions/{id}/results", response_model=List[schemas.GradingResultResponse], tags=["Submissions"], summary="Grading History", description="Every result the submission has had, newest first: the first grading and each regrade. `current` marks the one shown on the submission.")
+def get_submission_results(id: int, db: Session = Depends(get_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    submission = db.get(models.Submission, id)
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    if submission.user_id != current_user.id and current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view this submission")
+
+    results = db.query(models.GradingResult).filter(
+        models.GradingResult.submission_id == id
+    ).order_by(models.GradingResult.version.desc()).all()
+    return fast_json.FastJSONResponse([
+        {
+            "version": r.version,
+            "current": r.version == submission.result_version,
+            "score": r.score,
+            "feedback": r.feedback,
+            "strengths": r.strengths or [],
+            "weakpoints": r.weakpoints or [],
+            "cheating_detected": r.cheating_detected or False,
+            "cheating_reason": r.cheating_reason,
+            "tests_passed": r.tests_passed,
+            "tests_total": r.tests_total,
+            "code_sha256": r.code_sha256,
+            "criteria_sha256": r.criteria_sha256,
+            "grading_job_id": r.grading_job_id,
+            "created_at": r.created_at,
+        }
+        for r in results
+    ])
+
+def _sse(event: str, data: dict) -> str:
+    return f"event: {event}\ndata: {json.dumps(data)}\n\n"
+
+def _final_event(submission_id: int):
+    """The terminal SSE event of a finished grading, or None while it is still pending."""
+    db = SessionLocal()
+    try:
+        submission = db.get(models.Submission, submission_id)
+        if submission is None:
+            return _sse("error", {"detail": "Submission not found"})
+        if submission.status == "graded":
+            return _sse("result", _build_submission_response(submission, db).model_dump(mode="json"))
+        if submission.status == "failed":
+            job = db.query(models.GradingJob).filter(
+                models.GradingJob.submission_id == submission_id
+            ).order_by(models.GradingJob.id.desc()).first()
+            return _sse("error", {"detail": job.error if job else "Grading failed"})
+        return None
+    finally:
+        db.close()
+
+async def _grading_events(request: Request, submission_id: int, events: asyncio.Queue):
+    try:
+        yield _sse("status", {"submission_id": submission_id, "status": "pending"})
+        # Checked after subscribing, so a grading finishing in between is not missed
+        final = await run_in_threadpool(_final_event, submission_id)
+        if final is not None:
+            yield final
+            return
+        while True:
+            try:
+                event, data = await asyncio.wait_for(events.get(), timeout=SSE_KEEPALIVE_SECONDS)
+            except asyncio.TimeoutError:
+                if await request.is_disconnected():
+                    return
+                yield ": keep-alive\n\n"
+                continue
+            if event == "partial":
+                yield _sse("partial", data)
+                continue
+            yield await run_in_threadpool(_final_event, submission_id) or _sse("error", {"detail": "Grading failed"})
+            return
+    finally:
+        grading_events.events.unsubscribe(submission_id, events)
+
+def _event_stream_response(request: Request, submission_id: int, events: asyncio.Queue) -> StreamingResponse:
+    return StreamingResponse(
+        _grading_events(request, submission_id, events),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+@app.get("/submissions/{id}/events", response_class=StreamingResponse, tags=["Submissions"], summary="Follow Grading (SSE)", description="Server-Sent Events stream of a submission's grading: `partial` events with the feedback generated so far while the model is running, then a final `result` (the stored submission) or `error` event. Ends immediately with the final event if grading already finished.")
+async def get_submission_events(id: int, request: Request, db: AsyncSession = Depends(get_async_db), current_user: models.User = Depends(oauth2.get_current_user)):
+    submission = await db.get(models.Submission, id)
+    if not submission:
+        raise HTTPException(status_code=404, detail="Submission not found")
+    if submission.user_id != current_user.id and current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view this submission")
+    return _event_stream_response(request, id, grading_events.events.subscribe(id))
+
+@app.get("/grading/stats", response_model=schemas.GradingQueueStats, tags=["Submissions"], summary="Grading Queue Statistics (Admin/Teacher)", description="Worker count, queue depth, throughput and grading latency of the background grading pool, plus model routing statistics: escalation rate and, per model tier, latency, token usage, cost and the retry/circuit breaker counters of its client. `prompts` reports the prompt token budget and how often submissions had to be condensed or excerpted to fit it. `admission` shows the load admission control sees and the requests it admitted and refused per lane.")
+def get_grading_stats(current_user: models.User = Depends(oauth2.get_current_user)):
+    if current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view grading statistics")
+    return {
+        **grading_queue.queue.stats(),
+        # None until the first grading has loaded the model client
+        "model_routing": ai_agent.routing.stats() if ai_agent.is_loaded() else None,
+        "prompts": prompt_builder.builder.stats(),
+        "admission": admission.controller.stats(),
+    }
+
+@app.get("/grading/cache", response_model=schemas.GradingCacheStats, tags=["Submissions"], summary="Grading Cache Statistics (Admin/Teacher)", description="Hit/miss counters of the grading result cache.")
+def get_grading_cache_stats(current_user: models.User = Depends(oauth2.get_current_user)):
+    if current_user.role not in ["admin", "teacher"]:
+        raise HTTPException(status_code=403, detail="Not authorized to view grading statistics")
+    return grading_cache.cache.stats()
+
+@metrics.registry.collector
+def _collect_grading_metrics():
+    queue_stats = grading_queue.queue.stats()
+    metrics.GRADING_QUEUE_DEPTH.set(queue_stats["queue_depth"])
+    metrics.GRADING_RUNNING.set(queue_stats["running"])
+    metrics.GRADING_JOBS.set(queue_stats["completed"], status="done")
+    metrics.GRADING_JOBS.set(queue_stats["failed"], status="failed")
+    for tier in ai_agent.routing.tiers if ai_agent.is_loaded() else []:
+        client = tier.client.stats()
+        metrics.LLM_RETRIES.set(client["retries"], tier=tier.name)
+        metrics.LLM_TIMEOUTS.set(client["timeouts"], tier=tier.name)
+        metrics.LLM_REJECTED.set(client["rejected"], tier=tier.name)
+        metrics.LLM_BREAKER_OPEN.set(int(client["breaker_state"] != "closed"), tier=tier.name)
 
+@metrics.registry.collector
+def _collect_blob_metrics():
+    blob_stats = blob_store.store.stats()
+    metrics.BLOB_WRITES.set(blob_stats["stored"], result="stored")
+    metrics.BLOB_WRITES.set(blob_stats["deduplicated"], result="deduplicated")
+    metrics.BLOB_BYTES.set(blob_stats["bytes_in"], kind="raw")
+    metrics.BLOB_BYTES.set(blob_stats["bytes_stored"], kind="stored")
 
+@app.get("/metrics", response_class=PlainTextResponse, tags=["Monitoring"], summary="Prometheus Metrics", description="Metrics in the Prometheus text format: per-route request latency and database query counts/time, model call latency, tokens and errors, and grading queue depth. Unauthenticated, for scrapers; restrict access to it at the proxy.")
+def get_metrics():
+    return PlainTextResponse(metrics.registry.render(), media_type="text/plain; version=0.0.4; charset=utf-8")
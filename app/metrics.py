@@ -0,0 +1,296 @@
+"""Prometheus metrics, per-request database timing and opt-in request profiling.
+
+Metrics are kept in process and rendered in the Prometheus text format by
+``GET /metrics``; there is no client library dependency.
+"""
+import bisect
+import contextvars
+import cProfile
+import io
+import os
+import pstats
+import threading
+import time
+
+from sqlalchemy import event
+
+# Lets a request send "X-Profile: 1" to get a cProfile report instead of its
+# normal response. Profiling slows the whole process down: keep it off in production.
+PROFILING_ENABLED = os.getenv("PROFILING_ENABLED", "false").lower() in ("1", "true", "yes")
+PROFILE_TOP_FUNCTIONS = int(os.getenv("PROFILE_TOP_FUNCTIONS", "40"))
+
+# Latency buckets in seconds, shared by all histograms
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+QUERY_COUNT_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_labels(names, values, extra=()) -> str:
+    pairs = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)] + [f'{n}="{v}"' for n, v in extra]
+    return "{" + ",".join(pairs) + "}" if pairs else ""
+
+
+def _format_value(value) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class Registry:
+    def __init__(self):
+        self.metrics = []
+        self.collectors = []
+
+    def collector(self, fn):
+        """Register ``fn`` to run before every render, e.g. to copy gauges from ``stats()``."""
+        self.collectors.append(fn)
+        return fn
+
+    def render(self) -> str:
+        for fn in self.collectors:
+            fn()
+        lines = []
+        for metric in self.metrics:
+            lines.append(f"# HELP {metric.name} {metric.help}")
+            lines.append(f"# TYPE {metric.name} {metric.type}")
+            lines.extend(metric.samples())
+        return "\n".join(lines) + "\n"
+
+
+registry = Registry()
+
+
+class _Metric:
+    type = "untyped"
+
+    def __init__(self, name: str, help: str, labels=()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+        registry.metrics.append(self)
+
+    def _key(self, labels: dict) -> tuple:
+        return tuple(str(labels.get(name, "")) for name in self.labelnames)
+
+
+class Counter(_Metric):
+    type = "counter"
+
+    def inc(self, amount: float = 1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set(self, value: float, **labels):
+        """For totals that are counted elsewhere and copied in by a collector."""
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+    def samples(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        return [f"{self.name}{_format_labels(self.labelnames, key)} {_format_value(value)}" for key, value in items]
+
+
+class Gauge(Counter):
+    type = "gauge"
+
+
+class Histogram(_Metric):
+    type = "histogram"
+
+    def __init__(self, name: str, help: str, labels=(), buckets=DEFAULT_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(buckets)
+
+    def observe(self, value: float, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * (len(self.buckets) + 1), 0.0))
+            counts[bisect.bisect_left(self.buckets, value)] += 1
+            self._values[key] = (counts, total + value)
+
+    def samples(self):
+        with self._lock:
+            items = sorted((key, (list(counts), total)) for key, (counts, total) in self._values.items())
+        lines = []
+        for key, (counts, total) in items:
+            cumulative = 0
+            for bound, count in zip(self.buckets + (float("inf"),), counts):
+                cumulative += count
+                labels = _format_labels(self.labelnames, key, [("le", _format_value(float(bound)))])
+                lines.append(f"{self.name}_bucket{labels} {cumulative}")
+            labels = _format_labels(self.labelnames, key)
+            lines.append(f"{self.name}_sum{labels} {_format_value(total)}")
+            lines.append(f"{self.name}_count{labels} {cumulative}")
+        return lines
+
+
+HTTP_REQUESTS = Counter("scorac_http_requests_total", "HTTP requests by route and status.", ["method", "route", "status"])
+HTTP_LATENCY = Histogram("scorac_http_request_duration_seconds", "HTTP request latency, until the response body is sent.", ["method", "route"])
+HTTP_DB_QUERIES = Histogram("scorac_http_request_db_queries", "Database queries run while serving one request.", ["method", "route"], QUERY_COUNT_BUCKETS)
+HTTP_DB_SECONDS = Histogram("scorac_http_request_db_seconds", "Time spent in database queries while serving one request.", ["method", "route"])
+DB_QUERIES = Counter("scorac_db_queries_total", "Database queries, in and outside requests.", ["engine"])
+DB_QUERY_SECONDS = Histogram("scorac_db_query_duration_seconds", "Latency of single database queries.", ["engine"])
+
+LLM_CALLS = Counter("scorac_llm_calls_total", "Grading model calls by tier and outcome (retries included in one call).", ["tier", "outcome"])
+LLM_LATENCY = Histogram("scorac_llm_call_duration_seconds", "Grading model call latency, retries included.", ["tier"])
+LLM_TOKENS = Counter("scorac_llm_tokens_total", "Grading model tokens by tier and kind (input, output, cache_read).", ["tier", "kind"])
+LLM_ERRORS = Counter("scorac_llm_errors_total", "Failed grading model calls by tier and exception type.", ["tier", "error"])
+LLM_RETRIES = Counter("scorac_llm_retries_total", "Retried grading model attempts.", ["tier"])
+LLM_TIMEOUTS = Counter("scorac_llm_timeouts_total", "Grading model attempts that timed out.", ["tier"])
+LLM_REJECTED = Counter("scorac_llm_rejected_total", "Calls rejected by an open circuit breaker.", ["tier"])
+LLM_BREAKER_OPEN = Gauge("scorac_llm_circuit_open", "1 while the tier's circuit breaker is open or half-open.", ["tier"])
+
+ASSIGNMENT_CACHE = Counter("scorac_assignment_cache_total", "Assignment read cache lookups (hit, miss) and 304 responses (not_modified).", ["result"])
+
+GRADING_QUEUE_DEPTH = Gauge("scorac_grading_queue_depth", "Grading jobs waiting for a worker.")
+GRADING_RUNNING = Gauge("scorac_grading_jobs_running", "Grading jobs being graded.")
+GRADING_JOBS = Counter("scorac_grading_jobs_total", "Finished grading jobs by status.", ["status"])
+GRADING_DURATION = Histogram("scorac_grading_job_duration_seconds", "Time to grade one job, excluding queue wait.", ["status"])
+GRADING_WAIT = Histogram("scorac_grading_job_wait_seconds", "Time a grading job waited in the queue.")
+ADMISSION = Counter("scorac_admission_total", "Grading requests by lane and admission result (admitted or the reason for refusing).", ["lane", "result"])
+
+BLOB_WRITES = Counter("scorac_blob_writes_total", "Uploads written to the blob store (stored) or already present in it (deduplicated).", ["result"])
+BLOB_BYTES = Counter("scorac_blob_bytes_total", "Bytes uploaded to the blob store (raw) and written to disk after compression (stored).", ["kind"])
+
+
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.query_seconds = 0.0
+
+
+# Stats of the request being served; copied into threadpool calls with the context
+_request_stats = contextvars.ContextVar("request_stats", default=None)
+
+
+def instrument_engine(engine, name: str):
+    """Count and time every query run on ``engine`` (a sync ``Engine``; for an
+    async one pass its ``sync_engine``)."""
+
+    def before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault("query_started", []).append(time.perf_counter())
+
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        elapsed = time.perf_counter() - conn.info["query_started"].pop()
+        DB_QUERIES.inc(engine=name)
+        DB_QUERY_SECONDS.observe(elapsed, engine=name)
+        stats = _request_stats.get()
+        if stats is not None:
+            stats.queries += 1
+            stats.query_seconds += elapsed
+
+    def handle_error(context):
+        # The query never reached after_cursor_execute
+        started = context.connection.info.get("query_started") if context.connection is not None else None
+        if started:
+            started.pop()
+
+    event.listen(engine, "before_cursor_execute", before_cursor_execute)
+    event.listen(engine, "after_cursor_execute", after_cursor_execute)
+    event.listen(engine, "handle_error", handle_error)
+
+
+_profile_lock = threading.Lock()
+
+
+class MetricsMiddleware:
+    """ASGI middleware recording latency and database work per route.
+
+    Also adds a ``Server-Timing`` header with the database time spent before the
+    response started, and serves profiled requests when profiling is enabled.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+        if PROFILING_ENABLED and dict(scope["headers"]).get(b"x-profile", b"").lower() in (b"1", b"true", b"yes"):
+            await self._profile(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        started = time.perf_counter()
+        status = 500
+
+        async def send_with_timing(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                timing = f'db;dur={stats.query_seconds * 1000:.1f};desc="{stats.queries} queries"'
+                message = {**message, "headers": [*message.get("headers", []), (b"server-timing", timing.encode())]}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_stats.reset(token)
+            elapsed = time.perf_counter() - started
+            method, route = scope["method"], _route_name(scope)
+            HTTP_REQUESTS.inc(method=method, route=route, status=status)
+            HTTP_LATENCY.observe(elapsed, method=method, route=route)
+            HTTP_DB_QUERIES.observe(stats.queries, method=method, route=route)
+            HTTP_DB_SECONDS.observe(stats.query_seconds, method=method, route=route)
+
+    async def _profile(self, scope, receive, send):
+        """Run the request under cProfile and answer with the report instead of
+        its response. The report covers the whole process (other requests and the
+        grading workers included) for as long as the request ran."""
+        if not _profile_lock.acquire(blocking=False):
+            await _send_text(send, 409, "Another request is being profiled\n")
+            return
+
+        stats = RequestStats()
+        token = _request_stats.set(stats)
+        status = None
+
+        async def discard(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+
+        profiler = cProfile.Profile()
+        started = time.perf_counter()
+        try:
+            profiler.enable()
+            try:
+                await self.app(scope, receive, discard)
+            finally:
+                profiler.disable()
+        finally:
+            _request_stats.reset(token)
+            _profile_lock.release()
+        elapsed = time.perf_counter() - started
+
+        report = io.StringIO()
+        report.write(
+            f"{scope['method']} {scope['path']} -> {status} in {elapsed * 1000:.1f} ms; "
+            f"{stats.queries} database queries in {stats.query_seconds * 1000:.1f} ms\n\n"
+        )
+        pstats.Stats(profiler, stream=report).sort_stats("cumulative").print_stats(PROFILE_TOP_FUNCTIONS)
+        await _send_text(send, 200, report.getvalue(), [(b"x-profile-status", str(status).encode())])
+
+
+def _route_name(scope) -> str:
+    # The route template, not the path, so ids don't explode the label set
+    route = scope.get("route")
+    return getattr(route, "path", None) or "unmatched"
+
+
+async def _send_text(send, status: int, text: str, headers=()):
+    await send({
+        "type": "http.response.start",
+        "status": status,
+        "headers": [(b"content-type", b"text/plain; charset=utf-8"), *headers],
+    })
+    await send({"type": "http.response.body", "body": text.encode()})
@@ -0,0 +1,163 @@
+import logging
+import os
+import time
+from collections import Counter, deque
+
+logger = logging.getLogger(__name__)
+
+# Scores within ESCALATION_MARGIN of the pass mark are borderline and get a second opinion
+GRADING_PASS_MARK = int(os.getenv("GRADING_PASS_MARK", "50"))
+ESCALATION_MARGIN = int(os.getenv("ESCALATION_MARGIN", "10"))
+# ...as do gradings the fast model is not sure about, and cheating accusations
+ESCALATION_MIN_CONFIDENCE = float(os.getenv("ESCALATION_MIN_CONFIDENCE", "0.7"))
+ESCALATE_ON_CHEATING = os.getenv("ESCALATE_ON_CHEATING", "true").lower() in ("1", "true", "yes")
+
+# Calls kept per tier for latency statistics
+TIER_STATS_WINDOW = 1000
+
+
+def usage_totals(*usages) -> dict:
+    """Sum the token counts of one or more run usages."""
+    totals = {"input_tokens": 0, "output_tokens": 0, "cache_read_tokens": 0}
+    for usage in usages:
+        if usage is not None:
+            for field in totals:
+                totals[field] += getattr(usage, field, 0) or 0
+    return totals
+
+
+def parse_price(value: str):
+    """``"input,output"`` USD per million tokens -> (input, output)"""
+    input_price, output_price = (float(part) for part in value.split(","))
+    return input_price, output_price
+
+
+class ModelTier:
+    """One model in the routing policy, with its own client and usage statistics."""
+
+    def __init__(self, name: str, model_name: str, model, client, price: tuple):
+        self.name = name
+        self.model_name = model_name
+        self.model = model
+        self.client = client
+        self.input_price, self.output_price = price
+        self.calls = 0
+        self.errors = 0
+        self.input_tokens = 0
+        self.output_tokens = 0
+        self.cost_usd = 0.0
+        self._latencies = deque(maxlen=TIER_STATS_WINDOW)
+
+    def record(self, seconds: float, usage=None):
+        self.calls += 1
+        self._latencies.append(seconds)
+        if usage is not None:
+            input_tokens = usage.input_tokens or 0
+            output_tokens = usage.output_tokens or 0
+            self.input_tokens += input_tokens
+            self.output_tokens += output_tokens
+            self.cost_usd += (input_tokens * self.input_price + output_tokens * self.output_price) / 1_000_000
+
+    def stats(self) -> dict:
+        latencies = sorted(self._latencies)
+        return {
+            "tier": self.name,
+            "model": self.model_name,
+            "calls": self.calls,
+            "errors": self.errors,
+            "avg_latency_seconds": sum(latencies) / len(latencies) if latencies else None,
+            "p95_latency_seconds": latencies[int(0.95 * (len(latencies) - 1))] if latencies else None,
+            "input_tokens": self.input_tokens,
+            "output_tokens": self.output_tokens,
+            "cost_usd": round(self.cost_usd, 6),
+            "client": self.client.stats(),
+        }
+
+
+class RoutingPolicy:
+    """Grade with the fast tier first and escalate to the strong tier only when
+    the fast result is borderline, flags cheating, or comes with low confidence.
+
+    Without a strong tier every grading stays on the fast one.
+    """
+
+    def __init__(
+        self,
+        fast: ModelTier,
+        strong: ModelTier = None,
+        pass_mark: int = GRADING_PASS_MARK,
+        margin: int = ESCALATION_MARGIN,
+        min_confidence: float = ESCALATION_MIN_CONFIDENCE,
+        escalate_on_cheating: bool = ESCALATE_ON_CHEATING,
+    ):
+        self.fast = fast
+        self.strong = strong
+        self.pass_mark = pass_mark
+        self.margin = margin
+        self.min_confidence = min_confidence
+        self.escalate_on_cheating = escalate_on_cheating
+        self.gradings = 0
+        self.escalations = Counter()  # reason -> count
+        self.escalation_failures = 0
+
+    @property
+    def tiers(self) -> list:
+        return [tier for tier in (self.fast, self.strong) if tier is not None]
+
+    @property
+    def key(self) -> str:
+        """Identifies the policy in grading cache keys: results depend on both models."""
+        if self.strong is None:
+            return self.fast.model_name
+        return f"{self.fast.model_name}>{self.strong.model_name}"
+
+    def escalation_reason(self, output):
+        if self.escalate_on_cheating and output.cheating_detected:
+            return "cheating"
+        if abs(output.score - self.pass_mark) < self.margin:
+            return "borderline"
+        if output.confidence is not None and output.confidence < self.min_confidence:
+            return "low_confidence"
+        return None
+
+    async def grade(self, run):
+        """``run(tier)`` performs one model call and returns ``(output, usage)``.
+
+        Returns the final output and the tokens used by all calls made for it.
+        """
+        self.gradings += 1
+        output, usage = await self._call(self.fast, run)
+        reason = self.escalation_reason(output) if self.strong is not None else None
+        if reason is None:
+            return output, usage_totals(usage)
+
+        self.escalations[reason] += 1
+        try:
+            strong_output, strong_usage = await self._call(self.strong, run)
+        except Exception:
+            # The fast model's grade is still a grade
+            self.escalation_failures += 1
+            logger.exception("Escalation to %s failed, keeping the fast result", self.strong.model_name)
+            return output, usage_totals(usage)
+        return strong_output, usage_totals(usage, strong_usage)
+
+    async def _call(self, tier: ModelTier, run):
+        started = time.monotonic()
+        try:
+            output, usage = await run(tier)
+        except Exception:
+            tier.errors += 1
+            raise
+        tier.record(time.monotonic() - started, usage)
+        return output, usage
+
+    def stats(self) -> dict:
+        escalated = sum(self.escalations.values())
+        return {
+            "gradings": self.gradings,
+            "escalations": escalated,
+            "escalation_rate": escalated / self.gradings if self.gradings else None,
+            "escalation_reasons": dict(self.escalations),
+            "escalation_failures": self.escalation_failures,
+            "tiers": [tier.stats() for tier in self.tiers],
+        }
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, Boolean, Text, ForeignKey, DateTime, Float, Index, JSON, UniqueConstraint
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -26,11 +26,139 @@ class Submission(Base):
     id = Column(Integer, primary_key=True, nullable=False)
     assignment_id = Column(Integer, ForeignKey("assignments.id"), nullable=False)
     user_id = Column(Integer, ForeignKey("users.id"), nullable=False)
-    score = Column(Integer, nullable=False)
-    feedback = Column(Text, nullable=False)
-    strengths = Column(Text, nullable=True)  # JSON list stored as text
-    weakpoints = Column(Text, nullable=True)  # JSON list stored as text
+    score = Column(Integer, nullable=True)  # Null until graded
+    feedback = Column(Text, nullable=True)
+    strengths = Column(JSON, nullable=True)  # List of strings
+    weakpoints = Column(JSON, nullable=True)  # List of strings
     cheating_detected = Column(Boolean, default=False)
     cheating_reason = Column(Text, nullable=True)
     reasoning = Column(Text, nullable=True)
+    status = Column(String, nullable=False, default="pending")  # pending, graded, failed
+    tests_passed = Column(Integer, nullable=True)  # Null when the assignment has no test cases
+    tests_total = Column(Integer, nullable=True)
+    test_pass_rate = Column(Float, nullable=True)  # Weighted, 0-1
+    test_results = Column(Text, nullable=True)  # JSON list of per-test outcomes
+    input_tokens = Column(Integer, nullable=True)  # Model tokens spent grading; 0 when no model call was needed
+    output_tokens = Column(Integer, nullable=True)
+    cache_read_tokens = Column(Integer, nullable=True)  # Input tokens served from the provider's prompt cache
+    blob_sha256 = Column(String, nullable=True, index=True)  # Submitted source in the blob store; null if it wasn't kept
+    result_version = Column(Integer, nullable=True)  # Version in grading_results of the result shown above
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # One submission per user per assignment; its index also serves (assignment_id, user_id) lookups
+        UniqueConstraint("assignment_id", "user_id", name="uq_submissions_assignment_user"),
+        Index("ix_submissions_assignment_created", "assignment_id", "created_at"),
+        Index("ix_submissions_user_id", "user_id"),
+    )
+
+class TestCase(Base):
+    __tablename__ = "test_cases"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False, index=True)
+    name = Column(String, nullable=False)
+    kind = Column(String, nullable=False, default="io")  # io: stdin -> expected stdout; pytest: test functions
+    stdin = Column(Text, nullable=True)
+    expected_output = Column(Text, nullable=True)
+    test_code = Column(Text, nullable=True)
+    weight = Column(Integer, nullable=False, default=1)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+class GradingJob(Base):
+    __tablename__ = "grading_jobs"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="pending", index=True)  # pending, running, done, failed
+    attempts = Column(Integer, nullable=False, default=0)
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class GradingResult(Base):
+    __tablename__ = "grading_results"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False)
+    version = Column(Integer, nullable=False)  # 1 for the first grading, +1 per regrade
+    code_sha256 = Column(String, nullable=True)  # Blob of the graded source; null when it wasn't kept
+    criteria_sha256 = Column(String, nullable=True)  # Null for results graded before criteria were recorded
+    grading_job_id = Column(Integer, ForeignKey("grading_jobs.id", ondelete="SET NULL"), nullable=True)
+    score = Column(Integer, nullable=True)
+    feedback = Column(Text, nullable=True)
+    strengths = Column(JSON, nullable=True)  # List of strings
+    weakpoints = Column(JSON, nullable=True)  # List of strings
+    cheating_detected = Column(Boolean, default=False)
+    cheating_reason = Column(Text, nullable=True)
+    reasoning = Column(Text, nullable=True)
+    tests_passed = Column(Integer, nullable=True)
+    tests_total = Column(Integer, nullable=True)
+    test_pass_rate = Column(Float, nullable=True)
+    test_results = Column(Text, nullable=True)
+    input_tokens = Column(Integer, nullable=True)
+    output_tokens = Column(Integer, nullable=True)
+    cache_read_tokens = Column(Integer, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # Its index also serves the lookups of a submission's results
+        UniqueConstraint("submission_id", "version", name="uq_grading_results_submission_version"),
+    )
+
+class RegradeJob(Base):
+    __tablename__ = "regrade_jobs"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False, index=True)
+    status = Column(String, nullable=False, default="pending", index=True)  # pending, running, done, failed
+    criteria_sha256 = Column(String, nullable=False)  # Criteria being graded against; a change restarts the job
+    total = Column(Integer, nullable=False, default=0)  # Graded submissions when the job (re)started
+    processed = Column(Integer, nullable=False, default=0)
+    regraded = Column(Integer, nullable=False, default=0)
+    skipped = Column(Integer, nullable=False, default=0)  # A result for the same code and criteria already existed
+    failed = Column(Integer, nullable=False, default=0)
+    last_submission_id = Column(Integer, nullable=False, default=0)  # Progress: submissions up to this id are done
+    error = Column(Text, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    started_at = Column(DateTime(timezone=True), nullable=True)
+    finished_at = Column(DateTime(timezone=True), nullable=True)
+
+class GradingCacheEntry(Base):
+    __tablename__ = "grading_cache"
+
+    key = Column(String, primary_key=True, nullable=False)  # sha256 of normalized code + criteria + model
+    model_name = Column(String, nullable=False)
+    result = Column(Text, nullable=False)  # ScoreResponse as JSON
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+    expires_at = Column(Float, nullable=False)  # Unix timestamp
+
+class SubmissionFingerprint(Base):
+    __tablename__ = "submission_fingerprints"
+
+    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), primary_key=True, nullable=False)
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False, index=True)
+    fingerprints = Column(Text, nullable=False)  # JSON list of winnowed k-gram hashes
+
+class LSHBucket(Base):
+    __tablename__ = "lsh_buckets"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    assignment_id = Column(Integer, ForeignKey("assignments.id", ondelete="CASCADE"), nullable=False)
+    band = Column(Integer, nullable=False)
+    bucket = Column(String, nullable=False)  # Hash of the band's MinHash rows
+    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False)
+
+    __table_args__ = (
+        Index("ix_lsh_buckets_lookup", "assignment_id", "band", "bucket"),
+    )
+
+class PlagiarismMatch(Base):
+    __tablename__ = "plagiarism_matches"
+
+    id = Column(Integer, primary_key=True, nullable=False)
+    submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False, index=True)
+    matched_submission_id = Column(Integer, ForeignKey("submissions.id", ondelete="CASCADE"), nullable=False)
+    similarity = Column(Float, nullable=False)  # Jaccard similarity of fingerprints, 0-1
     created_at = Column(DateTime(timezone=True), server_default=func.now())
\ No newline at end of file
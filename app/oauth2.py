@@ -1,18 +1,95 @@
 from jose import JWTError, jwt
 from datetime import datetime, timedelta
+from collections import OrderedDict
 from app import schemas, database, models
 from fastapi import Depends, status, HTTPException
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event
 from sqlalchemy.orm import Session
 from .database import get_db
+import os
+import threading
+import time
 
 # CONSTANTS - In a real app, these should be in .env
 SECRET_KEY = "supersecretkey" # Change this!
 ALGORITHM = "HS256"
 ACCESS_TOKEN_EXPIRE_MINUTES = 30
 
+# Verified tokens are remembered for a short while so most requests skip JWT
+# decoding and the user lookup entirely.
+AUTH_CACHE_SIZE = int(os.getenv("AUTH_CACHE_SIZE", "4096"))
+AUTH_CACHE_TTL_SECONDS = int(os.getenv("AUTH_CACHE_TTL_SECONDS", "60"))
+
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="login")
 
+
+class TokenCache:
+    """Bounded LRU of verified token -> user identity, with a per-entry TTL.
+
+    Entries never outlive the token itself, and all entries of a user are dropped
+    as soon as that user row is updated or deleted.
+    """
+
+    def __init__(self, max_entries: int = AUTH_CACHE_SIZE, ttl: int = AUTH_CACHE_TTL_SECONDS):
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self._entries = OrderedDict()  # token -> (expires_at, identity dict)
+        self._tokens_by_user = {}  # user id -> set of cached tokens
+        self._lock = threading.Lock()
+
+    def get(self, token: str):
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            expires_at, identity = entry
+            if expires_at <= time.time():
+                self._remove(token)
+                return None
+            self._entries.move_to_end(token)
+            return identity
+
+    def put(self, token: str, identity: dict, token_expires_at: float):
+        if self.max_entries <= 0:
+            return
+        expires_at = min(time.time() + self.ttl, token_expires_at)
+        with self._lock:
+            self._remove(token)
+            self._entries[token] = (expires_at, identity)
+            self._tokens_by_user.setdefault(identity["id"], set()).add(token)
+            while len(self._entries) > self.max_entries:
+                self._remove(next(iter(self._entries)))
+
+    def invalidate_user(self, user_id: int):
+        with self._lock:
+            for token in list(self._tokens_by_user.get(user_id, ())):
+                self._remove(token)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._tokens_by_user.clear()
+
+    def _remove(self, token: str):
+        entry = self._entries.pop(token, None)
+        if entry is not None:
+            tokens = self._tokens_by_user.get(entry[1]["id"])
+            if tokens is not None:
+                tokens.discard(token)
+                if not tokens:
+                    del self._tokens_by_user[entry[1]["id"]]
+
+
+token_cache = TokenCache()
+
+
+@event.listens_for(models.User, "after_update")
+@event.listens_for(models.User, "after_delete")
+def _invalidate_cached_user(mapper, connection, target):
+    token_cache.invalidate_user(target.id)
+
+
 def create_access_token(data: dict):
     to_encode = data.copy()
     expire = datetime.utcnow() + timedelta(minutes=ACCESS_TOKEN_EXPIRE_MINUTES)
@@ -26,7 +103,7 @@ def verify_access_token(token: str, credentials_exception):
         email: str = payload.get("sub")
         if email is None:
             raise credentials_exception
-        token_data = schemas.TokenData(email=email)
+        token_data = schemas.TokenData(email=email, id=payload.get("user_id"), exp=payload.get("exp"))
     except JWTError:
         raise credentials_exception
     return token_data
@@ -37,6 +114,25 @@ def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(
         detail="Could not validate credentials",
         headers={"WWW-Authenticate": "Bearer"},
     )
-    token = verify_access_token(token, credentials_exception)
-    user = db.query(models.User).filter(models.User.email == token.email).first()
+    identity = token_cache.get(token)
+    if identity is not None:
+        # Detached copy: callers only read identity fields
+        return models.User(**identity)
+
+    token_data = verify_access_token(token, credentials_exception)
+    if token_data.id is not None:
+        user = db.get(models.User, token_data.id)
+    else:
+        # Tokens issued before they carried the user id
+        user = db.query(models.User).filter(models.User.email == token_data.email).first()
+    if user is None or user.email != token_data.email:
+        raise credentials_exception
+
+    token_cache.put(token, {
+        "id": user.id,
+        "email": user.email,
+        "name": user.name,
+        "matric_number": user.matric_number,
+        "role": user.role,
+    }, token_data.exp or 0)
     return user
@@ -0,0 +1,184 @@
+import builtins
+import hashlib
+import io
+import json
+import keyword
+import os
+import random
+import tokenize
+
+from sqlalchemy import and_, or_
+from sqlalchemy.orm import Session
+
+from app import models
+
+# Token k-gram length and winnowing window used for fingerprints
+KGRAM_SIZE = 5
+WINNOW_WINDOW = 4
+
+# MinHash signature = LSH_BANDS bands of LSH_ROWS rows. Submissions share a bucket
+# with probability ~s**rows per band, so pairs above roughly (1/bands)**(1/rows)
+# Jaccard similarity (0.5 here) become candidates.
+LSH_BANDS = 16
+LSH_ROWS = 4
+
+# Matches at or above this similarity are recorded on the submission...
+PLAGIARISM_THRESHOLD = float(os.getenv("PLAGIARISM_THRESHOLD", "0.5"))
+# ...and at or above this one the submission is flagged as cheating
+PLAGIARISM_FLAG_THRESHOLD = float(os.getenv("PLAGIARISM_FLAG_THRESHOLD", "0.8"))
+
+_PRIME = (1 << 61) - 1
+_rng = random.Random(1337)  # Fixed seed: signatures must be stable across processes
+_PERMUTATIONS = [(_rng.randrange(1, _PRIME), _rng.randrange(0, _PRIME)) for _ in range(LSH_BANDS * LSH_ROWS)]
+
+_BUILTIN_NAMES = frozenset(dir(builtins))
+_STRING_TOKENS = {tokenize.STRING}
+for _name in ("FSTRING_START", "FSTRING_MIDDLE", "FSTRING_END"):
+    if hasattr(tokenize, _name):
+        _STRING_TOKENS.add(getattr(tokenize, _name))
+_SKIPPED_TOKENS = {tokenize.COMMENT, tokenize.NL, tokenize.ENCODING, tokenize.ENDMARKER}
+
+
+def normalize_tokens(code: str) -> list:
+    """Tokenize source, discarding comments and layout and replacing identifiers and
+    literals with placeholders, so renaming variables does not hide copied code."""
+    tokens = []
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type in _SKIPPED_TOKENS:
+                continue
+            if tok.type == tokenize.NAME:
+                if keyword.iskeyword(tok.string) or tok.string in _BUILTIN_NAMES:
+                    tokens.append(tok.string)
+                else:
+                    tokens.append("V")
+            elif tok.type == tokenize.NUMBER:
+                tokens.append("N")
+            elif tok.type in _STRING_TOKENS:
+                # f-strings arrive as several tokens; collapse them into one
+                if not tokens or tokens[-1] != "S":
+                    tokens.append("S")
+            elif tok.type == tokenize.OP:
+                tokens.append(tok.string)
+            else:
+                tokens.append(tokenize.tok_name[tok.type])
+    except (tokenize.TokenError, IndentationError, SyntaxError):
+        # Keep whatever was tokenized before the error
+        pass
+    return tokens
+
+
+def _hash(text: str) -> int:
+    return int.from_bytes(hashlib.blake2b(text.encode("utf-8"), digest_size=8).digest(), "big")
+
+
+def fingerprint(code: str) -> set:
+    """Winnowed k-gram hashes of the normalized token stream."""
+    tokens = normalize_tokens(code)
+    if len(tokens) < KGRAM_SIZE:
+        return {_hash(" ".join(tokens))} if tokens else set()
+
+    hashes = [_hash(" ".join(tokens[i:i + KGRAM_SIZE])) for i in range(len(tokens) - KGRAM_SIZE + 1)]
+    if len(hashes) <= WINNOW_WINDOW:
+        return {min(hashes)}
+
+    selected = set()
+    for i in range(len(hashes) - WINNOW_WINDOW + 1):
+        selected.add(min(hashes[i:i + WINNOW_WINDOW]))
+    return selected
+
+
+def minhash(fingerprints: set) -> list:
+    values = [h % _PRIME for h in fingerprints]
+    return [min((a * v + b) % _PRIME for v in values) for a, b in _PERMUTATIONS]
+
+
+def lsh_buckets(signature: list) -> list:
+    """One bucket key per band of the MinHash signature."""
+    buckets = []
+    for band in range(LSH_BANDS):
+        rows = signature[band * LSH_ROWS:(band + 1) * LSH_ROWS]
+        buckets.append(hashlib.blake2b(repr(rows).encode("utf-8"), digest_size=8).hexdigest())
+    return buckets
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def index_submission(db: Session, submission: models.Submission, code: str) -> list:
+    """Fingerprint a submission, match it against earlier submissions to the same
+    assignment and add it to the assignment's index.
+
+    Returns the matches this call recorded on the other submissions, most
+    similar first. Indexing is idempotent: an already indexed submission records
+    and returns nothing. Callers must not index two submissions to the same
+    assignment at once, or they may miss each other.
+    """
+    existing = db.query(models.SubmissionFingerprint).filter(
+        models.SubmissionFingerprint.submission_id == submission.id
+    ).first()
+    if existing:
+        return []
+
+    fingerprints = fingerprint(code)
+    if not fingerprints:
+        return []
+    buckets = lsh_buckets(minhash(fingerprints))
+
+    # Only submissions sharing at least one LSH bucket are compared exactly
+    candidate_ids = [row[0] for row in db.query(models.LSHBucket.submission_id).filter(
+        models.LSHBucket.assignment_id == submission.assignment_id,
+        or_(*[and_(models.LSHBucket.band == band, models.LSHBucket.bucket == bucket) for band, bucket in enumerate(buckets)])
+    ).distinct().all()]
+
+    matches = []
+    if candidate_ids:
+        candidates = db.query(models.SubmissionFingerprint).filter(
+            models.SubmissionFingerprint.submission_id.in_(candidate_ids)
+        ).all()
+        for candidate in candidates:
+            similarity = jaccard(fingerprints, set(json.loads(candidate.fingerprints)))
+            if similarity >= PLAGIARISM_THRESHOLD:
+                matches.append((candidate.submission_id, similarity))
+
+    db.add(models.SubmissionFingerprint(
+        submission_id=submission.id,
+        assignment_id=submission.assignment_id,
+        fingerprints=json.dumps(sorted(fingerprints))
+    ))
+    db.add_all([
+        models.LSHBucket(assignment_id=submission.assignment_id, band=band, bucket=bucket, submission_id=submission.id)
+        for band, bucket in enumerate(buckets)
+    ])
+    # Record the match on both submissions
+    reverse_matches = []
+    for other_id, similarity in sorted(matches, key=lambda m: -m[1]):
+        db.add(models.PlagiarismMatch(submission_id=submission.id, matched_submission_id=other_id, similarity=similarity))
+        reverse_matches.append(
+            models.PlagiarismMatch(submission_id=other_id, matched_submission_id=submission.id, similarity=similarity)
+        )
+    db.add_all(reverse_matches)
+    db.commit()
+
+    return reverse_matches
+
+
+def get_matches(db: Session, submission_id: int) -> list:
+    return db.query(models.PlagiarismMatch).filter(
+        models.PlagiarismMatch.submission_id == submission_id
+    ).order_by(models.PlagiarismMatch.similarity.desc()).all()
+
+
+def flag_cheating(submission: models.Submission, matches: list):
+    """Mark the submission as cheating when it is near-identical to another one."""
+    flagged = [m for m in matches if m.similarity >= PLAGIARISM_FLAG_THRESHOLD]
+    if not flagged:
+        return
+    reason = "Highly similar to " + ", ".join(
+        f"submission #{m.matched_submission_id} ({m.similarity:.0%})" for m in flagged
+    ) + "."
+    submission.cheating_detected = True
+    submission.cheating_reason = f"{submission.cheating_reason} {reason}" if submission.cheating_reason else reason
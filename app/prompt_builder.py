@@ -0,0 +1,198 @@
+import ast
+import math
+import os
+import re
+from collections import Counter
+
+from app import static_analysis
+
+# Estimated tokens allowed in the user prompt (criteria + analysis + code).
+# Code that doesn't fit is condensed, then excerpted; see fit_code.
+PROMPT_TOKEN_BUDGET = int(os.getenv("PROMPT_TOKEN_BUDGET", "12000"))
+
+# The code always gets at least this share of the budget, however long the criteria
+MIN_CODE_BUDGET_SHARE = 0.5
+
+# Share of an excerpt's line budget given to the top of the file; the rest goes to the end
+EXCERPT_HEAD_SHARE = 0.65
+
+# Definitions listed in the outline of an excerpt's omitted middle
+MAX_OUTLINE_ENTRIES = 200
+
+_TRUNCATION_NOTE = (
+    "Note: the file is too long to show in full and has been {strategy} to fit: blank lines and "
+    "comments are removed and omitted code is marked with a '# ...' comment. "
+    "The static analysis above covers the whole file.\n\n"
+)
+
+_TOKEN_RE = re.compile(r"[A-Za-z]+|\d+|[^\sA-Za-z\d]|\n")
+
+
+def count_tokens(text: str) -> int:
+    """Estimate tokens without a model-specific tokenizer.
+
+    Words are counted in 4-character pieces, digit runs in 3-digit pieces, and
+    every punctuation character and newline as one token. This runs a little
+    above what BPE tokenizers report for code, which is the safe side for a budget.
+    """
+    tokens = 0
+    for piece in _TOKEN_RE.findall(text):
+        if piece[0].isalpha():
+            tokens += math.ceil(len(piece) / 4)
+        elif piece[0].isdigit():
+            tokens += math.ceil(len(piece) / 3)
+        else:
+            tokens += 1
+    return tokens
+
+
+class Prompt:
+    """A built prompt: ``content`` is passed to the agent as the user prompt."""
+
+    def __init__(self, prefix: str, body: str, strategy: str, estimated_tokens: int):
+        self.prefix = prefix
+        self.body = body
+        self.strategy = strategy  # full, condensed or excerpted
+        self.estimated_tokens = estimated_tokens
+
+    @property
+    def content(self) -> list:
+        # Everything before the cache point is identical for every submission to
+        # an assignment (the system prompt is sent ahead of it), so providers with
+        # prompt caching serve it from cache after the first grading
+        from pydantic_ai.messages import CachePoint
+
+        return [self.prefix, CachePoint(), self.body]
+
+    @property
+    def text(self) -> str:
+        return self.prefix + self.body
+
+
+class PromptBuilder:
+    def __init__(self, budget: int = PROMPT_TOKEN_BUDGET):
+        self.budget = budget
+        self.built = 0
+        self.estimated_tokens = 0
+        self.strategies = Counter()
+
+    def build(self, code: str, criteria: str, analysis) -> Prompt:
+        prefix = f"### Criteria:\n{criteria}\n\n"
+        analysis_section = f"### Static Analysis:\n{static_analysis.summary(analysis)}\n\n"
+        overhead = sum(count_tokens(part) for part in (
+            prefix, analysis_section, _TRUNCATION_NOTE.format(strategy="excerpted"), "### Submitted Code:\n```python\n\n```",
+        ))
+        code_budget = max(self.budget - overhead, int(self.budget * MIN_CODE_BUDGET_SHARE))
+
+        strategy, shown = fit_code(code, code_budget)
+        note = _TRUNCATION_NOTE.format(strategy=strategy) if strategy != "full" else ""
+        body = f"{analysis_section}{note}### Submitted Code:\n```python\n{shown}\n```"
+        prompt = Prompt(prefix, body, strategy, count_tokens(prefix) + count_tokens(body))
+
+        self.built += 1
+        self.estimated_tokens += prompt.estimated_tokens
+        self.strategies[strategy] += 1
+        return prompt
+
+    def stats(self) -> dict:
+        return {
+            "budget_tokens": self.budget,
+            "built": self.built,
+            "avg_estimated_tokens": self.estimated_tokens / self.built if self.built else None,
+            "strategies": dict(self.strategies),
+        }
+
+
+def fit_code(code: str, budget: int):
+    """Fit code into ``budget`` tokens. Returns ``(strategy, code)``.
+
+    1. ``full``: the code as submitted.
+    2. ``condensed``: blank and comment-only lines dropped.
+    3. ``excerpted``: the top and bottom of the condensed file, with an outline of
+       the classes and functions defined in the omitted middle.
+    """
+    if count_tokens(code) <= budget:
+        return "full", code
+
+    lines = code.splitlines()
+    condensed = _condense(lines)
+    if sum(tokens for _, _, tokens in condensed) <= budget:
+        return "condensed", _render(condensed)
+    return "excerpted", _excerpt(condensed, _definitions(code), budget)
+
+
+def _condense(lines: list) -> list:
+    """``(line number, text, tokens)`` for every line that isn't blank or only a comment."""
+    kept = []
+    for number, line in enumerate(lines, 1):
+        stripped = line.strip()
+        if stripped and not stripped.startswith("#"):
+            kept.append((number, line, count_tokens(line) + 1))
+    return kept
+
+
+def _render(kept: list) -> str:
+    return "\n".join(line for _, line, _ in kept)
+
+
+def _definitions(code: str) -> list:
+    """``(line number, "def name(...)")`` for every class and function, in file order."""
+    try:
+        tree = ast.parse(code)
+    except (SyntaxError, ValueError):
+        return []
+    definitions = []
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            args = ", ".join(arg.arg for arg in node.args.posonlyargs + node.args.args + node.args.kwonlyargs)
+            prefix = "async def" if isinstance(node, ast.AsyncFunctionDef) else "def"
+            definitions.append((node.lineno, f"{prefix} {node.name}({args})"))
+        elif isinstance(node, ast.ClassDef):
+            definitions.append((node.lineno, f"class {node.name}"))
+    return sorted(definitions)
+
+
+def _excerpt(kept: list, definitions: list, budget: int) -> str:
+    # Reserve room for the outline of the middle first, then split what's left
+    # between the head and the tail of the file
+    outline_budget = budget // 5
+    line_budget = budget - outline_budget
+    head, used = [], 0
+    for entry in kept:
+        if used + entry[2] > line_budget * EXCERPT_HEAD_SHARE:
+            break
+        head.append(entry)
+        used += entry[2]
+    tail = []
+    for entry in reversed(kept[len(head):]):
+        if used + entry[2] > line_budget:
+            break
+        tail.append(entry)
+        used += entry[2]
+    tail.reverse()
+
+    first_omitted = head[-1][0] + 1 if head else 1
+    last_omitted = tail[0][0] - 1 if tail else kept[-1][0]
+    omitted = [f"# ... lines {first_omitted}-{last_omitted} omitted to fit the grading budget ..."]
+    # The marker lines come out of the outline's share, with room for "... and N more"
+    outline, used = [], sum(count_tokens(line) + 1 for line in omitted + ["# Defined in the omitted lines:"]) + 12
+    middle = [d for d in definitions if first_omitted <= d[0] <= last_omitted]
+    for number, signature in middle[:MAX_OUTLINE_ENTRIES]:
+        entry = f"#   line {number}: {signature}"
+        used += count_tokens(entry) + 1
+        if used > outline_budget:
+            break
+        outline.append(entry)
+    if len(outline) < len(middle):
+        outline.append(f"#   ... and {len(middle) - len(outline)} more")
+
+    if outline:
+        omitted += ["# Defined in the omitted lines:"] + outline
+    sections = [_render(head)] if head else []
+    sections += omitted
+    if tail:
+        sections.append(_render(tail))
+    return "\n".join(sections)
+
+
+builder = PromptBuilder()
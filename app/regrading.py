@@ -0,0 +1,222 @@
+import asyncio
+import logging
+import os
+from datetime import datetime, timezone
+
+from sqlalchemy import func, select
+
+from app import models, grading_queue
+from app.database import AsyncSessionLocal
+
+logger = logging.getLogger(__name__)
+
+# Submissions regraded at once, across all regrade jobs. Kept below GRADING_WORKERS
+# so new submissions still get graded promptly while a regrade runs.
+REGRADE_CONCURRENCY = int(os.getenv("REGRADE_CONCURRENCY", "2"))
+
+# Progress is saved after every batch, so a resumed job repeats at most one batch
+REGRADE_BATCH_SIZE = int(os.getenv("REGRADE_BATCH_SIZE", "20"))
+
+ACTIVE_STATUSES = ("pending", "running")
+
+# How often a batch checks on grading jobs that the grading workers are running for it
+REGRADE_POLL_SECONDS = 0.5
+
+
+async def request_regrade(db, assignment: models.Assignment) -> models.RegradeJob:
+    """The assignment's active regrade job, or a new pending one."""
+    job = (await db.execute(
+        select(models.RegradeJob).where(
+            models.RegradeJob.assignment_id == assignment.id,
+            models.RegradeJob.status.in_(ACTIVE_STATUSES),
+        ).order_by(models.RegradeJob.id.desc()).limit(1)
+    )).scalars().first()
+    if job is None:
+        job = models.RegradeJob(
+            assignment_id=assignment.id,
+            status="pending",
+            criteria_sha256=grading_queue.sha256(assignment.criteria),
+            total=0, processed=0, regraded=0, skipped=0, failed=0, last_submission_id=0,
+        )
+        db.add(job)
+        await db.commit()
+    return job
+
+
+class RegradeRunner:
+    """Regrades an assignment's graded submissions in the background, one task per job.
+
+    A job walks the submissions in id order, a batch at a time, and saves its
+    progress after every batch; jobs still pending or running when the process
+    stops are resumed by the next ``start()``. Submissions with a result for their
+    code and the current criteria are skipped, so repeated or resumed runs only
+    pay for what is outdated. If the criteria change again mid-job, the job starts
+    over against the new text.
+    """
+
+    def __init__(self, concurrency: int = REGRADE_CONCURRENCY, batch_size: int = REGRADE_BATCH_SIZE):
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._slots = None
+        self._tasks = {}  # job id -> task
+
+    @property
+    def started(self) -> bool:
+        return self._slots is not None
+
+    async def start(self):
+        if self.started:
+            return
+        self._slots = asyncio.Semaphore(self.concurrency)
+        async with AsyncSessionLocal() as db:
+            job_ids = (await db.execute(
+                select(models.RegradeJob.id).where(
+                    models.RegradeJob.status.in_(ACTIVE_STATUSES)
+                ).order_by(models.RegradeJob.id)
+            )).scalars().all()
+        for job_id in job_ids:
+            self.run(job_id)
+
+    async def stop(self):
+        # Interrupted jobs stay "running" and are resumed by the next start()
+        tasks = list(self._tasks.values())
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._tasks = {}
+        self._slots = None
+
+    def run(self, job_id: int):
+        # When the runner is not started the job stays pending and is picked up by start()
+        if not self.started or job_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(job_id))
+        self._tasks[job_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(job_id, None))
+
+    async def _run(self, job_id: int):
+        try:
+            while await self._run_batch(job_id):
+                pass
+        except Exception as e:
+            logger.exception("Regrade job %s failed", job_id)
+            async with AsyncSessionLocal() as db:
+                job = await db.get(models.RegradeJob, job_id)
+                if job is not None:
+                    job.status = "failed"
+                    job.error = str(e)
+                    job.finished_at = datetime.now(timezone.utc)
+                    await db.commit()
+
+    async def _run_batch(self, job_id: int) -> bool:
+        """Process the next batch of the job. Returns whether there may be more."""
+        async with AsyncSessionLocal() as db:
+            job = await db.get(models.RegradeJob, job_id)
+            if job is None or job.status not in ACTIVE_STATUSES:
+                return False
+            assignment = await db.get(models.Assignment, job.assignment_id)
+            if assignment is None:
+                raise ValueError("Assignment no longer exists")
+
+            criteria_sha256 = grading_queue.sha256(assignment.criteria)
+            if job.status == "pending" or job.criteria_sha256 != criteria_sha256:
+                job.status = "running"
+                job.started_at = datetime.now(timezone.utc)
+                job.criteria_sha256 = criteria_sha256
+                job.last_submission_id = job.processed = job.regraded = job.skipped = job.failed = 0
+                job.total = (await db.execute(
+                    select(func.count(models.Submission.id)).where(
+                        models.Submission.assignment_id == assignment.id,
+                        models.Submission.result_version.is_not(None),
+                    )
+                )).scalar()
+
+            # Only graded submissions: pending ones are graded against the current criteria anyway
+            submissions = (await db.execute(
+                select(models.Submission).where(
+                    models.Submission.assignment_id == assignment.id,
+                    models.Submission.result_version.is_not(None),
+                    models.Submission.id > job.last_submission_id,
+                ).order_by(models.Submission.id).limit(self.batch_size)
+            )).scalars().all()
+            if not submissions:
+                job.status = "done"
+                job.finished_at = datetime.now(timezone.utc)
+                await db.commit()
+                return False
+
+            results = {}  # submission id -> its latest result for these criteria
+            for result in (await db.execute(
+                select(models.GradingResult).where(
+                    models.GradingResult.submission_id.in_([s.id for s in submissions]),
+                    models.GradingResult.criteria_sha256 == criteria_sha256,
+                ).order_by(models.GradingResult.version)
+            )).scalars():
+                results[result.submission_id] = result
+
+            grading_job_ids = []
+            for submission in submissions:
+                if submission.blob_sha256 is None:
+                    # Graded before sources were kept
+                    job.failed += 1
+                    continue
+                # The blob key is the hash of the source, so this needs no read of the blob
+                result = results.get(submission.id)
+                if result is not None and result.code_sha256 == submission.blob_sha256:
+                    if result.version != submission.result_version:
+                        grading_queue.apply_result(submission, result)
+                    job.skipped += 1
+                    continue
+                grading_job_ids.append(await self._grading_job(db, submission))
+            await db.commit()
+
+            # The previous result stays current until the new one is stored
+            await asyncio.gather(*[self._grade(grading_job_id) for grading_job_id in grading_job_ids])
+
+            statuses = await self._finished_statuses(grading_job_ids)
+            failed = sum(1 for status in statuses if status == "failed")
+            job.failed += failed
+            job.regraded += len(grading_job_ids) - failed
+            job.processed += len(submissions)
+            job.last_submission_id = submissions[-1].id
+            await db.commit()
+            return True
+
+    async def _grading_job(self, db, submission: models.Submission) -> int:
+        # A resumed batch reuses the grading job it had already created
+        job_id = (await db.execute(
+            select(models.GradingJob.id).where(
+                models.GradingJob.submission_id == submission.id,
+                models.GradingJob.status.in_(ACTIVE_STATUSES),
+            ).limit(1)
+        )).scalar()
+        if job_id is None:
+            job = models.GradingJob(submission_id=submission.id)
+            db.add(job)
+            await db.flush()
+            job_id = job.id
+        return job_id
+
+    async def _grade(self, grading_job_id: int):
+        async with self._slots:
+            await grading_queue.queue.grade(grading_job_id)
+
+    async def _finished_statuses(self, grading_job_ids: list) -> list:
+        """The statuses of the grading jobs, once none of them is pending or running.
+
+        ``_grade`` returns at once for a job the grading workers claimed first,
+        e.g. a resumed batch's job that they recovered after a restart.
+        """
+        while grading_job_ids:
+            # A fresh session per check: a long-lived one could keep reading an old snapshot
+            async with AsyncSessionLocal() as db:
+                statuses = (await db.execute(
+                    select(models.GradingJob.status).where(models.GradingJob.id.in_(grading_job_ids))
+                )).scalars().all()
+            if not any(status in ACTIVE_STATUSES for status in statuses):
+                return statuses
+            await asyncio.sleep(REGRADE_POLL_SECONDS)
+        return []
+
+
+runner = RegradeRunner()
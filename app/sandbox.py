@@ -0,0 +1,164 @@
+import asyncio
+import json
+import os
+import sys
+
+# Warm worker processes, each running one test at a time in a forked child
+SANDBOX_WORKERS = int(os.getenv("SANDBOX_WORKERS", "2"))
+
+# Limits for a single test case run
+SANDBOX_TIMEOUT_SECONDS = float(os.getenv("SANDBOX_TIMEOUT_SECONDS", "5"))
+SANDBOX_MEMORY_MB = int(os.getenv("SANDBOX_MEMORY_MB", "256"))
+SANDBOX_OUTPUT_BYTES = int(os.getenv("SANDBOX_OUTPUT_BYTES", str(64 * 1024)))
+
+WORKER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "sandbox_worker.py")
+
+
+class SandboxPool:
+    """Pool of pre-started ``sandbox_worker.py`` processes.
+
+    Interpreter startup is paid once per worker, not per test: each worker forks
+    a fresh, resource-limited child for every test it runs. Workers that stop
+    responding are killed and replaced.
+    """
+
+    def __init__(self, workers: int = SANDBOX_WORKERS):
+        self.workers = workers
+        self._idle = None
+        self._procs = set()
+        self._lock = asyncio.Lock()
+
+    async def start(self):
+        async with self._lock:
+            if self._idle is not None:
+                return
+            idle = asyncio.Queue()
+            for _ in range(self.workers):
+                idle.put_nowait(await self._spawn())
+            self._idle = idle
+
+    async def stop(self):
+        for proc in list(self._procs):
+            await self._discard(proc)
+        self._idle = None
+
+    async def _spawn(self):
+        proc = await asyncio.create_subprocess_exec(
+            sys.executable, "-I", WORKER_SCRIPT,
+            stdin=asyncio.subprocess.PIPE,
+            stdout=asyncio.subprocess.PIPE,
+            env={"PATH": os.environ.get("PATH", "/usr/bin:/bin"), "LANG": "C.UTF-8"},
+            # Results carry the captured output, JSON-escaped
+            limit=8 * SANDBOX_OUTPUT_BYTES + 1024 * 1024,
+        )
+        self._procs.add(proc)
+        return proc
+
+    async def _discard(self, proc):
+        self._procs.discard(proc)
+        if proc.returncode is None:
+            proc.kill()
+        await proc.wait()
+
+    async def run(self, request: dict) -> dict:
+        if self._idle is None:
+            await self.start()
+        request = {
+            "timeout": SANDBOX_TIMEOUT_SECONDS,
+            "memory_mb": SANDBOX_MEMORY_MB,
+            "output_bytes": SANDBOX_OUTPUT_BYTES,
+            **request,
+        }
+        idle = self._idle
+        proc = await idle.get()
+        try:
+            proc.stdin.write(json.dumps(request).encode() + b"\n")
+            await proc.stdin.drain()
+            # The worker enforces the timeout itself; this only catches a hung worker
+            line = await asyncio.wait_for(proc.stdout.readline(), timeout=request["timeout"] + 10)
+            if not line:
+                raise RuntimeError("sandbox worker exited")
+            return json.loads(line)
+        except (Exception, asyncio.CancelledError):
+            await self._discard(proc)
+            proc = await self._spawn()
+            raise
+        finally:
+            idle.put_nowait(proc)
+
+
+pool = SandboxPool()
+
+
+def _normalize_output(text: str) -> str:
+    lines = [line.rstrip() for line in (text or "").replace("\r\n", "\n").split("\n")]
+    while lines and not lines[-1]:
+        lines.pop()
+    return "\n".join(lines)
+
+
+def _outcome(test_case, result: dict) -> dict:
+    outcome = {
+        "test_case_id": test_case.id,
+        "name": test_case.name,
+        "passed": False,
+        "status": "failed",
+        "detail": None,
+        "duration_ms": result.get("duration_ms"),
+    }
+    if result.get("timeout"):
+        outcome.update(status="timeout", detail=f"Exceeded the {SANDBOX_TIMEOUT_SECONDS:g}s time limit")
+    elif result.get("error"):
+        outcome.update(status="error", detail=result["error"])
+    elif test_case.kind == "pytest":
+        if result.get("tests", 0) == 0:
+            outcome.update(status="error", detail="No test functions found")
+        elif result.get("failed"):
+            outcome["detail"] = "; ".join(result.get("failures", []))
+        else:
+            outcome.update(passed=True, status="passed")
+    elif _normalize_output(result.get("stdout")) == _normalize_output(test_case.expected_output):
+        outcome.update(passed=True, status="passed")
+    else:
+        # Expected output is not echoed back: test cases may be hidden from students
+        outcome["detail"] = "Output did not match the expected output"
+    return outcome
+
+
+async def _run_one(code: str, test_case) -> dict:
+    request = {"code": code, "kind": test_case.kind}
+    if test_case.kind == "pytest":
+        request["test_code"] = test_case.test_code or ""
+    else:
+        request["stdin"] = test_case.stdin or ""
+    try:
+        result = await pool.run(request)
+    except Exception as e:
+        result = {"error": f"Sandbox failure: {e}"}
+    return _outcome(test_case, result)
+
+
+async def run_test_cases(code: str, test_cases: list) -> dict:
+    """Run a submission against an assignment's test cases.
+
+    Returns the per-test outcomes plus the weighted pass rate (0-1).
+    """
+    try:
+        compile(code, "solution.py", "exec")
+    except (SyntaxError, ValueError) as e:
+        # Nothing to run; every test fails the same way
+        outcomes = [{
+            "test_case_id": t.id, "name": t.name, "passed": False, "status": "error",
+            "detail": f"Code does not compile: {e}", "duration_ms": None,
+        } for t in test_cases]
+    else:
+        outcomes = await asyncio.gather(*(_run_one(code, t) for t in test_cases))
+
+    total_weight = sum(t.weight for t in test_cases)
+    passed_weight = sum(t.weight for t, o in zip(test_cases, outcomes) if o["passed"])
+    return {
+        "passed": sum(1 for o in outcomes if o["passed"]),
+        "total": len(outcomes),
+        "pass_rate": passed_weight / total_weight if total_weight else 0.0,
+        "results": list(outcomes),
+    }
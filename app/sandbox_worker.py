@@ -0,0 +1,636 @@
+"""Warm sandbox worker, started by ``app.sandbox`` as ``python -I sandbox_worker.py``.
+
+Reads one JSON request per line on stdin and writes one JSON result per line on
+stdout. The interpreter is started once; each request runs in a child forked from
+it, so a test costs a fork instead of an interpreter startup. The child drops
+privileges, gets CPU, memory, file and process limits, and never shares state
+with other requests.
+
+Each test function runs in two children: one loads the submission and does
+nothing but serve calls into it, the other runs the test code against proxies
+for the submission's names and reports the verdict. The submission's process
+never holds the result pipe and can't reach the memory of the test's, so
+patching modules, inspecting frames, exiting early or writing to pipes can't
+turn a failure into a pass.
+
+Deliberately standalone (stdlib only, no ``app`` imports): it is run in isolated
+mode and must not load the web application into the sandbox.
+"""
+import ast
+import builtins
+import json
+import os
+import resource
+import select
+import shutil
+import signal
+import sys
+import tempfile
+import time
+import traceback
+import types
+
+# Imported once here so the forked children start with them warm
+import bisect, collections, copy, dataclasses, datetime, decimal, fractions, functools, heapq  # noqa: E401,F401
+import itertools, math, operator, random, re, statistics, string, textwrap, typing, unittest  # noqa: E401,F401
+
+NOBODY = 65534
+MAX_ERROR_CHARS = 2000
+MAX_FAILURES = 20
+
+def _limit(kind, value):
+    try:
+        resource.setrlimit(kind, (value, value))
+    except (ValueError, OSError):
+        pass
+
+
+def _confine(request, workdir):
+    os.setsid()
+    os.chdir(workdir)
+    cpu = max(1, int(request["timeout"] + 0.999))
+    _limit(resource.RLIMIT_CPU, cpu)
+    _limit(resource.RLIMIT_AS, request["memory_mb"] * 1024 * 1024)
+    _limit(resource.RLIMIT_FSIZE, request["output_bytes"])
+    _limit(resource.RLIMIT_NOFILE, 64)
+    _limit(resource.RLIMIT_CORE, 0)
+    # Writing past the output cap raises an error instead of killing the child
+    signal.signal(signal.SIGXFSZ, signal.SIG_IGN)
+    if hasattr(os, "unshare") and hasattr(os, "CLONE_NEWNET"):
+        try:
+            os.unshare(os.CLONE_NEWNET)  # No network, where permitted
+        except OSError:
+            pass
+    if os.getuid() == 0:
+        os.chown(workdir, NOBODY, NOBODY)
+        os.setgroups([])
+        os.setgid(NOBODY)
+        os.setuid(NOBODY)
+    _limit(resource.RLIMIT_NPROC, 0)  # No fork bombs
+
+
+def _start_child(request, workdir, keep, output=True):
+    """Common start of every child: standard streams on the workdir files (or
+    discarded), every descriptor but ``keep`` closed, then confined."""
+    # Opened before dropping privileges; the files stay owned by the worker
+    stdin = os.open(os.path.join(workdir, "stdin.txt"), os.O_RDONLY)
+    if output:
+        stdout = os.open(os.path.join(workdir, "stdout.txt"), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+        stderr = os.open(os.path.join(workdir, "stderr.txt"), os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    else:
+        stdout = os.open(os.devnull, os.O_WRONLY)
+        stderr = os.open(os.devnull, os.O_WRONLY)
+    for fd, target in ((stdin, 0), (stdout, 1), (stderr, 2)):
+        os.dup2(fd, target)
+        os.close(fd)
+    try:
+        fds = [int(fd) for fd in os.listdir("/proc/self/fd")]
+    except OSError:
+        fds = range(3, 256)
+    for fd in fds:
+        if fd > 2 and fd not in keep:
+            try:
+                os.close(fd)
+            except OSError:
+                pass
+    _confine(request, workdir)
+    sys.stdin = open(0, "r", closefd=False)
+    sys.stdout = open(1, "w", closefd=False)
+    sys.stderr = open(2, "w", closefd=False)
+
+
+def _finish_child(result_fd, result):
+    try:
+        sys.stdout.flush()
+    except BaseException:
+        pass
+    try:
+        os.write(result_fd, json.dumps(result).encode())
+    except BaseException:
+        pass
+    os._exit(0)
+
+
+def _run_child(request, workdir, result_fd):
+    """Runs the program in the forked child; never returns."""
+    result = {}
+    try:
+        _start_child(request, workdir, (result_fd,))
+        sys.argv = ["solution.py"]
+        sys.path[:0] = ["."]
+        code = compile(request["code"], "solution.py", "exec")
+        try:
+            exec(code, {"__name__": "__main__", "__file__": "solution.py", "__builtins__": __builtins__})
+        except SystemExit as e:
+            if e.code not in (None, 0):
+                result = {"error": f"Exited with status {e.code}"}
+    except MemoryError:
+        result = {"error": "Memory limit exceeded"}
+    except BaseException as e:
+        result = {"error": _describe(e)}
+    _finish_child(result_fd, result)
+
+
+def _test_names(test_code):
+    """The ``test*`` functions defined at the top of the test code, in order.
+
+    Collected from the source rather than by running it, so a submission
+    can't add or hide tests.
+    """
+    tree = ast.parse(test_code, "test_solution.py")
+    names = [
+        node.name for node in tree.body
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)) and node.name.startswith("test")
+    ]
+    return list(dict.fromkeys(names))
+
+
+# Values cross between the two processes of a test as JSON. Builtin values are
+# copied (containers other than lists are tagged); anything else stays in the
+# submission's process and crosses as {"ref": n, "type": name}.
+
+def _encode(value, to_ref):
+    kind = type(value)
+    if value is None or kind in (bool, int, float, str):
+        return value
+    if kind is list:
+        return [_encode(item, to_ref) for item in value]
+    if kind in (tuple, set, frozenset):
+        return {kind.__name__: [_encode(item, to_ref) for item in value]}
+    if kind is dict:
+        return {"dict": [[_encode(k, to_ref), _encode(v, to_ref)] for k, v in value.items()]}
+    if kind is bytes:
+        return {"bytes": value.hex()}
+    if kind is complex:
+        return {"complex": [value.real, value.imag]}
+    return to_ref(value)
+
+
+def _decode(data, from_ref):
+    kind = type(data)
+    if data is None or kind in (bool, int, float, str):
+        return data
+    if kind is list:
+        return [_decode(item, from_ref) for item in data]
+    if kind is dict:
+        if "ref" in data:
+            return from_ref(data)
+        if len(data) == 1:
+            [(tag, body)] = data.items()
+            if tag == "bytes" and type(body) is str:
+                return bytes.fromhex(body)
+            if type(body) is list:
+                if tag == "tuple":
+                    return tuple(_decode(item, from_ref) for item in body)
+                if tag == "set":
+                    return {_decode(item, from_ref) for item in body}
+                if tag == "frozenset":
+                    return frozenset(_decode(item, from_ref) for item in body)
+                if tag == "dict":
+                    return {_decode(k, from_ref): _decode(v, from_ref) for k, v in body}
+                if tag == "complex":
+                    return complex(*body)
+    raise ValueError("Malformed value from the solution")
+
+
+def _send(stream, message):
+    stream.write(json.dumps(message).encode() + b"\n")
+    stream.flush()
+
+
+def _serve_solution(request, workdir, calls_fd, replies_fd):
+    """The submission's side of a test, in its own child; never returns.
+
+    Loads the solution, sends its public names, then answers the test's
+    requests until it hangs up. It holds only these two pipes.
+    """
+    try:
+        _start_child(request, workdir, (calls_fd, replies_fd))
+        calls = os.fdopen(calls_fd, "rb")
+        replies = os.fdopen(replies_fd, "wb")
+        sys.argv = ["solution.py"]
+        sys.path[:0] = ["."]
+        objects, refs = [], {}
+
+        def to_ref(value):
+            if id(value) not in refs:
+                refs[id(value)] = len(objects)
+                objects.append(value)
+            return {"ref": refs[id(value)], "type": type(value).__name__}
+
+        solution = types.ModuleType("solution")
+        solution.__file__ = "solution.py"
+        sys.modules["solution"] = solution
+        try:
+            exec(compile(request["code"], "solution.py", "exec"), solution.__dict__)
+            public = {name: value for name, value in vars(solution).items() if not name.startswith("_")}
+            hello = {"exports": _encode(public, to_ref)}
+        except MemoryError:
+            hello = {"error": "Memory limit exceeded"}
+        except BaseException as e:
+            hello = {"error": _describe(e)}
+        _send(replies, hello)
+        if "exports" in hello:
+            for line in calls:
+                _send(replies, _serve_call(json.loads(line), objects, to_ref))
+    except BaseException:
+        pass
+    try:
+        sys.stdout.flush()
+    except BaseException:
+        pass
+    os._exit(0)
+
+
+def _serve_call(call, objects, to_ref):
+    try:
+        def decode(data):
+            return _decode(data, lambda ref: objects[ref["ref"]])
+
+        target, op = objects[call["ref"]], call["op"]
+        if op == "call":
+            args, kwargs = decode(call["args"]), decode(call["kwargs"])
+            value = target(*args, **kwargs)
+            # The arguments go back too, for the test to see changes made in place
+            return {"value": _encode(value, to_ref), "args": _encode(args, to_ref), "kwargs": _encode(kwargs, to_ref)}
+        if op == "getattr":
+            value = getattr(target, call["name"])
+        elif op == "setattr":
+            value = setattr(target, call["name"], decode(call["value"]))
+        elif op == "getitem":
+            value = target[decode(call["key"])]
+        elif op == "setitem":
+            target[decode(call["key"])] = decode(call["value"])
+            value = None
+        elif op == "contains":
+            value = decode(call["item"]) in target
+        elif op == "eq":
+            value = target == objects[call["other"]]
+        else:
+            value = {"len": len, "iter": iter, "next": next, "bool": bool, "hash": hash, "str": str, "repr": repr}[op](target)
+        return {"value": _encode(value, to_ref)}
+    except MemoryError:
+        return {"raised": "MemoryError", "message": "memory limit exceeded", "where": ""}
+    except BaseException as e:
+        return {"raised": type(e).__name__, "message": str(e)[:MAX_ERROR_CHARS], "where": _where(e)}
+
+
+class SolutionError(Exception):
+    """Raised in the test for a failure of the solution that has no builtin exception type."""
+
+
+class _Solution:
+    """The test's end of the pipes to the submission's process."""
+
+    def __init__(self, calls_fd, replies_fd):
+        self.calls = os.fdopen(calls_fd, "wb")
+        self.replies = os.fdopen(replies_fd, "rb")
+        self.proxies = {}
+
+    def receive(self):
+        line = self.replies.readline()
+        if not line:
+            raise SolutionError("the solution's process exited")
+        message = json.loads(line)
+        if type(message) is not dict:
+            raise SolutionError("malformed reply from the solution")
+        return message
+
+    def to_ref(self, value):
+        if type(value) is _Remote and value._solution is self:
+            return {"ref": value._ref}
+        raise TypeError(f"{type(value).__name__} values can't be passed to the solution")
+
+    def from_ref(self, data):
+        ref, name = data.get("ref"), data.get("type")
+        if type(ref) is not int or type(name) is not str:
+            raise SolutionError("malformed reply from the solution")
+        if ref not in self.proxies:
+            self.proxies[ref] = _Remote(self, ref, name)
+        return self.proxies[ref]
+
+    def decode(self, data):
+        return _decode(data, self.from_ref)
+
+    def request(self, op, ref, **fields):
+        call = {"op": op, "ref": ref}
+        call.update({key: _encode(value, self.to_ref) for key, value in fields.items()})
+        _send(self.calls, call)
+        reply = self.receive()
+        if "raised" in reply:
+            raise _reraised(reply)
+        return reply
+
+    def value(self, op, ref, kind=None, **fields):
+        value = self.decode(self.request(op, ref, **fields).get("value"))
+        if kind is not None and type(value) is not kind:
+            raise SolutionError(f"{op} returned {type(value).__name__} instead of {kind.__name__}")
+        return value
+
+    def call(self, ref, args, kwargs):
+        reply = self.request("call", ref, args=list(args), kwargs=kwargs)
+        updated_args, updated_kwargs = self.decode(reply.get("args")), self.decode(reply.get("kwargs"))
+        if type(updated_args) is list and len(updated_args) == len(args):
+            for original, updated in zip(args, updated_args):
+                _sync(original, updated)
+        if type(updated_kwargs) is dict:
+            for key, original in kwargs.items():
+                _sync(original, updated_kwargs.get(key))
+        return self.decode(reply.get("value"))
+
+
+def _sync(original, updated):
+    if type(original) is list and type(updated) is list:
+        original[:] = updated
+    elif type(original) in (dict, set) and type(updated) is type(original):
+        original.clear()
+        original.update(updated)
+
+
+def _reraised(reply):
+    name, message, where = reply.get("raised"), reply.get("message"), reply.get("where")
+    if not all(type(field) is str for field in (name, message, where)):
+        return SolutionError("malformed reply from the solution")
+    kind = getattr(builtins, name, None)
+    if isinstance(kind, type) and issubclass(kind, Exception):
+        try:
+            return kind(message + where)
+        except Exception:
+            pass
+    return SolutionError(f"{name}: {message}{where}")
+
+
+class _Remote:
+    """An object of the submission, standing in for it in the test.
+
+    Operations on it are requests to the submission's process. It compares
+    equal only to another object of the submission, so a custom ``__eq__``
+    can't make a wrong answer match an expected value.
+    """
+
+    __slots__ = ("_solution", "_ref", "_type")
+
+    def __init__(self, solution, ref, type_name):
+        object.__setattr__(self, "_solution", solution)
+        object.__setattr__(self, "_ref", ref)
+        object.__setattr__(self, "_type", type_name)
+
+    def _value(self, op, kind=None, **fields):
+        return self._solution.value(op, self._ref, kind, **fields)
+
+    def __getattr__(self, name):
+        if name.startswith("__") and name.endswith("__"):
+            raise AttributeError(name)
+        return self._value("getattr", name=name)
+
+    def __setattr__(self, name, value):
+        self._value("setattr", name=name, value=value)
+
+    def __call__(self, *args, **kwargs):
+        return self._solution.call(self._ref, args, kwargs)
+
+    def __getitem__(self, key):
+        return self._value("getitem", key=key)
+
+    def __setitem__(self, key, value):
+        self._value("setitem", key=key, value=value)
+
+    def __contains__(self, item):
+        return self._value("contains", bool, item=item)
+
+    def __len__(self):
+        return self._value("len", int)
+
+    def __bool__(self):
+        return self._value("bool", bool)
+
+    def __hash__(self):
+        return self._value("hash", int)
+
+    def __iter__(self):
+        iterator = self._value("iter")
+        while True:
+            try:
+                yield iterator._value("next")
+            except StopIteration:
+                return
+
+    def __next__(self):
+        return self._value("next")
+
+    def __eq__(self, other):
+        if type(other) is not _Remote or other._solution is not self._solution:
+            return NotImplemented
+        return self._value("eq", bool, other=other._ref)
+
+    def __ne__(self, other):
+        equal = self.__eq__(other)
+        return equal if equal is NotImplemented else not equal
+
+    def __str__(self):
+        return self._value("str", str)
+
+    def __repr__(self):
+        return self._value("repr", str)
+
+
+def _run_test(request, workdir, name, calls_fd, replies_fd, result_fd):
+    """The test's side, in its own child; never returns.
+
+    pytest-style: runs the test function ``name`` and writes ``{"passed": true}``
+    or ``{"failure": ...}`` to ``result_fd``. The solution is importable as
+    ``solution`` and its public names are also available in the test code
+    directly, as proxies for the values in the submission's process.
+    """
+    try:
+        _start_child(request, workdir, (calls_fd, replies_fd, result_fd), output=False)
+        solution = _Solution(calls_fd, replies_fd)
+        hello = solution.receive()
+        if "exports" not in hello:
+            raise SolutionError(str(hello.get("error")))
+        exports = solution.decode(hello["exports"])
+        if type(exports) is not dict:
+            raise SolutionError("malformed reply from the solution")
+        module = types.ModuleType("solution")
+        sys.modules["solution"] = module
+        namespace = {}
+        for key, value in exports.items():
+            if type(key) is str and not key.startswith("_") and key.isidentifier():
+                setattr(module, key, value)
+                # Builtins keep their meaning in the test code
+                if not hasattr(builtins, key):
+                    namespace[key] = value
+        namespace.update({"__name__": "test_solution", "__builtins__": __builtins__})
+        exec(compile(request["test_code"], "test_solution.py", "exec"), namespace)
+        try:
+            namespace[name]()
+            result = {"passed": True}
+        except AssertionError as e:
+            result = {"failure": f"{name}: {str(e) or 'assertion failed'}"}
+        except MemoryError:
+            result = {"failure": f"{name}: memory limit exceeded"}
+        except Exception as e:
+            result = {"failure": f"{name}: {_describe(e)}"}
+    except MemoryError:
+        result = {"error": "Memory limit exceeded"}
+    except SolutionError as e:
+        result = {"error": str(e)}
+    except BaseException as e:
+        result = {"error": _describe(e)}
+    _finish_child(result_fd, result)
+
+
+def _where(e):
+    frames = [f for f in traceback.extract_tb(e.__traceback__) if f.filename in ("solution.py", "test_solution.py")]
+    return f" ({frames[-1].filename}, line {frames[-1].lineno})" if frames else ""
+
+
+def _describe(e):
+    return f"{type(e).__name__}: {e}"[:MAX_ERROR_CHARS] + _where(e)
+
+
+def _read_capped(path, limit):
+    try:
+        with open(path, "rb") as f:
+            return f.read(limit).decode("utf-8", "replace")
+    except OSError:
+        return ""
+
+
+def _collect(read_fd, deadline):
+    """Read ``read_fd`` until EOF or the deadline. Returns the payload and whether it timed out."""
+    payload, timed_out = b"", False
+    while True:
+        remaining = deadline - time.monotonic()
+        if remaining <= 0:
+            timed_out = True
+            break
+        ready, _, _ = select.select([read_fd], [], [], remaining)
+        if not ready:
+            continue
+        chunk = os.read(read_fd, 65536)
+        if not chunk:
+            break
+        payload += chunk
+    os.close(read_fd)
+    return payload, timed_out
+
+
+def _kill(pid):
+    for kill in (os.killpg, os.kill):
+        try:
+            kill(pid, signal.SIGKILL)
+        except ProcessLookupError:
+            pass
+
+
+def _killed_by(status, *signals):
+    return os.WIFSIGNALED(status) and os.WTERMSIG(status) in signals
+
+
+def _crashed(status):
+    return {"error": f"Crashed with signal {os.WTERMSIG(status)}" if os.WIFSIGNALED(status) else "Crashed"}
+
+
+def _run_program(request, workdir, deadline):
+    read_fd, write_fd = os.pipe()
+    pid = os.fork()
+    if pid == 0:
+        _run_child(request, workdir, write_fd)
+    os.close(write_fd)
+    payload, timed_out = _collect(read_fd, deadline)
+    if timed_out:
+        _kill(pid)
+    _, status = os.waitpid(pid, 0)
+    if timed_out or _killed_by(status, signal.SIGXCPU, signal.SIGKILL):
+        return {"timeout": True}
+    try:
+        result = json.loads(payload)
+    except ValueError:
+        result = None
+    return result if isinstance(result, dict) else _crashed(status)
+
+
+def _fork_test(request, workdir, deadline, name):
+    """Run the test function ``name`` in its pair of children. Returns its outcome."""
+    calls_read, calls_write = os.pipe()
+    replies_read, replies_write = os.pipe()
+    result_read, result_write = os.pipe()
+    server = os.fork()
+    if server == 0:
+        _serve_solution(request, workdir, calls_read, replies_write)
+    client = os.fork()
+    if client == 0:
+        _run_test(request, workdir, name, calls_write, replies_read, result_write)
+    for fd in (calls_read, calls_write, replies_read, replies_write, result_write):
+        os.close(fd)
+
+    payload, timed_out = _collect(result_read, deadline)
+    # The verdict is in (or time is up): the submission has nothing left to do
+    _kill(server)
+    if timed_out:
+        _kill(client)
+    _, server_status = os.waitpid(server, 0)
+    _, client_status = os.waitpid(client, 0)
+    if timed_out or _killed_by(client_status, signal.SIGXCPU, signal.SIGKILL) or _killed_by(server_status, signal.SIGXCPU):
+        return {"timeout": True}
+    try:
+        outcome = json.loads(payload)
+    except ValueError:
+        outcome = None
+    return outcome if isinstance(outcome, dict) else _crashed(client_status)
+
+
+def _run_tests(request, workdir, deadline):
+    """Run each test function in children of its own; all of them share the time limit."""
+    try:
+        names = _test_names(request["test_code"])
+    except (SyntaxError, ValueError) as e:
+        return {"error": f"{type(e).__name__}: {e}"[:MAX_ERROR_CHARS]}
+    failures = []
+    for name in names:
+        outcome = _fork_test(request, workdir, deadline, name)
+        if outcome.get("timeout"):
+            return {"timeout": True}
+        if outcome.get("passed") is True:
+            continue
+        if outcome.get("error"):
+            # The solution or the test code failed to load, or crashed: the case errors out as a whole
+            return {"error": str(outcome["error"])[:MAX_ERROR_CHARS]}
+        failures.append(str(outcome.get("failure") or f"{name}: failed")[:MAX_ERROR_CHARS])
+    return {"tests": len(names), "failed": len(failures), "failures": failures[:MAX_FAILURES]}
+
+
+def run(request):
+    workdir = tempfile.mkdtemp(prefix="scorac-")
+    try:
+        with open(os.path.join(workdir, "stdin.txt"), "w") as f:
+            f.write(request.get("stdin") or "")
+        started = time.monotonic()
+        deadline = started + request["timeout"]
+        if request["kind"] == "pytest":
+            result = _run_tests(request, workdir, deadline)
+        else:
+            result = _run_program(request, workdir, deadline)
+        elapsed = time.monotonic() - started
+
+        result["stdout"] = _read_capped(os.path.join(workdir, "stdout.txt"), request["output_bytes"])
+        result["stderr"] = _read_capped(os.path.join(workdir, "stderr.txt"), MAX_ERROR_CHARS)
+        result["duration_ms"] = round(elapsed * 1000, 1)
+        return result
+    finally:
+        shutil.rmtree(workdir, ignore_errors=True)
+
+
+def main():
+    for line in sys.stdin:
+        try:
+            result = run(json.loads(line))
+        except Exception as e:
+            result = {"error": f"Sandbox failure: {e}"}
+        sys.stdout.write(json.dumps(result) + "\n")
+        sys.stdout.flush()
+
+
+if __name__ == "__main__":
+    main()
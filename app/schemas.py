@@ -1,5 +1,5 @@
-from pydantic import BaseModel, EmailStr
-from typing import Optional, List
+from pydantic import BaseModel, EmailStr, Field, model_validator
+from typing import Optional, List, Literal, Dict
 from datetime import datetime
 
 class UserCreate(BaseModel):
@@ -38,6 +38,43 @@ class AssignmentResponse(BaseModel):
     class Config:
         from_attributes = True
  
+class TestCaseCreate(BaseModel):
+    name: str
+    kind: Literal["io", "pytest"] = "io"
+    stdin: Optional[str] = None
+    expected_output: Optional[str] = None
+    test_code: Optional[str] = None
+    weight: int = Field(default=1, ge=1)
+
+    @model_validator(mode="after")
+    def check_kind_fields(self):
+        if self.kind == "io" and self.expected_output is None:
+            raise ValueError("io test cases need expected_output")
+        if self.kind == "pytest" and not self.test_code:
+            raise ValueError("pytest test cases need test_code")
+        return self
+
+class TestCaseResponse(BaseModel):
+    id: int
+    assignment_id: int
+    name: str
+    kind: str
+    stdin: Optional[str] = None
+    expected_output: Optional[str] = None
+    test_code: Optional[str] = None
+    weight: int
+
+    class Config:
+        from_attributes = True
+
+class TestCaseResult(BaseModel):
+    test_case_id: int
+    name: str
+    passed: bool
+    status: str
+    detail: Optional[str] = None
+    duration_ms: Optional[float] = None
+
 class ScoreResponse(BaseModel):
     score: int
     feedback: str
@@ -46,6 +83,31 @@ class ScoreResponse(BaseModel):
     cheating_detected: bool = False
     cheating_reason: Optional[str] = None
     reasoning: Optional[str] = None
+    confidence: Optional[float] = Field(default=None, ge=0, le=1)
+
+class SyntaxErrorInfo(BaseModel):
+    message: str
+    line: Optional[int] = None
+    column: Optional[int] = None
+    text: Optional[str] = None
+
+class CodeAnalysis(BaseModel):
+    lines: int = 0
+    code_lines: int = 0
+    comment_lines: int = 0
+    functions: int = 0
+    classes: int = 0
+    imports: List[str] = []
+    max_nesting: int = 0
+    complexity: int = 0
+    max_function_complexity: int = 0
+    is_empty: bool = False
+    is_python: bool = True
+    syntax_error: Optional[SyntaxErrorInfo] = None
+
+class SimilarityMatch(BaseModel):
+    submission_id: int
+    similarity: float
 
 class SubmissionResponse(BaseModel):
     id: int
@@ -53,22 +115,151 @@ class SubmissionResponse(BaseModel):
     user_id: int
     student_name: Optional[str] = None
     matric_number: Optional[str] = None
-    score: int
-    feedback: str
+    score: Optional[int] = None
+    feedback: Optional[str] = None
     strengths: List[str] = []
     weakpoints: List[str] = []
     cheating_detected: bool = False
     cheating_reason: Optional[str] = None
     reasoning: Optional[str] = None
+    similar_submissions: List[SimilarityMatch] = []
+    tests_passed: Optional[int] = None
+    tests_total: Optional[int] = None
+    test_results: List[TestCaseResult] = []
+    input_tokens: Optional[int] = None
+    output_tokens: Optional[int] = None
+    cache_read_tokens: Optional[int] = None
+    result_version: Optional[int] = None
+    status: str = "graded"
     created_at: datetime
     
     class Config:
         from_attributes = True
 
+class SubmissionAccepted(BaseModel):
+    submission_id: int
+    job_id: int
+    status: str
+
+class SubmissionStatusResponse(BaseModel):
+    submission_id: int
+    job_id: Optional[int] = None
+    status: str
+    attempts: int = 0
+    error: Optional[str] = None
+    queued_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+    result: Optional[SubmissionResponse] = None
+
+class GradingResultResponse(BaseModel):
+    version: int
+    current: bool = False
+    score: Optional[int] = None
+    feedback: Optional[str] = None
+    strengths: List[str] = []
+    weakpoints: List[str] = []
+    cheating_detected: bool = False
+    cheating_reason: Optional[str] = None
+    tests_passed: Optional[int] = None
+    tests_total: Optional[int] = None
+    code_sha256: Optional[str] = None
+    criteria_sha256: Optional[str] = None
+    grading_job_id: Optional[int] = None
+    created_at: Optional[datetime] = None
+
+class RegradeJobResponse(BaseModel):
+    id: int
+    assignment_id: int
+    status: str
+    total: int
+    processed: int
+    regraded: int
+    skipped: int
+    failed: int
+    progress: float
+    error: Optional[str] = None
+    created_at: Optional[datetime] = None
+    started_at: Optional[datetime] = None
+    finished_at: Optional[datetime] = None
+
+class ModelClientStats(BaseModel):
+    calls: int
+    attempts: int
+    retries: int
+    timeouts: int
+    hedges: int
+    failures: int
+    rejected: int
+    breaker_state: str
+
+class ModelTierStats(BaseModel):
+    tier: str
+    model: str
+    calls: int
+    errors: int
+    avg_latency_seconds: Optional[float] = None
+    p95_latency_seconds: Optional[float] = None
+    input_tokens: int
+    output_tokens: int
+    cost_usd: float
+    client: ModelClientStats
+
+class ModelRoutingStats(BaseModel):
+    gradings: int
+    escalations: int
+    escalation_rate: Optional[float] = None
+    escalation_reasons: Dict[str, int] = {}
+    escalation_failures: int
+    tiers: List[ModelTierStats]
+
+class PromptStats(BaseModel):
+    budget_tokens: int
+    built: int
+    avg_estimated_tokens: Optional[float] = None
+    strategies: Dict[str, int] = {}
+
+class AdmissionLaneStats(BaseModel):
+    share: float
+    admitted: int
+    rejected: Dict[str, int] = {}
+
+class AdmissionStats(BaseModel):
+    enabled: bool
+    in_flight: int
+    latency_seconds: float
+    estimated_wait_seconds: float
+    lanes: Dict[str, AdmissionLaneStats] = {}
+
+class GradingQueueStats(BaseModel):
+    workers: int
+    queue_depth: int
+    running: int
+    completed: int
+    failed: int
+    throughput_per_minute: int
+    avg_latency_seconds: Optional[float] = None
+    p95_latency_seconds: Optional[float] = None
+    avg_wait_seconds: Optional[float] = None
+    model_routing: Optional[ModelRoutingStats] = None
+    prompts: Optional[PromptStats] = None
+    admission: Optional[AdmissionStats] = None
+
+class GradingCacheStats(BaseModel):
+    memory_entries: int
+    max_memory_entries: int
+    ttl_seconds: int
+    memory_hits: int
+    db_hits: int
+    misses: int
+    hit_rate: Optional[float] = None
+
 class Token(BaseModel):
     access_token: str
     token_type: str
 
 class TokenData(BaseModel):
     email: Optional[EmailStr] = None
+    id: Optional[int] = None
+    exp: Optional[int] = None
 
@@ -0,0 +1,167 @@
+import ast
+import io
+import re
+import tokenize
+
+from app.schemas import CodeAnalysis, ScoreResponse, SyntaxErrorInfo
+
+# Statements that open a nested block, for the nesting depth metric
+_BLOCKS = (
+    ast.If, ast.For, ast.AsyncFor, ast.While, ast.With, ast.AsyncWith, ast.Try,
+    ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef, ast.Match,
+)
+if hasattr(ast, "TryStar"):
+    _BLOCKS += (ast.TryStar,)
+
+# Each of these adds one path through a function (McCabe complexity)
+_BRANCHES = (
+    ast.If, ast.IfExp, ast.For, ast.AsyncFor, ast.While, ast.ExceptHandler,
+    ast.Assert, ast.comprehension, ast.match_case,
+)
+
+# Lines that are a strong sign the upload is another language, not broken Python
+_OTHER_LANGUAGES = re.compile(
+    r"^\s*(#include\s*[<\"]|using namespace\b|public\s+(static\s+)?(class|void|int)\b|package\s+[\w.]+;|"
+    r"import\s+java\.|function\s+\w+\s*\(|(const|let|var)\s+\w+\s*=|fn\s+main\s*\(|func\s+main\s*\(|"
+    r"<\?php|<!DOCTYPE|<html\b|SELECT\s.+\sFROM\s)",
+    re.IGNORECASE | re.MULTILINE,
+)
+
+
+def analyze(code: str) -> CodeAnalysis:
+    """Parse a submission locally and measure it, without running it."""
+    lines = code.splitlines()
+    analysis = CodeAnalysis(lines=len(lines))
+    if not code.strip():
+        analysis.is_empty = True
+        return analysis
+    if "\0" in code:
+        analysis.is_python = False
+        return analysis
+
+    try:
+        tree = ast.parse(code)
+    except SyntaxError as e:
+        analysis.syntax_error = SyntaxErrorInfo(
+            message=e.msg,
+            line=e.lineno,
+            column=e.offset,
+            text=e.text.strip() if e.text else None,
+        )
+        analysis.is_python = not _OTHER_LANGUAGES.search(code)
+        return analysis
+    except ValueError as e:
+        analysis.syntax_error = SyntaxErrorInfo(message=str(e))
+        return analysis
+
+    analysis.comment_lines, analysis.code_lines = _count_lines(code)
+    analysis.is_empty = analysis.code_lines == 0
+
+    imports = set()
+    for node in ast.walk(tree):
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            analysis.functions += 1
+            function_complexity = _complexity(node)
+            analysis.complexity += function_complexity
+            analysis.max_function_complexity = max(analysis.max_function_complexity, function_complexity)
+        elif isinstance(node, ast.ClassDef):
+            analysis.classes += 1
+        elif isinstance(node, ast.Import):
+            imports.update(alias.name.split(".")[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            imports.add(node.module.split(".")[0])
+    analysis.imports = sorted(imports)
+    analysis.max_nesting = _nesting(tree)
+    # Top-level code counts as one more "function"
+    analysis.complexity += _complexity(tree)
+    return analysis
+
+
+def _count_lines(code: str):
+    """(comment-only lines, lines with code)"""
+    comment_lines, code_lines = set(), set()
+    try:
+        for tok in tokenize.generate_tokens(io.StringIO(code).readline):
+            if tok.type == tokenize.COMMENT:
+                comment_lines.add(tok.start[0])
+            elif tok.type not in (tokenize.NL, tokenize.NEWLINE, tokenize.INDENT, tokenize.DEDENT, tokenize.ENDMARKER):
+                code_lines.update(range(tok.start[0], tok.end[0] + 1))
+    except (tokenize.TokenError, SyntaxError):
+        pass
+    return len(comment_lines - code_lines), len(code_lines)
+
+
+def _complexity(node: ast.AST) -> int:
+    complexity = 1
+    stack = list(ast.iter_child_nodes(node))
+    while stack:
+        child = stack.pop()
+        if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+            # Nested functions are measured on their own
+            continue
+        if isinstance(child, _BRANCHES):
+            complexity += 1
+        elif isinstance(child, ast.BoolOp):
+            complexity += len(child.values) - 1
+        stack.extend(ast.iter_child_nodes(child))
+    return complexity
+
+
+def _nesting(node: ast.AST, depth: int = 0) -> int:
+    deepest = depth
+    for child in ast.iter_child_nodes(node):
+        child_depth = depth + 1 if isinstance(child, _BLOCKS) else depth
+        deepest = max(deepest, _nesting(child, child_depth))
+    return deepest
+
+
+def local_result(analysis: CodeAnalysis):
+    """The grade for submissions the model cannot usefully look at, or None.
+
+    Empty, non-Python and unparsable files all fail deterministically, so they are
+    graded here instead of spending a model call on them.
+    """
+    reasoning = "Graded by static analysis; the submission was not sent to the model."
+    if analysis.is_empty:
+        return ScoreResponse(
+            score=0,
+            feedback="The submission is empty.",
+            weakpoints=["The file contains no Python code."],
+            reasoning=reasoning,
+        )
+    if not analysis.is_python:
+        return ScoreResponse(
+            score=0,
+            feedback="The submission is not a Python file.",
+            weakpoints=["Upload the Python source (.py) for this assignment."],
+            reasoning=reasoning,
+        )
+    if analysis.syntax_error is not None:
+        error = analysis.syntax_error
+        where = f" on line {error.line}" if error.line else ""
+        if error.line and error.column:
+            where += f", column {error.column}"
+        weakpoint = f"Syntax error{where}: {error.message}"
+        if error.text:
+            weakpoint += f" (`{error.text}`)"
+        return ScoreResponse(
+            score=0,
+            feedback=f"The code does not run because it has a syntax error{where}: {error.message}.",
+            weakpoints=[weakpoint, "Run the file locally before submitting to catch syntax errors."],
+            reasoning=reasoning,
+        )
+    return None
+
+
+def summary(analysis: CodeAnalysis) -> str:
+    """Compact one-line description of the code for the prompt."""
+    parts = [
+        f"{analysis.code_lines} code lines",
+        f"{analysis.comment_lines} comment lines",
+        f"{analysis.functions} functions",
+        f"{analysis.classes} classes",
+        f"complexity {analysis.complexity} (max per function {analysis.max_function_complexity})",
+        f"max nesting {analysis.max_nesting}",
+        f"imports: {', '.join(analysis.imports) or 'none'}",
+    ]
+    return "Parses without syntax errors; " + "; ".join(parts)
@@ -1,9 +1,62 @@
 from passlib.context import CryptContext
+from concurrent.futures import ProcessPoolExecutor
+import asyncio
+import multiprocessing
+import os
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
+# bcrypt cost factor (log2 of the work). Hashes with any other cost are rehashed on login.
+BCRYPT_ROUNDS = int(os.getenv("BCRYPT_ROUNDS", "12"))
+
+# Processes dedicated to bcrypt, which is also the number of hashes computed at once.
+# Requests beyond that wait on the event loop without holding a thread.
+PASSWORD_HASH_WORKERS = int(os.getenv("PASSWORD_HASH_WORKERS", str(max(1, (os.cpu_count() or 2) // 2))))
+
+pwd_context = CryptContext(
+    schemes=["bcrypt"],
+    deprecated="auto",
+    bcrypt__rounds=BCRYPT_ROUNDS,
+    bcrypt__min_rounds=BCRYPT_ROUNDS,
+    bcrypt__max_rounds=BCRYPT_ROUNDS,
+)
+
+_pool = None
+_slots = None
 
 def hash(password: str):
     return pwd_context.hash(password)
 
 def verify(plain_password, hashed_password):
     return pwd_context.verify(plain_password, hashed_password)
+
+def verify_and_update(plain_password, hashed_password):
+    """Returns (valid, new_hash); new_hash is set when the stored hash needs upgrading."""
+    return pwd_context.verify_and_update(plain_password, hashed_password)
+
+def _get_pool():
+    global _pool, _slots
+    if _pool is None:
+        # spawn: forking a process that runs an event loop and threads is unsafe
+        _pool = ProcessPoolExecutor(max_workers=PASSWORD_HASH_WORKERS, mp_context=multiprocessing.get_context("spawn"))
+        _slots = asyncio.Semaphore(PASSWORD_HASH_WORKERS)
+    return _pool
+
+async def _run_in_pool(fn, *args):
+    pool = _get_pool()
+    async with _slots:
+        return await asyncio.get_running_loop().run_in_executor(pool, fn, *args)
+
+async def hash_async(password: str):
+    return await _run_in_pool(hash, password)
+
+async def verify_async(plain_password, hashed_password):
+    return await _run_in_pool(verify, plain_password, hashed_password)
+
+async def verify_and_update_async(plain_password, hashed_password):
+    return await _run_in_pool(verify_and_update, plain_password, hashed_password)
+
+def shutdown_pool():
+    global _pool, _slots
+    if _pool is not None:
+        _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+        _slots = None
@@ -0,0 +1,110 @@
+"""Admission control under a simulated deadline rush, and its per-request overhead.
+
+Simulates a grading service with ``--workers`` workers and a fixed grading
+latency while students submit faster than it can grade, with a trickle of
+staff requests (regrades, bulk uploads) alongside. Reports per lane how many
+requests were admitted and refused, and the worst queue wait an admitted
+submission faced, with admission control on and off. The real controller
+decides against a simulated queue, so no grading happens.
+
+    python benchmarks/bench_admission.py [--students-per-second 12] [--seconds 120]
+"""
+import argparse
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Per-user limits don't matter here: every simulated request comes from a new user
+os.environ.setdefault("ADMISSION_USER_RATE_PER_MINUTE", "0")
+
+from app import admission  # noqa: E402
+
+STEP_SECONDS = 0.1
+
+
+class SimulatedQueue:
+    """Stands in for the grading queue: a backlog drained by ``workers`` at ``latency`` seconds per job."""
+
+    def __init__(self, workers: int, latency: float):
+        self.workers = workers
+        self.latency = latency
+        self.backlog = 0.0
+
+    def stats(self) -> dict:
+        running = min(self.backlog, self.workers)
+        return {
+            "workers": self.workers,
+            "queue_depth": int(self.backlog - running),
+            "running": int(running),
+            "avg_latency_seconds": self.latency,
+        }
+
+    def step(self, seconds: float):
+        self.backlog = max(0.0, self.backlog - self.workers / self.latency * seconds)
+
+
+def simulate(args, enabled: bool) -> dict:
+    admission.ADMISSION_ENABLED = enabled
+    queue = SimulatedQueue(args.workers, args.latency)
+    controller = admission.AdmissionController(queue=queue)
+    results = {lane: {"admitted": 0, "refused": 0} for lane in admission.LANES}
+    worst_wait = 0.0
+    owed = {"student": 0.0, "staff": 0.0}
+    rates = {"student": args.students_per_second, "staff": args.staff_per_second}
+    user_id = 0
+    for _ in range(int(args.seconds / STEP_SECONDS)):
+        for lane, rate in rates.items():
+            owed[lane] += rate * STEP_SECONDS
+            while owed[lane] >= 1:
+                owed[lane] -= 1
+                user_id += 1
+                try:
+                    controller.check(user_id, lane)
+                except admission.Rejected:
+                    results[lane]["refused"] += 1
+                    continue
+                results[lane]["admitted"] += 1
+                worst_wait = max(worst_wait, queue.backlog / queue.workers * queue.latency)
+                queue.backlog += 1
+        queue.step(STEP_SECONDS)
+    return {"lanes": results, "worst_wait_seconds": worst_wait}
+
+
+def overhead(iterations: int) -> float:
+    admission.ADMISSION_ENABLED = True
+    controller = admission.AdmissionController(queue=SimulatedQueue(4, 10))
+    started = time.perf_counter()
+    for i in range(iterations):
+        try:
+            controller.check(i, "student")
+        except admission.Rejected:
+            pass
+    return (time.perf_counter() - started) / iterations
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--students-per-second", type=float, default=12)
+    parser.add_argument("--staff-per-second", type=float, default=0.5)
+    parser.add_argument("--seconds", type=float, default=120)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--latency", type=float, default=2.0, help="seconds to grade one submission")
+    args = parser.parse_args()
+
+    # Token buckets run on real time, which stands still in the simulation
+    admission.ADMISSION_GLOBAL_RATE_PER_SECOND = 0
+    print(f"capacity {args.workers / args.latency:.1f} gradings/s, students submit {args.students_per_second}/s "
+          f"and staff {args.staff_per_second}/s for {args.seconds:.0f} s")
+    for enabled in (False, True):
+        result = simulate(args, enabled)
+        print(f"\nadmission {'on' if enabled else 'off'}: worst queue wait {result['worst_wait_seconds']:.0f} s")
+        for lane, counts in result["lanes"].items():
+            print(f"  {lane:<8} admitted {counts['admitted']:>6}  refused {counts['refused']:>6}")
+
+    print(f"\ncheck() overhead: {overhead(100000) * 1e6:.1f} us/request")
+
+
+if __name__ == "__main__":
+    main()
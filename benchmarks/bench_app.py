@@ -0,0 +1,370 @@
+"""Load test of the HTTP API against a seeded database and a fake grading model.
+
+Drives the app in-process (httpx's ASGI transport, no network) and/or through a
+local uvicorn server, and reports requests per second and latency percentiles:
+
+- login: POST /login (bcrypt bound)
+- list_assignments: GET /assignments/
+- list_submissions: pages of 1000 from GET /submissions/ over the seeded submissions
+- submit: concurrent uploads by different students, plus the time until the
+  grading workers have graded all of them
+
+    python benchmarks/bench_app.py                      # both modes, print results
+    python benchmarks/bench_app.py --output results.json
+    python benchmarks/bench_app.py --save-baseline      # store benchmarks/baseline.json
+    python benchmarks/bench_app.py --compare            # exit 1 on a regression against it
+
+Baselines only mean something on the machine that recorded them: record one
+before a change and compare after it.
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime, timezone
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, ROOT)
+
+# Use a throwaway database and blob store so the benchmark never touches test.db. The
+# uvicorn server is started with the same environment and so uses the same ones.
+_tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+os.environ.setdefault("BLOB_STORE_DIR", os.path.join(_tmpdir, "blobs"))
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+# The provider rate limit would cap grading throughput at a rate the fake model doesn't have
+os.environ.setdefault("LLM_RATE_PER_SECOND", "0")
+# Measures raw capacity: admission control would turn the submit burst into 429s
+os.environ.setdefault("ADMISSION_ENABLED", "false")
+
+import httpx  # noqa: E402
+
+DEFAULT_BASELINE = os.path.join(ROOT, "benchmarks", "baseline.json")
+ADMIN = {"username": "admin@example.com", "password": "admin123"}
+STUDENT_PASSWORD = "benchmark-password"
+LISTING_PAGE = 1000
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else None
+
+
+def _summary(latencies, errors, elapsed) -> dict:
+    ms = lambda seconds: round(seconds * 1000, 2) if seconds is not None else None  # noqa: E731
+    return {
+        "requests": len(latencies) + errors,
+        "errors": errors,
+        "rps": round(len(latencies) / elapsed, 2) if elapsed else None,
+        "mean_ms": ms(sum(latencies) / len(latencies)) if latencies else None,
+        "p50_ms": ms(_percentile(latencies, 0.50)),
+        "p95_ms": ms(_percentile(latencies, 0.95)),
+        "p99_ms": ms(_percentile(latencies, 0.99)),
+    }
+
+
+async def _load(request, requests: int, concurrency: int) -> dict:
+    """Send ``request(i)`` for i in range(requests), ``concurrency`` at a time."""
+    latencies, errors = [], 0
+    indexes = iter(range(requests))
+
+    async def worker():
+        nonlocal errors
+        for i in indexes:
+            started = time.perf_counter()
+            try:
+                response = await request(i)
+                failed = response.status_code >= 400
+            except httpx.HTTPError:
+                failed = True
+            if failed:
+                errors += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return _summary(latencies, errors, time.perf_counter() - started)
+
+
+def seed(students: int, assignments: int) -> list:
+    """Students, assignments and one graded submission per student per assignment.
+
+    Returns the student ids. Rows are inserted in bulk; every student shares one
+    password hash so seeding doesn't spend minutes in bcrypt.
+    """
+    from sqlalchemy import insert
+    from app import init_db, models, utils
+    from app.database import SessionLocal, upgrade_database
+
+    # What `python -m app.init_db` does on a deployment: the API itself neither migrates nor seeds
+    upgrade_database()
+    init_db.seed_admin()
+    password = utils.hash(STUDENT_PASSWORD)
+    rng = random.Random(0)
+    feedback = (
+        "The solution handles the main cases correctly and is reasonably structured. "
+        "Variable names are clear, but several edge cases (empty input, negative numbers) are not handled "
+        "and there are no docstrings. Consider splitting the longer function into smaller helpers."
+    )
+    with SessionLocal() as db:
+        db.execute(insert(models.User), [
+            {"email": f"bench-student{i}@example.com", "password": password, "name": f"Student {i}",
+             "matric_number": f"BENCH{i:06d}", "role": "student"}
+            for i in range(students)
+        ])
+        db.execute(insert(models.Assignment), [
+            {"title": f"Assignment {i}", "description": "Implement the function described in the handout.",
+             "criteria": "Correctness 60%, edge cases 20%, style and documentation 20%."}
+            for i in range(assignments)
+        ])
+        db.commit()
+        student_ids = [row[0] for row in db.query(models.User.id).filter(models.User.role == "student").order_by(models.User.id)]
+        assignment_ids = [row[0] for row in db.query(models.Assignment.id).order_by(models.Assignment.id)]
+        for assignment_id in assignment_ids:
+            db.execute(insert(models.Submission), [
+                {"assignment_id": assignment_id, "user_id": user_id, "score": rng.randint(20, 100),
+                 "feedback": feedback, "strengths": ["Readable code", "Correct main logic"],
+                 "weakpoints": ["Missing edge cases", "No docstrings"],
+                 "cheating_detected": rng.random() < 0.02, "reasoning": feedback, "status": "graded"}
+                for user_id in student_ids
+            ])
+        db.commit()
+    return student_ids
+
+
+def _student_code(i: int) -> str:
+    # Different per student, so the grading cache doesn't answer for the model
+    return (
+        f"def solve(values):\n"
+        f"    \"\"\"Submission {i}.\"\"\"\n"
+        f"    total = 0\n"
+        f"    for value in values:\n"
+        f"        if value > {i % 97}:\n"
+        f"            total += value\n"
+        f"    return total\n\n"
+        f"print(solve([1, 2, 3, {i}]))\n"
+    )
+
+
+async def run_scenarios(client: httpx.AsyncClient, args, student_ids: list) -> dict:
+    from app import oauth2
+
+    admin_token = (await client.post("/login", data=ADMIN)).json()["access_token"]
+    admin = {"Authorization": f"Bearer {admin_token}"}
+    results = {}
+
+    results["login"] = await _load(
+        lambda i: client.post("/login", data={
+            "username": f"bench-student{i % len(student_ids)}@example.com", "password": STUDENT_PASSWORD,
+        }),
+        args.logins, args.concurrency,
+    )
+    results["list_assignments"] = await _load(
+        lambda i: client.get("/assignments/", headers=admin), args.requests, args.concurrency,
+    )
+    total_submissions = len(student_ids) * args.assignments
+    results["list_submissions"] = await _load(
+        lambda i: client.get("/submissions/", headers=admin, params={
+            "limit": LISTING_PAGE, "cursor": (i * LISTING_PAGE) % max(1, total_submissions),
+        }),
+        args.listings, max(1, args.concurrency // 4),
+    )
+
+    # A fresh assignment, so every student can submit to it once
+    assignment = (await client.post("/assignments/", headers=admin, json={
+        "title": "Benchmark submissions", "description": "Sum the values above a threshold.",
+        "criteria": "Correctness 70%, style 30%.",
+    })).json()
+    students = student_ids[:args.submissions]
+    tokens = [oauth2.create_access_token(data={"sub": f"bench-student{i}@example.com", "user_id": user_id})
+              for i, user_id in enumerate(students)]
+    graded_before = (await client.get("/grading/stats", headers=admin)).json()
+    started = time.perf_counter()
+    results["submit"] = await _load(
+        lambda i: client.post(
+            f"/assignments/{assignment['id']}/submit",
+            headers={"Authorization": f"Bearer {tokens[i]}"},
+            files={"file": (f"solution_{i}.py", _student_code(i))},
+        ),
+        len(students), args.concurrency,
+    )
+    results["grading"] = await _wait_for_grading(client, admin, graded_before, len(students), started)
+    return results
+
+
+async def _wait_for_grading(client, admin, before: dict, jobs: int, started: float) -> dict:
+    finished = lambda stats: stats["completed"] + stats["failed"] - before["completed"] - before["failed"]  # noqa: E731
+    deadline = time.perf_counter() + 300
+    while True:
+        stats = (await client.get("/grading/stats", headers=admin)).json()
+        if finished(stats) >= jobs or time.perf_counter() > deadline:
+            break
+        await asyncio.sleep(0.05)
+    elapsed = time.perf_counter() - started
+    return {
+        "jobs": jobs,
+        "graded": finished(stats),
+        "failed": stats["failed"] - before["failed"],
+        "seconds": round(elapsed, 3),
+        "jobs_per_second": round(finished(stats) / elapsed, 2),
+    }
+
+
+async def run_in_process(args, student_ids: list) -> dict:
+    from app.main import app
+
+    with _fake_model(args):
+        async with app.router.lifespan_context(app):
+            transport = httpx.ASGITransport(app=app)
+            async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=300) as client:
+                return await run_scenarios(client, args, student_ids)
+
+
+async def run_uvicorn(args, student_ids: list) -> dict:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    server = subprocess.Popen([
+        sys.executable, os.path.abspath(__file__), "--serve", str(port), "--model-latency", str(args.model_latency),
+    ])
+    try:
+        limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+        async with httpx.AsyncClient(base_url=f"http://127.0.0.1:{port}", timeout=300, limits=limits) as client:
+            deadline = time.perf_counter() + 60
+            while True:
+                try:
+                    if (await client.get("/openapi.json")).status_code == 200:
+                        break
+                except httpx.TransportError:
+                    pass
+                if server.poll() is not None or time.perf_counter() > deadline:
+                    raise RuntimeError("uvicorn server did not start")
+                await asyncio.sleep(0.2)
+            return await run_scenarios(client, args, student_ids)
+    finally:
+        server.terminate()
+        server.wait(timeout=30)
+
+
+def _fake_model(args):
+    from app import ai_agent
+    from benchmarks.fake_model import fake_scoring_model
+
+    return ai_agent.scoring_agent.override(model=fake_scoring_model(latency=args.model_latency, jitter=args.model_latency / 2))
+
+
+def serve(args):
+    import uvicorn
+    from app.main import app
+
+    with _fake_model(args):
+        uvicorn.run(app, host="127.0.0.1", port=args.serve, log_level="warning")
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> list:
+    """Scenarios whose throughput fell or whose p95 latency rose by more than ``tolerance``."""
+    regressions = []
+    for mode, scenarios in results.items():
+        for name, current in scenarios.items():
+            previous = baseline.get("results", {}).get(mode, {}).get(name)
+            if not previous:
+                continue
+            for metric, worse_if_higher in (("rps", False), ("p95_ms", True), ("jobs_per_second", False)):
+                before, after = previous.get(metric), current.get(metric)
+                if not before or after is None:
+                    continue
+                change = (after - before) / before
+                if (change > tolerance) if worse_if_higher else (change < -tolerance):
+                    regressions.append(f"{mode}/{name} {metric}: {before} -> {after} ({change:+.0%})")
+    return regressions
+
+
+def _print_results(results: dict):
+    print(f"\n{'scenario':<30} {'requests':>8} {'errors':>6} {'rps':>9} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}")
+    for mode, scenarios in results.items():
+        for name, r in scenarios.items():
+            label = f"{mode}/{name}"
+            if name == "grading":
+                print(f"{label:<30} {r['jobs']:>8} {r['failed']:>6} {r['jobs_per_second']:>9} jobs/s, all graded in {r['seconds']}s")
+            else:
+                print(f"{label:<30} {r['requests']:>8} {r['errors']:>6} {r['rps']:>9} {r['p50_ms']:>9} {r['p95_ms']:>9} {r['p99_ms']:>9}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--mode", choices=["in-process", "uvicorn", "both"], default="both")
+    parser.add_argument("--students", type=int, default=500)
+    parser.add_argument("--assignments", type=int, default=20, help="seeded assignments; each has a submission from every student")
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--requests", type=int, default=2000, help="assignment listings")
+    parser.add_argument("--logins", type=int, default=20)
+    parser.add_argument("--listings", type=int, default=100, help="submission listing pages")
+    parser.add_argument("--submissions", type=int, default=100, help="concurrent uploads, one per student")
+    parser.add_argument("--model-latency", type=float, default=0.2, help="seconds per fake model call")
+    parser.add_argument("--output", help="write the results as JSON to this file")
+    parser.add_argument("--baseline", default=DEFAULT_BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="store the results as the baseline")
+    parser.add_argument("--compare", action="store_true", help="compare against the baseline; exit 1 on regressions")
+    parser.add_argument("--tolerance", type=float, default=0.2, help="allowed relative change before it counts as a regression")
+    parser.add_argument("--serve", type=int, help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.serve:
+        serve(args)
+        return
+    args.submissions = min(args.submissions, args.students)
+
+    started = time.perf_counter()
+    student_ids = seed(args.students, args.assignments)
+    print(f"Seeded {args.students} students, {args.assignments} assignments and "
+          f"{args.students * args.assignments} submissions in {time.perf_counter() - started:.1f}s")
+
+    results = {}
+    if args.mode in ("in-process", "both"):
+        results["in-process"] = asyncio.run(run_in_process(args, student_ids))
+    if args.mode in ("uvicorn", "both"):
+        results["uvicorn"] = asyncio.run(run_uvicorn(args, student_ids))
+    _print_results(results)
+
+    report = {
+        "meta": {
+            "recorded_at": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "cpus": os.cpu_count(),
+            "parameters": {key: value for key, value in vars(args).items()
+                           if key not in ("output", "baseline", "save_baseline", "compare", "tolerance", "serve")},
+        },
+        "results": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(report, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(report, f, indent=2)
+            f.write("\n")
+        print(f"\nBaseline saved to {args.baseline}")
+    if args.compare:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline["meta"]["parameters"] != report["meta"]["parameters"]:
+            print("\nWarning: the baseline was recorded with different parameters")
+        regressions = compare(results, baseline, args.tolerance)
+        print(f"\nCompared with the baseline of {baseline['meta']['recorded_at']} (tolerance {args.tolerance:.0%}):")
+        for line in regressions or ["no regressions"]:
+            print(f"  {line}")
+        if regressions:
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
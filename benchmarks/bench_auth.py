@@ -0,0 +1,71 @@
+"""Microbenchmark of the per-request authentication overhead in ``get_current_user``.
+
+Compares the original path (decode the JWT, look the user up by email), the
+primary-key lookup for tokens that carry the user id, and the token cache.
+
+    python benchmarks/bench_auth.py [iterations]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use a throwaway database so the benchmark never touches test.db
+_tmpdir = tempfile.mkdtemp()
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'bench.db')}")
+
+from app import models, oauth2  # noqa: E402
+from app.database import SessionLocal, upgrade_database  # noqa: E402
+
+
+def _setup():
+    upgrade_database()
+    db = SessionLocal()
+    try:
+        # Some bulk so the email lookup isn't against a one-row table
+        db.add_all([
+            models.User(email=f"student{i}@example.com", password="x", role="student")
+            for i in range(5000)
+        ])
+        user = models.User(email="bench@example.com", password="x", role="teacher")
+        db.add(user)
+        db.commit()
+        return user.id, user.email
+    finally:
+        db.close()
+
+
+def _measure(label, token, iterations, clear_cache):
+    oauth2.token_cache.clear()
+    started = time.perf_counter()
+    for _ in range(iterations):
+        if clear_cache:
+            oauth2.token_cache.clear()
+        # A fresh session per call, like one request
+        db = SessionLocal()
+        try:
+            oauth2.get_current_user(token, db)
+        finally:
+            db.close()
+    per_call = (time.perf_counter() - started) / iterations
+    print(f"{label:<40} {per_call * 1e6:9.1f} us/request  {1 / per_call:10.0f} req/s")
+    return per_call
+
+
+def main():
+    iterations = int(sys.argv[1]) if len(sys.argv) > 1 else 2000
+    user_id, email = _setup()
+    legacy_token = oauth2.create_access_token(data={"sub": email})
+    token = oauth2.create_access_token(data={"sub": email, "user_id": user_id})
+
+    print(f"get_current_user, {iterations} iterations")
+    before = _measure("before: decode + lookup by email", legacy_token, iterations, clear_cache=True)
+    _measure("decode + lookup by primary key", token, iterations, clear_cache=True)
+    after = _measure("after: token cache hit", token, iterations, clear_cache=False)
+    print(f"speedup: {before / after:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""Throughput, compression and deduplication of the submission blob store.
+
+Stores a class worth of generated Python sources (a share of them identical
+copies, as with starter code handed in unchanged), then reads them all back.
+Also compares the peak memory of storing one large upload in chunks with reading
+it whole, as the submit endpoint used to.
+
+    python benchmarks/bench_blob_store.py [--files 2000] [--duplicates 0.3]
+"""
+import argparse
+import io
+import os
+import random
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.blob_store import BlobStore  # noqa: E402
+
+
+def _source(rng: random.Random, index: int) -> bytes:
+    functions = []
+    for f in range(rng.randint(3, 12)):
+        body = "\n".join(f"    total += x * {rng.randint(1, 99)}  # step {s}" for s in range(rng.randint(3, 15)))
+        functions.append(f"def solve_{index}_{f}(x):\n    total = 0\n{body}\n    return total\n")
+    return ("\n\n".join(functions) + f"\n\nprint(solve_{index}_0(3))\n").encode()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--files", type=int, default=2000)
+    parser.add_argument("--duplicates", type=float, default=0.3, help="share of uploads identical to an earlier one")
+    args = parser.parse_args()
+
+    rng = random.Random(0)
+    sources = []
+    for i in range(args.files):
+        sources.append(rng.choice(sources) if sources and rng.random() < args.duplicates else _source(rng, i))
+    raw = sum(len(s) for s in sources)
+
+    store = BlobStore(root=tempfile.mkdtemp())
+    started = time.perf_counter()
+    keys = [store.put_stream([s]) for s in sources]
+    write_seconds = time.perf_counter() - started
+    stats = store.stats()
+
+    started = time.perf_counter()
+    assert all(store.get(key) == source for key, source in zip(keys, sources))
+    read_seconds = time.perf_counter() - started
+
+    print(f"{args.files} uploads, {raw / 1024 / 1024:.1f} MiB")
+    print(f"write   {raw / 1024 / 1024 / write_seconds:8.1f} MiB/s  {args.files / write_seconds:8.0f} files/s")
+    print(f"read    {raw / 1024 / 1024 / read_seconds:8.1f} MiB/s  {args.files / read_seconds:8.0f} files/s (mmap)")
+    print(f"stored  {stats['stored']} blobs, {stats['deduplicated']} deduplicated, "
+          f"{stats['bytes_stored'] / 1024 / 1024:.2f} MiB on disk ({raw / stats['bytes_stored']:.1f}x smaller)")
+
+    # One large upload: chunked into the store vs. read whole and decoded
+    upload = b"".join(sources)[:8 * 1024 * 1024]
+    tracemalloc.start()
+    store.put_text_file(io.BytesIO(upload), max_bytes=len(upload))
+    _, streamed_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    tracemalloc.start()
+    upload_file = io.BytesIO(upload)
+    upload_file.read().decode("utf-8")
+    _, whole_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    print(f"\n{len(upload) / 1024 / 1024:.0f} MiB upload, peak memory: chunked {streamed_peak / 1024 / 1024:.2f} MiB, "
+          f"read whole {whole_peak / 1024 / 1024:.2f} MiB")
+
+
+if __name__ == "__main__":
+    main()
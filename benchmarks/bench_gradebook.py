@@ -0,0 +1,117 @@
+"""Memory and throughput of the gradebook export as the number of submissions grows.
+
+Seeds one assignment per size with that many graded submissions, then streams its
+gradebook as CSV and Parquet and reports rows per second, output size and peak
+memory. For comparison, the "list" row loads every row as ORM objects and builds a
+full SubmissionResponse list, which is what a client paging through /submissions/
+ends up holding.
+
+    python benchmarks/bench_gradebook.py [--sizes 100,10000,100000] [--no-list]
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use a throwaway database so the benchmark never touches test.db
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+from sqlalchemy import insert  # noqa: E402
+
+from app import gradebook, models  # noqa: E402
+from app.database import SessionLocal, upgrade_database  # noqa: E402
+
+SEED_BATCH = 10000
+
+
+def seed(size: int, first_user_id: int) -> int:
+    """An assignment with ``size`` graded submissions, each by its own student."""
+    with SessionLocal() as db:
+        assignment = models.Assignment(title=f"Gradebook {size}", description="d", criteria="c")
+        db.add(assignment)
+        db.flush()
+        for start in range(0, size, SEED_BATCH):
+            ids = range(first_user_id + start, first_user_id + min(size, start + SEED_BATCH))
+            db.execute(insert(models.User), [
+                {"id": i, "email": f"gradebook{i}@example.com", "password": "x", "name": f"Student {i}",
+                 "matric_number": f"GB{i:08d}", "role": "student"}
+                for i in ids
+            ])
+            db.execute(insert(models.Submission), [
+                {"assignment_id": assignment.id, "user_id": i, "score": i % 101, "status": "graded",
+                 "feedback": "Correct on the main cases; misses the empty input.", "strengths": ["Readable"],
+                 "weakpoints": ["Edge cases"], "tests_passed": 4, "tests_total": 5, "cheating_detected": False,
+                 "result_version": 1}
+                for i in ids
+            ])
+        db.commit()
+        return assignment.id
+
+
+def _measure(produce) -> dict:
+    arrow_pool = None
+    if gradebook.parquet_available():
+        import pyarrow as pa
+        arrow_pool = pa.default_memory_pool()
+        arrow_before = arrow_pool.max_memory()
+    tracemalloc.start()
+    started = time.perf_counter()
+    size = produce()
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    result = {"seconds": elapsed, "bytes": size, "peak_mb": peak / 1024 / 1024}
+    if arrow_pool is not None:
+        result["arrow_peak_mb"] = max(0, arrow_pool.max_memory() - arrow_before) / 1024 / 1024
+    return result
+
+
+def _consume(chunks) -> int:
+    return sum(len(chunk) for chunk in chunks)
+
+
+def _list_all(assignment_id: int) -> int:
+    from app.main import _submission_response
+
+    with SessionLocal() as db:
+        rows = db.query(models.Submission, models.User.name, models.User.matric_number).outerjoin(
+            models.User, models.User.id == models.Submission.user_id
+        ).filter(models.Submission.assignment_id == assignment_id).order_by(models.Submission.id).all()
+        responses = [_submission_response(s, name, matric) for s, name, matric in rows]
+        return sum(len(r.model_dump_json()) for r in responses)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--sizes", default="100,10000,100000", help="comma-separated submission counts")
+    parser.add_argument("--no-list", action="store_true", help="skip the load-everything comparison")
+    args = parser.parse_args()
+
+    upgrade_database()
+    sizes = [int(size) for size in args.sizes.split(",")]
+    print(f"chunk: {gradebook.GRADEBOOK_CHUNK_ROWS} rows")
+    print(f"{'rows':>9}  {'export':<8}{'rows/s':>10}  {'MB out':>8}  {'peak MB':>8}  {'arrow MB':>8}")
+    first_user_id = 1_000_000
+    for size in sizes:
+        assignment_id = seed(size, first_user_id)
+        first_user_id += size
+        exports = [
+            ("csv", lambda: _consume(gradebook.stream_csv(assignment_id))),
+            ("parquet", lambda: _consume(gradebook.stream_parquet(assignment_id))) if gradebook.parquet_available() else None,
+            ("list", lambda: _list_all(assignment_id)) if not args.no_list else None,
+        ]
+        for name, produce in filter(None, exports):
+            result = _measure(produce)
+            arrow = f"{result['arrow_peak_mb']:>8.1f}" if name == "parquet" and "arrow_peak_mb" in result else f"{'-':>8}"
+            print(
+                f"{size:>9}  {name:<8}{size / result['seconds']:>10.0f}  {result['bytes'] / 1024 / 1024:>8.2f}  "
+                f"{result['peak_mb']:>8.1f}  {arrow}"
+            )
+
+
+if __name__ == "__main__":
+    main()
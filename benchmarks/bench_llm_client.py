@@ -0,0 +1,77 @@
+"""Grading call latency and success rate against a flaky, slow-tailed fake model.
+
+Compares calling ``scoring_agent.run`` directly with the ``llm_client`` wrapper,
+with and without hedged requests.
+
+    python benchmarks/bench_llm_client.py [calls] [concurrency]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+os.environ.setdefault("OPENROUTER_API_KEY", "benchmark")
+
+from app import ai_agent, llm_client  # noqa: E402
+from benchmarks.fake_model import fake_scoring_model  # noqa: E402
+
+PROMPT = "### Criteria:\nPrint hello\n\n### Submitted Code:\n```python\nprint('hello')\n```"
+
+
+def _percentile(values, q):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(q * len(values)))] if values else float("nan")
+
+
+async def _run(label, call, calls, concurrency):
+    slots = asyncio.Semaphore(concurrency)
+    latencies, failures = [], 0
+
+    async def one():
+        nonlocal failures
+        async with slots:
+            started = time.perf_counter()
+            try:
+                await call(PROMPT)
+            except Exception:
+                failures += 1
+            else:
+                latencies.append(time.perf_counter() - started)
+
+    started = time.perf_counter()
+    await asyncio.gather(*(one() for _ in range(calls)))
+    elapsed = time.perf_counter() - started
+    print(f"{label:<28} ok {len(latencies):>4}/{calls}  p50 {_percentile(latencies, .5):6.2f}s  "
+          f"p95 {_percentile(latencies, .95):6.2f}s  p99 {_percentile(latencies, .99):6.2f}s  wall {elapsed:6.1f}s")
+
+
+async def main():
+    calls = int(sys.argv[1]) if len(sys.argv) > 1 else 200
+    concurrency = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+    agent = ai_agent.scoring_agent
+    # 10% of calls are rate limited, 5% take 3 s instead of ~0.2 s
+    model = fake_scoring_model(latency=0.2, jitter=0.1, error_rate=0.1, slow_rate=0.05, slow_latency=3.0, seed=1)
+    print(f"{calls} calls, concurrency {concurrency}; fake model: 10% HTTP 429, 5% 3s tail")
+
+    def client(**options):
+        return llm_client.LLMClient(
+            agent, bucket=llm_client.TokenBucket(rate=1000, capacity=1000), retry_base=0.1, **options
+        )
+
+    with agent.override(model=model):
+        await _run("scoring_agent.run", agent.run, calls, concurrency)
+        await _run("client, retries", client().run, calls, concurrency)
+        await _run("client, retries + hedge 0.5s", client(hedge_after=0.5).run, calls, concurrency)
+
+    # A hard outage: the breaker fails fast instead of retrying every call
+    outage = client(breaker=llm_client.CircuitBreaker(threshold=5, reset_after=60))
+    with agent.override(model=fake_scoring_model(latency=0.2, error_rate=1.0, error_status=503)):
+        started = time.perf_counter()
+        await _run("client during outage", outage.run, calls, concurrency)
+        print(f"  provider attempts {outage.attempts}, rejected by breaker {outage.rejected}, "
+              f"breaker {outage.breaker.state}, {time.perf_counter() - started:.1f}s")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
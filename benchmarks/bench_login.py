@@ -0,0 +1,59 @@
+"""Password verification throughput (logins per second) across bcrypt cost settings.
+
+For each cost factor, runs a burst of concurrent logins through the password
+hashing process pool and, for comparison, one at a time on the calling thread
+as the login endpoint used to.
+
+    python benchmarks/bench_login.py [logins per run] [cost ...]
+"""
+import asyncio
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from passlib.hash import bcrypt  # noqa: E402
+
+from app import utils  # noqa: E402
+
+PASSWORD = "correct horse battery staple"
+
+
+async def _burst(hashed: str, logins: int) -> float:
+    started = time.perf_counter()
+    results = await asyncio.gather(*[utils.verify_async(PASSWORD, hashed) for _ in range(logins)])
+    elapsed = time.perf_counter() - started
+    assert all(results)
+    return logins / elapsed
+
+
+def _inline(hashed: str, logins: int) -> float:
+    started = time.perf_counter()
+    for _ in range(logins):
+        assert utils.verify(PASSWORD, hashed)
+    return logins / (time.perf_counter() - started)
+
+
+def main():
+    logins = int(sys.argv[1]) if len(sys.argv) > 1 else 32
+    costs = [int(cost) for cost in sys.argv[2:]] or [10, 11, 12]
+
+    print(f"{logins} logins per run, {utils.PASSWORD_HASH_WORKERS} hashing processes")
+    print(f"{'cost':>4}  {'inline logins/s':>16}  {'pool logins/s':>14}")
+    for cost in costs:
+        hashed = bcrypt.using(rounds=cost).hash(PASSWORD)
+        inline = _inline(hashed, max(1, logins // 4))
+        pooled = asyncio.run(_warm_then_burst(hashed, logins))
+        utils.shutdown_pool()
+        print(f"{cost:>4}  {inline:>16.1f}  {pooled:>14.1f}")
+
+
+async def _warm_then_burst(hashed: str, logins: int) -> float:
+    # Warm the pool first so process startup isn't measured
+    await _burst(hashed, utils.PASSWORD_HASH_WORKERS)
+    return await _burst(hashed, logins)
+
+
+if __name__ == "__main__":
+    main()
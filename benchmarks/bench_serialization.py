@@ -0,0 +1,118 @@
+"""Serialization throughput of submission listings.
+
+Serializes the same graded submissions (with test results and a plagiarism
+match each) the ways a listing has done it:
+
+- ``pydantic``: parse strengths/weakpoints from JSON text, build a validated
+  SubmissionResponse per row and dump it (the listing before the fast path)
+- ``response_model``: the same models returned through a ``List[SubmissionResponse]``
+  response model, which validates and serializes them a second time
+- ``rows (json)``: plain dicts from JSON columns, encoded with the standard library
+- ``rows (orjson)``: the same dicts encoded with orjson (the current listing)
+
+    python benchmarks/bench_serialization.py [rows] [rounds]
+"""
+import json
+import os
+import sys
+import tempfile
+import time
+from datetime import datetime
+from types import SimpleNamespace
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# Use a throwaway database so the benchmark never touches test.db
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}")
+
+from pydantic import TypeAdapter  # noqa: E402
+
+from app import fast_json, models, schemas  # noqa: E402
+from app.main import _submission_row  # noqa: E402
+
+FEEDBACK = "Correct on the main cases, but the empty input raises an IndexError. " * 3
+STRENGTHS = ["Readable code", "Correct main logic"]
+WEAKPOINTS = ["Missing edge cases", "No docstrings"]
+
+
+def _submissions(count: int) -> list:
+    test_results = json.dumps([
+        {"test_case_id": t, "name": f"test_{t}", "passed": t % 3 != 0, "status": "passed" if t % 3 else "failed",
+         "detail": None if t % 3 else "AssertionError", "duration_ms": 12.5}
+        for t in range(1, 6)
+    ])
+    return [
+        (
+            models.Submission(
+                id=i, assignment_id=1, user_id=i, score=i % 101, feedback=FEEDBACK,
+                strengths=STRENGTHS, weakpoints=WEAKPOINTS,
+                cheating_detected=False, reasoning=FEEDBACK, tests_passed=4, tests_total=5, test_results=test_results,
+                input_tokens=1200, output_tokens=300, cache_read_tokens=900, result_version=1, status="graded",
+                created_at=datetime(2026, 10, 16, 12, 0, i % 60, 123456),
+            ),
+            f"Student {i}",
+            f"MAT{i:06d}",
+            [SimpleNamespace(matched_submission_id=i + 1, similarity=0.5123)],
+        )
+        for i in range(count)
+    ]
+
+
+def _pydantic(rows) -> bytes:
+    # What the listing did before: strengths/weakpoints were JSON text
+    strengths, weakpoints = json.dumps(STRENGTHS), json.dumps(WEAKPOINTS)
+    out = []
+    for s, name, matric, matches in rows:
+        row = _submission_row(s, name, matric, matches)
+        row["strengths"] = json.loads(strengths)
+        row["weakpoints"] = json.loads(weakpoints)
+        out.append(schemas.SubmissionResponse(**row).model_dump_json())
+    return ("[" + ",".join(out) + "]").encode()
+
+
+_response_model = TypeAdapter(List[schemas.SubmissionResponse])
+
+
+def _response_model_path(rows) -> bytes:
+    responses = [schemas.SubmissionResponse(**_submission_row(*row)) for row in rows]
+    # FastAPI validates the returned value against the response model, then serializes it
+    return _response_model.dump_json(_response_model.validate_python(responses))
+
+
+def _rows(rows) -> bytes:
+    return fast_json.dumps([_submission_row(*row) for row in rows])
+
+
+def _measure(label, serialize, rows, rounds):
+    best = float("inf")
+    for _ in range(rounds):
+        started = time.perf_counter()
+        size = len(serialize(rows))
+        best = min(best, time.perf_counter() - started)
+    print(f"{label:<18}{len(rows) / best:>12.0f} rows/s  {best * 1000:>9.1f} ms  {size / 1024:>9.0f} KiB")
+    return best
+
+
+def main():
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    rows = _submissions(count)
+
+    assert json.loads(_rows(rows)) == json.loads(_pydantic(rows)), "fast path output differs from the models"
+    print(f"{count} submissions, best of {rounds} rounds")
+    baseline = _measure("pydantic", _pydantic, rows, rounds)
+    _measure("response_model", _response_model_path, rows, rounds)
+    orjson = fast_json.orjson
+    fast_json.orjson = None
+    _measure("rows (json)", _rows, rows, rounds)
+    fast_json.orjson = orjson
+    if orjson is not None:
+        fast = _measure("rows (orjson)", _rows, rows, rounds)
+        print(f"\nrows (orjson) is {baseline / fast:.1f}x the pydantic path")
+    else:
+        print("\norjson is not installed; the listing uses the standard library encoder")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,84 @@
+"""Cold start cost of an API process: import time, time until startup has
+finished, and peak memory. Each run is a fresh interpreter, as a new worker or
+container would be.
+
+Also reports which heavy libraries a process that never grades has loaded, and
+what the first grading pays to build the model client on top of that.
+
+    python benchmarks/bench_startup.py [--runs 5]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Runs in the child process; prints one JSON line of timings
+_CHILD = """
+import asyncio, json, resource, sys, time
+started = time.perf_counter()
+from app.main import app
+imported = time.perf_counter()
+
+async def start():
+    async with app.router.lifespan_context(app):
+        ready = time.perf_counter()
+        rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+        from app import ai_agent
+        loaded = {name: name in sys.modules for name in ("pydantic_ai", "openai", "alembic", "dotenv")}
+        load_started = time.perf_counter()
+        ai_agent.load()
+        return ready, rss, loaded, time.perf_counter() - load_started
+
+ready, rss, loaded, grader_seconds = asyncio.run(start())
+print(json.dumps({
+    "import_seconds": imported - started,
+    "startup_seconds": ready - imported,
+    "grader_load_seconds": grader_seconds,
+    "loaded_before_grading": loaded,
+    "max_rss_mb": rss,
+}))
+"""
+
+
+def _run_child(env: dict) -> dict:
+    started = time.perf_counter()
+    result = subprocess.run([sys.executable, "-c", _CHILD], cwd=ROOT, env=env, capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+    # Interpreter start to the end of startup, as a process manager would see it
+    timings["process_ready_seconds"] = time.perf_counter() - started - timings["grader_load_seconds"]
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=5, help="fresh processes to start (default: 5)")
+    args = parser.parse_args()
+
+    env = {
+        **os.environ,
+        "PYTHONPATH": ROOT,
+        # A throwaway database, so the benchmark never touches test.db
+        "DATABASE_URL": f"sqlite:///{os.path.join(tempfile.mkdtemp(), 'bench.db')}",
+        "OPENROUTER_API_KEY": os.environ.get("OPENROUTER_API_KEY", "benchmark"),
+    }
+    started = time.perf_counter()
+    subprocess.run([sys.executable, "-m", "app.init_db"], cwd=ROOT, env=env, capture_output=True, check=True)
+    print(f"init_db (one-time, not part of startup): {time.perf_counter() - started:.2f} s")
+
+    runs = [_run_child(env) for _ in range(args.runs)]
+    print(f"\nmedian of {args.runs} fresh processes")
+    for key in ("import_seconds", "startup_seconds", "process_ready_seconds", "grader_load_seconds"):
+        print(f"{key:<24}{statistics.median(run[key] for run in runs):>8.3f} s")
+    print(f"{'max_rss_mb':<24}{statistics.median(run['max_rss_mb'] for run in runs):>8.1f}")
+    loaded = ", ".join(name for name, present in runs[0]["loaded_before_grading"].items() if present) or "none"
+    print(f"\nloaded before the first grading: {loaded}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,71 @@
+"""Offline stand-in for the grading model, built on pydantic_ai's ``FunctionModel``.
+
+    from app import ai_agent
+    with ai_agent.scoring_agent.override(model=fake_scoring_model(latency=0.5, error_rate=0.1)):
+        ...
+"""
+import asyncio
+import json
+import random
+
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import AgentInfo, DeltaToolCall, FunctionModel
+
+
+def fake_scoring_model(
+    latency: float = 0.5,
+    jitter: float = 0.0,
+    error_rate: float = 0.0,
+    error_status: int = 429,
+    slow_rate: float = 0.0,
+    slow_latency: float = 5.0,
+    score: int = 75,
+    seed: int = None,
+    first_token_latency: float = None,
+    stream_chunks: int = 20,
+) -> FunctionModel:
+    """A model that answers with a fixed grade after ``latency`` (+ up to ``jitter``) seconds.
+
+    A ``slow_rate`` share of calls take ``slow_latency`` instead (a latency tail),
+    and an ``error_rate`` share fail with an HTTP ``error_status``. Streamed runs
+    wait ``first_token_latency`` (default: a fifth of the latency) before the first
+    chunk and spread the rest of the latency over ``stream_chunks`` chunks.
+    """
+    rng = random.Random(seed)
+    output = {
+        "score": score,
+        "feedback": "Solid attempt. The main logic is correct and the code is easy to follow.",
+        "strengths": ["Readable code", "Sensible function decomposition"],
+        "weakpoints": ["Missing edge cases", "No input validation"],
+    }
+
+    def _delay():
+        return slow_latency if rng.random() < slow_rate else latency + rng.uniform(0, jitter)
+
+    def _maybe_fail():
+        if rng.random() < error_rate:
+            raise ModelHTTPError(error_status, "fake-model", body={"error": "injected"})
+
+    async def respond(messages, info: AgentInfo) -> ModelResponse:
+        await asyncio.sleep(_delay())
+        _maybe_fail()
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, output)])
+
+    async def stream(messages, info: AgentInfo):
+        delay = _delay()
+        first = delay / 5 if first_token_latency is None else first_token_latency
+        await asyncio.sleep(first)
+        _maybe_fail()
+        body = json.dumps(output)
+        size = max(1, -(-len(body) // stream_chunks))
+        for i in range(0, len(body), size):
+            if i:
+                await asyncio.sleep(max(0.0, delay - first) / stream_chunks)
+            yield {0: DeltaToolCall(
+                name=info.output_tools[0].name if i == 0 else None,
+                json_args=body[i:i + size],
+                tool_call_id="fake-call" if i == 0 else None,
+            )}
+
+    return FunctionModel(respond, stream_function=stream, model_name="fake-model")
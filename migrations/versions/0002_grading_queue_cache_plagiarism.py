@@ -0,0 +1,104 @@
+"""Background grading jobs, grading result cache and plagiarism index
+
+Revision ID: 0002
+Revises: 0001
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0002'
+down_revision: Union[str, Sequence[str], None] = '0001'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # Submissions are stored before they are graded; rows that already exist were graded
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.alter_column('score', existing_type=sa.Integer(), nullable=True)
+        batch_op.alter_column('feedback', existing_type=sa.Text(), nullable=True)
+        batch_op.add_column(sa.Column('status', sa.String(), nullable=False, server_default='graded'))
+
+    op.create_table(
+        'grading_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('submission_id', sa.Integer(), nullable=False),
+        sa.Column('code', sa.Text(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('attempts', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['submission_id'], ['submissions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_table(
+        'grading_cache',
+        sa.Column('key', sa.String(), nullable=False),
+        sa.Column('model_name', sa.String(), nullable=False),
+        sa.Column('result', sa.Text(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('expires_at', sa.Float(), nullable=False),
+        sa.PrimaryKeyConstraint('key'),
+    )
+    op.create_table(
+        'submission_fingerprints',
+        sa.Column('submission_id', sa.Integer(), nullable=False),
+        sa.Column('assignment_id', sa.Integer(), nullable=False),
+        sa.Column('fingerprints', sa.Text(), nullable=False),
+        sa.ForeignKeyConstraint(['assignment_id'], ['assignments.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['submission_id'], ['submissions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('submission_id'),
+    )
+    op.create_index('ix_submission_fingerprints_assignment_id', 'submission_fingerprints', ['assignment_id'])
+    op.create_table(
+        'lsh_buckets',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('assignment_id', sa.Integer(), nullable=False),
+        sa.Column('band', sa.Integer(), nullable=False),
+        sa.Column('bucket', sa.String(), nullable=False),
+        sa.Column('submission_id', sa.Integer(), nullable=False),
+        sa.ForeignKeyConstraint(['assignment_id'], ['assignments.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['submission_id'], ['submissions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_lsh_buckets_lookup', 'lsh_buckets', ['assignment_id', 'band', 'bucket'])
+    op.create_table(
+        'plagiarism_matches',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('submission_id', sa.Integer(), nullable=False),
+        sa.Column('matched_submission_id', sa.Integer(), nullable=False),
+        sa.Column('similarity', sa.Float(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['matched_submission_id'], ['submissions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['submission_id'], ['submissions.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_plagiarism_matches_submission_id', 'plagiarism_matches', ['submission_id'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_plagiarism_matches_submission_id', table_name='plagiarism_matches')
+    op.drop_table('plagiarism_matches')
+    op.drop_index('ix_lsh_buckets_lookup', table_name='lsh_buckets')
+    op.drop_table('lsh_buckets')
+    op.drop_index('ix_submission_fingerprints_assignment_id', table_name='submission_fingerprints')
+    op.drop_table('submission_fingerprints')
+    op.drop_table('grading_cache')
+    op.drop_table('grading_jobs')
+
+    # Ungraded submissions can't satisfy the old NOT NULL columns
+    op.execute("DELETE FROM submissions WHERE score IS NULL OR feedback IS NULL")
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_column('status')
+        batch_op.alter_column('feedback', existing_type=sa.Text(), nullable=False)
+        batch_op.alter_column('score', existing_type=sa.Integer(), nullable=False)
@@ -0,0 +1,65 @@
+"""Submission indexes and one-submission-per-user constraint
+
+Revision ID: 0003
+Revises: 0002
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0003'
+down_revision: Union[str, Sequence[str], None] = '0002'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Duplicates listed in the error before the upgrade stops
+MAX_LISTED_DUPLICATES = 50
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The old check-then-insert could let a user submit twice. Which submission
+    # counts is for a teacher to decide, not a migration: stop and list them.
+    bind = op.get_bind()
+    duplicates = bind.execute(sa.text(
+        "SELECT assignment_id, user_id FROM submissions "
+        "GROUP BY assignment_id, user_id HAVING COUNT(*) > 1 ORDER BY assignment_id, user_id"
+    )).all()
+    if duplicates:
+        lines = []
+        for assignment_id, user_id in duplicates[:MAX_LISTED_DUPLICATES]:
+            ids = bind.execute(sa.text(
+                "SELECT id FROM submissions WHERE assignment_id = :assignment_id AND user_id = :user_id ORDER BY id"
+            ), {"assignment_id": assignment_id, "user_id": user_id}).scalars().all()
+            lines.append(f"  assignment {assignment_id}, user {user_id}: submissions {', '.join(map(str, ids))}")
+        listed = "\n".join(lines)
+        more = f"\n  ... and {len(duplicates) - MAX_LISTED_DUPLICATES} more" if len(duplicates) > MAX_LISTED_DUPLICATES else ""
+        raise RuntimeError(
+            f"Found {len(duplicates)} (assignment, user) pairs with more than one submission, which the new "
+            f"uq_submissions_assignment_user constraint forbids:\n{listed}{more}\n"
+            "Delete the submissions that should not count (with their grading jobs, fingerprints, LSH buckets "
+            "and plagiarism matches), then run the upgrade again."
+        )
+
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.create_unique_constraint('uq_submissions_assignment_user', ['assignment_id', 'user_id'])
+    op.create_index('ix_submissions_assignment_created', 'submissions', ['assignment_id', 'created_at'])
+    op.create_index('ix_submissions_user_id', 'submissions', ['user_id'])
+    op.create_index('ix_grading_jobs_submission_id', 'grading_jobs', ['submission_id'])
+    op.create_index('ix_grading_jobs_status', 'grading_jobs', ['status'])
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_grading_jobs_status', table_name='grading_jobs')
+    op.drop_index('ix_grading_jobs_submission_id', table_name='grading_jobs')
+    op.drop_index('ix_submissions_user_id', table_name='submissions')
+    op.drop_index('ix_submissions_assignment_created', table_name='submissions')
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_constraint('uq_submissions_assignment_user', type_='unique')
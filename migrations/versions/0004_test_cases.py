@@ -0,0 +1,54 @@
+"""Assignment test cases and per-submission test results
+
+Revision ID: 0004
+Revises: 0003
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0004'
+down_revision: Union[str, Sequence[str], None] = '0003'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_table(
+        'test_cases',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('assignment_id', sa.Integer(), nullable=False),
+        sa.Column('name', sa.String(), nullable=False),
+        sa.Column('kind', sa.String(), nullable=False),
+        sa.Column('stdin', sa.Text(), nullable=True),
+        sa.Column('expected_output', sa.Text(), nullable=True),
+        sa.Column('test_code', sa.Text(), nullable=True),
+        sa.Column('weight', sa.Integer(), nullable=False),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['assignment_id'], ['assignments.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_test_cases_assignment_id', 'test_cases', ['assignment_id'])
+
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.add_column(sa.Column('tests_passed', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('tests_total', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('test_pass_rate', sa.Float(), nullable=True))
+        batch_op.add_column(sa.Column('test_results', sa.Text(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_column('test_results')
+        batch_op.drop_column('test_pass_rate')
+        batch_op.drop_column('tests_total')
+        batch_op.drop_column('tests_passed')
+    op.drop_index('ix_test_cases_assignment_id', table_name='test_cases')
+    op.drop_table('test_cases')
@@ -0,0 +1,34 @@
+"""Model token usage per submission
+
+Revision ID: 0005
+Revises: 0004
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0005'
+down_revision: Union[str, Sequence[str], None] = '0004'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.add_column(sa.Column('input_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('output_tokens', sa.Integer(), nullable=True))
+        batch_op.add_column(sa.Column('cache_read_tokens', sa.Integer(), nullable=True))
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_column('cache_read_tokens')
+        batch_op.drop_column('output_tokens')
+        batch_op.drop_column('input_tokens')
@@ -0,0 +1,122 @@
+"""Submission source, versioned grading results and regrade jobs
+
+Revision ID: 0006
+Revises: 0005
+Create Date: 2026-10-16 00:00:00
+
+"""
+import hashlib
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0006'
+down_revision: Union[str, Sequence[str], None] = '0005'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+RESULT_COLUMNS = [
+    'score', 'feedback', 'strengths', 'weakpoints', 'cheating_detected', 'cheating_reason', 'reasoning',
+    'tests_passed', 'tests_total', 'test_pass_rate', 'test_results', 'input_tokens', 'output_tokens', 'cache_read_tokens',
+]
+
+BACKFILL_BATCH = 500
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.add_column(sa.Column('code', sa.Text(), nullable=True))
+        batch_op.add_column(sa.Column('result_version', sa.Integer(), nullable=True))
+
+    grading_results = op.create_table(
+        'grading_results',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('submission_id', sa.Integer(), nullable=False),
+        sa.Column('version', sa.Integer(), nullable=False),
+        sa.Column('code_sha256', sa.String(), nullable=True),
+        sa.Column('criteria_sha256', sa.String(), nullable=True),
+        sa.Column('grading_job_id', sa.Integer(), nullable=True),
+        sa.Column('score', sa.Integer(), nullable=True),
+        sa.Column('feedback', sa.Text(), nullable=True),
+        sa.Column('strengths', sa.Text(), nullable=True),
+        sa.Column('weakpoints', sa.Text(), nullable=True),
+        sa.Column('cheating_detected', sa.Boolean(), nullable=True),
+        sa.Column('cheating_reason', sa.Text(), nullable=True),
+        sa.Column('reasoning', sa.Text(), nullable=True),
+        sa.Column('tests_passed', sa.Integer(), nullable=True),
+        sa.Column('tests_total', sa.Integer(), nullable=True),
+        sa.Column('test_pass_rate', sa.Float(), nullable=True),
+        sa.Column('test_results', sa.Text(), nullable=True),
+        sa.Column('input_tokens', sa.Integer(), nullable=True),
+        sa.Column('output_tokens', sa.Integer(), nullable=True),
+        sa.Column('cache_read_tokens', sa.Integer(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.ForeignKeyConstraint(['submission_id'], ['submissions.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['grading_job_id'], ['grading_jobs.id'], ondelete='SET NULL'),
+        sa.PrimaryKeyConstraint('id'),
+        sa.UniqueConstraint('submission_id', 'version', name='uq_grading_results_submission_version'),
+    )
+
+    op.create_table(
+        'regrade_jobs',
+        sa.Column('id', sa.Integer(), nullable=False),
+        sa.Column('assignment_id', sa.Integer(), nullable=False),
+        sa.Column('status', sa.String(), nullable=False),
+        sa.Column('criteria_sha256', sa.String(), nullable=False),
+        sa.Column('total', sa.Integer(), nullable=False),
+        sa.Column('processed', sa.Integer(), nullable=False),
+        sa.Column('regraded', sa.Integer(), nullable=False),
+        sa.Column('skipped', sa.Integer(), nullable=False),
+        sa.Column('failed', sa.Integer(), nullable=False),
+        sa.Column('last_submission_id', sa.Integer(), nullable=False),
+        sa.Column('error', sa.Text(), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now(), nullable=True),
+        sa.Column('started_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('finished_at', sa.DateTime(timezone=True), nullable=True),
+        sa.ForeignKeyConstraint(['assignment_id'], ['assignments.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('id'),
+    )
+    op.create_index('ix_regrade_jobs_assignment_id', 'regrade_jobs', ['assignment_id'])
+    op.create_index('ix_regrade_jobs_status', 'regrade_jobs', ['status'])
+
+    # The source of existing submissions survives in their grading jobs
+    op.execute(
+        "UPDATE submissions SET code = (SELECT code FROM grading_jobs WHERE grading_jobs.submission_id = submissions.id "
+        "ORDER BY grading_jobs.id DESC LIMIT 1)"
+    )
+
+    # Existing results become version 1. The criteria they were graded against are
+    # unknown, so any regrade grades them again.
+    bind = op.get_bind()
+    query = sa.text(
+        f"SELECT id, code, {', '.join(RESULT_COLUMNS)} FROM submissions "
+        "WHERE status = 'graded' AND id > :after ORDER BY id LIMIT :limit"
+    )
+    after = 0
+    while rows := bind.execute(query, {'after': after, 'limit': BACKFILL_BATCH}).mappings().all():
+        op.bulk_insert(grading_results, [
+            {
+                'submission_id': row['id'],
+                'version': 1,
+                'code_sha256': hashlib.sha256(row['code'].encode()).hexdigest() if row['code'] is not None else None,
+                **{column: row[column] for column in RESULT_COLUMNS},
+            }
+            for row in rows
+        ])
+        after = rows[-1]['id']
+    op.execute("UPDATE submissions SET result_version = 1 WHERE status = 'graded'")
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_regrade_jobs_status', table_name='regrade_jobs')
+    op.drop_index('ix_regrade_jobs_assignment_id', table_name='regrade_jobs')
+    op.drop_table('regrade_jobs')
+    op.drop_table('grading_results')
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_column('result_version')
+        batch_op.drop_column('code')
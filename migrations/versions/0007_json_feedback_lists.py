@@ -0,0 +1,46 @@
+"""Native JSON columns for strengths and weakpoints
+
+Revision ID: 0007
+Revises: 0006
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0007'
+down_revision: Union[str, Sequence[str], None] = '0006'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+TABLES = ('submissions', 'grading_results')
+COLUMNS = ('strengths', 'weakpoints')
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # The text already holds JSON lists; empty strings are the only values that don't parse
+    for table in TABLES:
+        for column in COLUMNS:
+            op.execute(f"UPDATE {table} SET {column} = NULL WHERE {column} = ''")
+        with op.batch_alter_table(table) as batch_op:
+            for column in COLUMNS:
+                batch_op.alter_column(
+                    column, existing_type=sa.Text(), type_=sa.JSON(), existing_nullable=True,
+                    postgresql_using=f'{column}::json',
+                )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    for table in TABLES:
+        with op.batch_alter_table(table) as batch_op:
+            for column in COLUMNS:
+                batch_op.alter_column(
+                    column, existing_type=sa.JSON(), type_=sa.Text(), existing_nullable=True,
+                    postgresql_using=f'{column}::text',
+                )
@@ -0,0 +1,75 @@
+"""Submitted source moves to the content-addressed blob store
+
+Revision ID: 0008
+Revises: 0007
+Create Date: 2026-10-16 00:00:00
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+from app.blob_store import store
+
+
+# revision identifiers, used by Alembic.
+revision: str = '0008'
+down_revision: Union[str, Sequence[str], None] = '0007'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+BACKFILL_BATCH = 500
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.add_column(sa.Column('blob_sha256', sa.String(), nullable=True))
+        batch_op.create_index('ix_submissions_blob_sha256', ['blob_sha256'])
+
+    # Sources kept in the database since 0006 are written to the blob store
+    bind = op.get_bind()
+    query = sa.text("SELECT id, code FROM submissions WHERE code IS NOT NULL AND id > :after ORDER BY id LIMIT :limit")
+    after = 0
+    while rows := bind.execute(query, {'after': after, 'limit': BACKFILL_BATCH}).all():
+        bind.execute(
+            sa.text("UPDATE submissions SET blob_sha256 = :sha256 WHERE id = :id"),
+            [{'id': row.id, 'sha256': store.put(row.code.encode('utf-8'))} for row in rows],
+        )
+        after = rows[-1].id
+
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_column('code')
+    with op.batch_alter_table('grading_jobs') as batch_op:
+        batch_op.drop_column('code')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.add_column(sa.Column('code', sa.Text(), nullable=True))
+    with op.batch_alter_table('grading_jobs') as batch_op:
+        batch_op.add_column(sa.Column('code', sa.Text(), nullable=True))
+
+    # Blobs are left in the store
+    bind = op.get_bind()
+    query = sa.text(
+        "SELECT id, blob_sha256 FROM submissions WHERE blob_sha256 IS NOT NULL AND id > :after ORDER BY id LIMIT :limit"
+    )
+    after = 0
+    while rows := bind.execute(query, {'after': after, 'limit': BACKFILL_BATCH}).all():
+        bind.execute(
+            sa.text("UPDATE submissions SET code = :code WHERE id = :id"),
+            [{'id': row.id, 'code': store.get_text(row.blob_sha256)} for row in rows],
+        )
+        after = rows[-1].id
+    op.execute(
+        "UPDATE grading_jobs SET code = COALESCE((SELECT code FROM submissions WHERE submissions.id = grading_jobs.submission_id), '')"
+    )
+
+    with op.batch_alter_table('grading_jobs') as batch_op:
+        batch_op.alter_column('code', existing_type=sa.Text(), nullable=False)
+    with op.batch_alter_table('submissions') as batch_op:
+        batch_op.drop_index('ix_submissions_blob_sha256')
+        batch_op.drop_column('blob_sha256')
@@ -0,0 +1,74 @@
+import itertools
+import os
+import sys
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# A throwaway database and blob store for the whole run, set before the app is imported
+_tmpdir = tempfile.mkdtemp(prefix="scorac-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_tmpdir, 'test.db')}")
+os.environ.setdefault("BLOB_STORE_DIR", os.path.join(_tmpdir, "blobs"))
+os.environ.setdefault("OPENROUTER_API_KEY", "test")
+
+import pytest  # noqa: E402
+
+
+@pytest.fixture(scope="session")
+def database():
+    from app.database import upgrade_database
+    upgrade_database()
+
+
+class Factory:
+    """Commits rows to the test database and returns their ids.
+
+    Each row gets working defaults; keyword arguments override them. Users are
+    numbered across the whole run, so tests never collide on ids or emails.
+    """
+
+    _user_ids = itertools.count(1000)
+
+    def add(self, row) -> int:
+        from app.database import SessionLocal
+
+        with SessionLocal() as db:
+            db.add(row)
+            db.commit()
+            return row.id
+
+    def user(self, **fields) -> int:
+        from app import models
+
+        n = next(self._user_ids)
+        return self.add(models.User(**{"id": n, "email": f"student{n}@example.com", "password": "x", "role": "student", **fields}))
+
+    def assignment(self, **fields) -> int:
+        from app import models
+
+        return self.add(models.Assignment(**{"title": "Assignment", "description": "d", "criteria": "c", **fields}))
+
+    def submission(self, assignment_id: int, code: str = None, **fields) -> int:
+        """A submission by a new student unless ``user_id`` is given, with ``code`` in the blob store."""
+        from app import blob_store, models
+
+        if "user_id" not in fields:
+            fields["user_id"] = self.user()
+        if code is not None:
+            fields["blob_sha256"] = blob_store.store.put(code.encode())
+        return self.add(models.Submission(assignment_id=assignment_id, **fields))
+
+    def test_case(self, assignment_id: int, **fields) -> int:
+        from app import models
+
+        return self.add(models.TestCase(**{"assignment_id": assignment_id, "name": "tests", "kind": "pytest", "weight": 1, **fields}))
+
+    def grading_job(self, submission_id: int, **fields) -> int:
+        from app import models
+
+        return self.add(models.GradingJob(submission_id=submission_id, **fields))
+
+
+@pytest.fixture
+def factory(database):
+    return Factory()
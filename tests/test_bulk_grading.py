@@ -0,0 +1,42 @@
+import asyncio
+import io
+import zipfile
+
+from app import bulk_grading, grading_queue
+
+
+def test_matric_numbers_keep_their_leading_dots():
+    assert bulk_grading.matric_from_path("./CSC/2024/001.py") == "CSC/2024/001"
+    assert bulk_grading.matric_from_path(".5.py") == ".5"
+
+
+def test_gradings_not_started_go_to_the_workers_when_the_client_disconnects(factory, monkeypatch):
+    assignment_id = factory.assignment(title="Sum")
+    archive = io.BytesIO()
+    with zipfile.ZipFile(archive, "w") as zf:
+        for i in range(3):
+            matric_number = f"BULK/{assignment_id}/{i}"
+            factory.user(matric_number=matric_number)
+            zf.writestr(f"{matric_number}.py", f"print({i})\n")
+    entries = bulk_grading.queue_archive(archive, assignment_id)
+
+    graded, enqueued = [], []
+
+    async def grade(job_id, enqueued_at=None):
+        graded.append(job_id)
+        await asyncio.sleep(0 if len(graded) == 1 else 1)
+
+    monkeypatch.setattr(bulk_grading, "BULK_GRADING_CONCURRENCY", 1)
+    monkeypatch.setattr(grading_queue.queue, "grade", grade)
+    monkeypatch.setattr(grading_queue.queue, "enqueue", enqueued.append)
+
+    async def main():
+        stream = bulk_grading.stream_results(entries)
+        await anext(stream)
+        # The client disconnects after the first result
+        await stream.aclose()
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert graded and enqueued
+    assert sorted(graded + enqueued) == sorted(entry["job_id"] for entry in entries)
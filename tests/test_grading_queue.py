@@ -0,0 +1,133 @@
+import asyncio
+import json
+
+import pytest
+from pydantic_ai.messages import ModelResponse, ToolCallPart
+from pydantic_ai.models.function import DeltaToolCall, FunctionModel
+
+from app import ai_agent, grading_events, grading_queue, models
+from app.database import SessionLocal
+
+OUTPUT = {"score": 70, "feedback": "Works.", "strengths": ["Readable"], "weakpoints": ["No tests"]}
+
+
+def _slow_then_fast_model(calls: list) -> FunctionModel:
+    """The first request hangs for a second, later ones answer at once."""
+    async def respond(messages, info):
+        calls.append("run")
+        await asyncio.sleep(1.0 if len(calls) == 1 else 0)
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, OUTPUT)])
+
+    async def stream(messages, info):
+        calls.append("stream")
+        yield {0: DeltaToolCall(name=info.output_tools[0].name, json_args=json.dumps(OUTPUT), tool_call_id="call")}
+
+    return FunctionModel(respond, stream_function=stream)
+
+
+@pytest.fixture
+def grading_job_id(factory):
+    user_id = factory.user()
+    # Code of its own, so the result cache never answers for the model
+    code = f"def solve(values):\n    return sorted(values)[{user_id % 7}]\n\nprint(solve([3, 1, 2, {user_id}]))\n"
+    assignment_id = factory.assignment(title="Sort", criteria="Sorts correctly")
+    submission_id = factory.submission(assignment_id, code, user_id=user_id)
+    return factory.grading_job(submission_id), submission_id
+
+
+@pytest.fixture
+def hedging_client():
+    client = ai_agent.routing.fast.client
+    hedge_after = client.hedge_after
+    client.hedge_after = 0.05
+    yield client
+    client.hedge_after = hedge_after
+
+
+def test_grading_without_subscribers_is_hedged(grading_job_id, hedging_client):
+    job_id, submission_id = grading_job_id
+    calls, hedges = [], hedging_client.hedges
+    with ai_agent.scoring_agent.override(model=_slow_then_fast_model(calls)):
+        asyncio.run(grading_queue.GradingQueue().grade(job_id))
+
+    assert hedging_client.hedges == hedges + 1
+    assert calls == ["run", "run"]
+    with SessionLocal() as db:
+        assert db.get(models.Submission, submission_id).status == "graded"
+
+
+def test_grading_with_subscribers_is_streamed(grading_job_id, hedging_client):
+    job_id, submission_id = grading_job_id
+    calls = []
+
+    async def main():
+        events = grading_events.events.subscribe(submission_id)
+        try:
+            await grading_queue.GradingQueue().grade(job_id)
+            return [events.get_nowait()[0] for _ in range(events.qsize())]
+        finally:
+            grading_events.events.unsubscribe(submission_id, events)
+
+    with ai_agent.scoring_agent.override(model=_slow_then_fast_model(calls)):
+        received = asyncio.run(main())
+
+    assert calls == ["stream"]
+    assert received[0] == "partial" and received[-1] == "done"
+
+
+def test_identical_submissions_graded_together_keep_consistent_results(factory):
+    code = "def total(values):\n    result = 0\n    for value in values:\n        result += value\n    return result\n"
+    assignment_id = factory.assignment(title="Copies", criteria="Sums correctly")
+    job_ids = [factory.grading_job(factory.submission(assignment_id, code)) for _ in range(12)]
+
+    async def respond(messages, info):
+        await asyncio.sleep(0)
+        return ModelResponse(parts=[ToolCallPart(info.output_tools[0].name, OUTPUT)])
+
+    async def main():
+        queue = grading_queue.GradingQueue()
+        await asyncio.gather(*(queue.grade(job_id) for job_id in job_ids))
+
+    with ai_agent.scoring_agent.override(model=FunctionModel(respond)):
+        asyncio.run(main())
+
+    with SessionLocal() as db:
+        for job_id in job_ids:
+            job = db.get(models.GradingJob, job_id)
+            submission = db.get(models.Submission, job.submission_id)
+            current = db.query(models.GradingResult).filter_by(
+                submission_id=submission.id, version=submission.result_version
+            ).one()
+            assert job.status == "done" and submission.status == "graded"
+            assert submission.cheating_detected and current.cheating_detected
+            assert current.cheating_reason == submission.cheating_reason
+
+
+def test_failed_commit_marks_the_job_failed_and_tells_subscribers(grading_job_id, monkeypatch):
+    job_id, submission_id = grading_job_id
+    record_result = grading_queue.record_result
+
+    async def colliding_record_result(db, submission, *args):
+        await record_result(db, submission, *args)
+        # Another version with the same number: the commit that follows fails
+        db.add(models.GradingResult(submission_id=submission.id, version=submission.result_version))
+
+    monkeypatch.setattr(grading_queue, "record_result", colliding_record_result)
+
+    async def main():
+        events = grading_events.events.subscribe(submission_id)
+        try:
+            await grading_queue.GradingQueue().grade(job_id)
+            return [events.get_nowait()[0] for _ in range(events.qsize())]
+        finally:
+            grading_events.events.unsubscribe(submission_id, events)
+
+    with ai_agent.scoring_agent.override(model=_slow_then_fast_model([])):
+        received = asyncio.run(main())
+
+    assert received[-1] == "failed"
+    with SessionLocal() as db:
+        job = db.get(models.GradingJob, job_id)
+        assert job.status == "failed" and "UNIQUE" in job.error
+        assert job.finished_at is not None
+        assert db.get(models.Submission, submission_id).status == "failed"
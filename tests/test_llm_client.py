@@ -0,0 +1,136 @@
+import asyncio
+import time
+
+import pytest
+from pydantic_ai import Agent
+from pydantic_ai.exceptions import ModelHTTPError
+from pydantic_ai.messages import ModelResponse, TextPart
+from pydantic_ai.models.function import FunctionModel
+
+from app.llm_client import CircuitBreaker, CircuitOpenError, LLMClient, TokenBucket
+
+
+def _client(respond, **options) -> LLMClient:
+    """A client around an agent whose model is ``respond(calls)``, called with the number of calls so far."""
+    calls = []
+
+    async def model(messages, info):
+        calls.append(time.monotonic())
+        text = await respond(len(calls))
+        return ModelResponse(parts=[TextPart(text)])
+
+    options.setdefault("bucket", TokenBucket(rate=0))
+    options.setdefault("retry_base", 0)
+    client = LLMClient(Agent(FunctionModel(model)), **options)
+    client.model_calls = calls
+    return client
+
+
+def _failing(*statuses):
+    """Fails with the given HTTP statuses in turn, then answers."""
+    async def respond(n):
+        if n <= len(statuses):
+            raise ModelHTTPError(statuses[n - 1], "fake-model")
+        return "ok"
+    return respond
+
+
+def test_retryable_errors_are_retried():
+    client = _client(_failing(503, 429))
+    result = asyncio.run(client.run("grade"))
+    assert result.output == "ok"
+    assert client.stats()["retries"] == 2
+    assert client.breaker.state == "closed"
+
+
+def test_other_errors_are_not_retried_or_held_against_the_provider():
+    client = _client(_failing(400), breaker=CircuitBreaker(threshold=1))
+    with pytest.raises(ModelHTTPError):
+        asyncio.run(client.run("grade"))
+    assert len(client.model_calls) == 1
+    assert client.breaker.state == "closed"
+
+
+def test_breaker_opens_then_lets_one_trial_through():
+    client = _client(_failing(503, 503), max_retries=0, breaker=CircuitBreaker(threshold=2, reset_after=0.1))
+
+    async def main():
+        for _ in range(2):
+            with pytest.raises(ModelHTTPError):
+                await client.run("grade")
+        assert client.breaker.state == "open"
+        with pytest.raises(CircuitOpenError):
+            await client.run("grade")
+        await asyncio.sleep(0.1)
+        assert client.breaker.state == "half_open"
+        return await client.run("grade")
+
+    assert asyncio.run(main()).output == "ok"
+    assert len(client.model_calls) == 3
+    assert client.stats()["rejected"] == 1
+    assert client.breaker.state == "closed"
+
+
+def test_cancelled_trial_does_not_keep_the_breaker_half_open():
+    async def respond(n):
+        if n == 1:
+            raise ModelHTTPError(503, "fake-model")
+        if n == 2:
+            await asyncio.sleep(10)
+        return "ok"
+
+    client = _client(respond, max_retries=0, breaker=CircuitBreaker(threshold=1, reset_after=0.05))
+
+    async def main():
+        with pytest.raises(ModelHTTPError):
+            await client.run("grade")
+        await asyncio.sleep(0.05)
+        trial = asyncio.create_task(client.run("grade"))
+        await asyncio.sleep(0.05)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+        return await client.run("grade")
+
+    assert asyncio.run(main()).output == "ok"
+    assert client.breaker.state == "closed"
+
+
+def test_token_bucket_spaces_calls_past_the_burst():
+    async def respond(n):
+        return "ok"
+
+    client = _client(respond, bucket=TokenBucket(rate=20, capacity=2))
+
+    async def main():
+        await asyncio.gather(*(client.run("grade") for _ in range(4)))
+
+    asyncio.run(main())
+    calls = client.model_calls
+    # Two calls go out at once, the other two 1/20 s apart
+    assert calls[1] - calls[0] < 0.03
+    assert calls[3] - calls[0] >= 0.09
+
+
+def test_slow_attempt_is_hedged():
+    async def respond(n):
+        await asyncio.sleep(10 if n == 1 else 0)
+        return f"answer {n}"
+
+    client = _client(respond, hedge_after=0.05)
+    started = time.monotonic()
+    result = asyncio.run(client.run("grade"))
+    assert result.output == "answer 2"
+    assert time.monotonic() - started < 1
+    assert client.stats()["hedges"] == 1
+
+
+def test_attempts_time_out_and_are_retried():
+    async def respond(n):
+        await asyncio.sleep(10 if n == 1 else 0)
+        return "ok"
+
+    client = _client(respond, timeout=0.05)
+    assert asyncio.run(client.run("grade")).output == "ok"
+    assert client.stats()["timeouts"] == 1
+    assert client.stats()["retries"] == 1
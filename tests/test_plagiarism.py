@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+from sqlalchemy import select
+
+from app import grading_queue, models, plagiarism
+from app.database import AsyncSessionLocal, SessionLocal
+
+CODE = (
+    "def mean(values):\n"
+    "    total = 0\n"
+    "    for value in values:\n"
+    "        total += value\n"
+    "    return total / len(values)\n"
+    "\n"
+    "print(mean([1, 2, 3]))\n"
+)
+
+
+@pytest.fixture
+def assignment_id(factory):
+    return factory.assignment(title="Mean")
+
+
+async def _index(submission_id: int):
+    async with AsyncSessionLocal() as db:
+        submission = await db.get(models.Submission, submission_id)
+        await grading_queue.index_plagiarism(db, submission, CODE)
+
+
+def _matched(submission_id: int) -> set:
+    with SessionLocal() as db:
+        return {m.matched_submission_id for m in plagiarism.get_matches(db, submission_id)}
+
+
+def test_concurrently_indexed_submissions_match_each_other(factory, assignment_id):
+    ids = [factory.submission(assignment_id) for _ in range(10)]
+
+    async def main():
+        await asyncio.gather(*(_index(submission_id) for submission_id in ids))
+
+    asyncio.run(main())
+    for submission_id in ids:
+        assert _matched(submission_id) == set(ids) - {submission_id}
+
+
+def test_retroactive_flag_is_recorded_as_a_new_result_version(factory, assignment_id):
+    graded_id = factory.submission(assignment_id, status="graded", score=90, cheating_detected=False)
+
+    async def main():
+        async with AsyncSessionLocal() as db:
+            graded = await db.get(models.Submission, graded_id)
+            await grading_queue.record_result(db, graded, grading_queue.sha256("c"))
+            await db.commit()
+        await _index(graded_id)
+        copy_id = factory.submission(assignment_id)
+        await _index(copy_id)
+
+    asyncio.run(main())
+    with SessionLocal() as db:
+        graded = db.get(models.Submission, graded_id)
+        results = db.execute(
+            select(models.GradingResult).where(models.GradingResult.submission_id == graded_id)
+            .order_by(models.GradingResult.version)
+        ).scalars().all()
+        assert graded.cheating_detected
+        assert [r.version for r in results] == [1, 2]
+        assert graded.result_version == 2
+        assert results[-1].cheating_detected and results[-1].cheating_reason == graded.cheating_reason
+        assert results[-1].criteria_sha256 == results[0].criteria_sha256
+        assert not results[0].cheating_detected
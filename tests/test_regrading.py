@@ -0,0 +1,50 @@
+import asyncio
+
+import pytest
+from sqlalchemy import update
+
+from app import grading_queue, models, regrading
+from app.database import SessionLocal
+
+
+@pytest.fixture
+def resumed_regrade(factory):
+    """A regrade resumed after a restart, whose grading job the grading workers already claimed."""
+    assignment_id = factory.assignment(title="Regrade", criteria="New criteria")
+    submission_id = factory.submission(assignment_id, "print('regrade')\n", status="graded", score=50, result_version=1)
+    with SessionLocal() as db:
+        code_sha256 = db.get(models.Submission, submission_id).blob_sha256
+    factory.add(models.GradingResult(
+        submission_id=submission_id, version=1, code_sha256=code_sha256,
+        criteria_sha256=grading_queue.sha256("Old criteria"), score=50,
+    ))
+    grading_job_id = factory.grading_job(submission_id, status="running")
+    regrade_job_id = factory.add(models.RegradeJob(
+        assignment_id=assignment_id, status="running", criteria_sha256=grading_queue.sha256("New criteria"), total=1,
+    ))
+    return regrade_job_id, grading_job_id
+
+
+def _finish(grading_job_id: int, status: str):
+    with SessionLocal() as db:
+        db.execute(update(models.GradingJob).where(models.GradingJob.id == grading_job_id).values(status=status))
+        db.commit()
+
+
+def test_batch_waits_for_grading_jobs_claimed_by_the_workers(resumed_regrade, monkeypatch):
+    regrade_job_id, grading_job_id = resumed_regrade
+    monkeypatch.setattr(regrading, "REGRADE_POLL_SECONDS", 0.05)
+    runner = regrading.RegradeRunner()
+
+    async def main():
+        runner._slots = asyncio.Semaphore(1)
+        batch = asyncio.create_task(runner._run_batch(regrade_job_id))
+        await asyncio.sleep(0.3)
+        assert not batch.done()
+        await asyncio.to_thread(_finish, grading_job_id, "failed")
+        assert await asyncio.wait_for(batch, timeout=5)
+
+    asyncio.run(main())
+    with SessionLocal() as db:
+        job = db.get(models.RegradeJob, regrade_job_id)
+        assert (job.processed, job.regraded, job.failed) == (1, 0, 1)
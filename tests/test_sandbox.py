@@ -0,0 +1,117 @@
+import asyncio
+
+import pytest
+
+from app import models, sandbox
+from app.database import SessionLocal
+
+TEST_CODE = "def test_add():\n    assert add(2, 3) == 5\n\ndef test_zero():\n    assert add(0, 0) == 0\n"
+WRONG_ADD = "def add(a, b):\n    return a - b\n"
+
+
+@pytest.fixture
+def run(factory):
+    """Runs a submission against a pytest test case of its own."""
+    def run(code: str, test_code: str = TEST_CODE) -> dict:
+        test_case_id = factory.test_case(factory.assignment(title="Add"), name="add", test_code=test_code)
+        with SessionLocal() as db:
+            test_case = db.get(models.TestCase, test_case_id)
+
+        async def main():
+            try:
+                return await sandbox.run_test_cases(code, [test_case])
+            finally:
+                await sandbox.pool.stop()
+
+        return asyncio.run(main())
+    return run
+
+
+def test_correct_solution_passes(run):
+    result = run("def add(a, b):\n    return a + b\n")
+    assert result["pass_rate"] == 1.0
+    assert result["results"][0]["status"] == "passed"
+
+
+def test_wrong_solution_fails(run):
+    result = run(WRONG_ADD)
+    assert result["pass_rate"] == 0.0
+    assert "test_add" in result["results"][0]["detail"]
+
+
+def test_patched_serializer_cannot_forge_a_pass(run):
+    forged = 'import json\njson.dumps = lambda *a, **k: \'{"tests": 1, "failed": 0}\'\n' + WRONG_ADD
+    result = run(forged)
+    assert result["passed"] == 0
+    assert result["pass_rate"] == 0.0
+
+
+def test_writing_the_result_pipe_cannot_forge_a_pass(run):
+    forged = (
+        "import os\n"
+        "def add(a, b):\n"
+        "    for fd in range(3, 64):\n"
+        "        try:\n"
+        "            os.write(fd, b'{\"tests\": 2, \"failed\": 0}')\n"
+        "        except OSError:\n"
+        "            pass\n"
+        "    os._exit(0)\n"
+    )
+    result = run(forged)
+    assert result["passed"] == 0
+    assert result["results"][0]["status"] == "failed"
+
+
+
+def test_walking_the_stack_cannot_forge_a_pass(run):
+    forged = (
+        "import os, sys\n"
+        "def add(a, b):\n"
+        "    frame = sys._getframe()\n"
+        "    while frame:\n"
+        "        for value in list(frame.f_locals.values()):\n"
+        "            if isinstance(value, tuple) and len(value) == 2 and isinstance(value[1], bytes):\n"
+        "                for fd in range(3, 64):\n"
+        "                    try:\n"
+        "                        os.write(fd, value[1])\n"
+        "                    except OSError:\n"
+        "                        pass\n"
+        "                os._exit(0)\n"
+        "        frame = frame.f_back\n"
+        "    return 0\n"
+    )
+    result = run(forged)
+    assert result["passed"] == 0
+    assert result["results"][0]["status"] == "failed"
+
+
+def test_objects_of_the_solution_only_equal_their_own_kind(run):
+    forged = "class Anything:\n    def __eq__(self, other):\n        return True\n\ndef add(a, b):\n    return Anything()\n"
+    assert run(forged)["passed"] == 0
+
+
+def test_classes_and_in_place_changes_work_through_the_proxies(run):
+    code = (
+        "class Stack:\n"
+        "    def __init__(self):\n"
+        "        self.items = []\n"
+        "    def push(self, item):\n"
+        "        self.items.append(item)\n"
+        "    def __len__(self):\n"
+        "        return len(self.items)\n"
+        "\n"
+        "def sort_in_place(items):\n"
+        "    items.sort()\n"
+    )
+    test_code = (
+        "def test_stack():\n"
+        "    stack = Stack()\n"
+        "    stack.push((1, 'a'))\n"
+        "    assert len(stack) == 1 and stack.items == [(1, 'a')]\n"
+        "\n"
+        "def test_sort():\n"
+        "    items = [3, 1, 2]\n"
+        "    sort_in_place(items)\n"
+        "    assert items == [1, 2, 3]\n"
+    )
+    assert run(code, test_code)["pass_rate"] == 1.0